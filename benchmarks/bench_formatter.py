@@ -0,0 +1,52 @@
+"""
+Benchmark do BatchFormatter (formatação de largura fixa em lote).
+
+Mede cada função em lote contra a função escalar do DataFormatter em 10k e
+100k valores. A equivalência das duas é conferida em
+tests/test_formatter.py.
+
+Uso: python benchmarks/bench_formatter.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pandas as pd  # noqa: E402
+
+import engine  # noqa: E402
+
+DF = engine.DataFormatter
+BF = engine.BatchFormatter
+
+# (nome, escalar, lote, larguras usadas no XML)
+CAMPOS = [
+    ("input_fiscal",   DF.format_input_fiscal,   BF.input_fiscal,   [5, 15]),
+    ("high_precision", DF.format_high_precision, BF.high_precision, [11, 15, 20]),
+    ("quantity",       DF.format_quantity,       BF.quantity,       [14, 15]),
+]
+
+TAMANHOS = [10_000, 100_000]
+
+
+def medir(func, *args):
+    inicio = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - inicio
+
+
+def main():
+    print(f"{'campo':>15} {'valores':>8} {'escalar (s)':>12} {'lote (s)':>10} {'ganho':>7}")
+    for n in TAMANHOS:
+        valores = pd.Series([round(random.uniform(0, 1e6), 2) for _ in range(n)])
+        lista = valores.tolist()
+        for nome, escalar, lote, larguras in CAMPOS:
+            t_escalar = medir(lambda: [escalar(v, larguras[-1]) for v in lista])
+            t_lote = medir(lote, valores, larguras[-1])
+            print(f"{nome:>15} {n:>8} {t_escalar:>12.4f} {t_lote:>10.4f} {t_escalar / t_lote:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
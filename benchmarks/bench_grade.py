@@ -0,0 +1,87 @@
+"""
+Benchmark do recálculo incremental da grade de conferência (GradeConferencia).
+
+Simula execuções seguidas da aba Conferência: a cada uma, o st.data_editor
+devolve uma cópia da grade com de zero a três células editadas (base,
+alíquota, frete, seguro; valores, zero e NaN). Confere que a grade e os
+totais são os mesmos do recálculo completo antigo (pd.to_numeric nas
+colunas inteiras) e mede o tempo por edição em grades de 2k a 200k linhas.
+
+Uso: python benchmarks/bench_grade.py
+"""
+import math
+import os
+import random
+import sys
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, AQUI)
+sys.path.insert(0, os.path.join(AQUI, ".."))
+
+import pandas as pd  # noqa: E402
+
+import bench_xml_template as base  # noqa: E402
+
+import engine  # noqa: E402
+
+TAMANHOS = [2_000, 20_000, 200_000]
+EDICOES = 30
+COLUNAS_EDITADAS = ["II Base (R$)", "IPI Alíq. (%)", "PIS (R$)", "COFINS Base (R$)", "Frete (R$)", "Seguro (R$)"]
+
+
+def recalculo_completo(df):
+    """Como a aba fazia antes: todas as linhas e todos os totais a cada execução."""
+    df = df.copy()
+    for tax in engine.GRADE_TRIBUTOS:
+        base_col, aliq_col, val_col = f"{tax} Base (R$)", f"{tax} Alíq. (%)", f"{tax} (R$)"
+        df[base_col] = pd.to_numeric(df[base_col], errors='coerce').fillna(0.0)
+        df[aliq_col] = pd.to_numeric(df[aliq_col], errors='coerce').fillna(0.0)
+        df[val_col]  = df[base_col] * (df[aliq_col] / 100.0)
+    totais = {col: pd.to_numeric(df[col], errors='coerce').sum() for col in engine.GRADE_COLUNAS_TOTAIS}
+    return df, totais
+
+
+def montar_grade(n):
+    parser = base.gerar_parser(n)
+    grade = engine.montar_grade_duimp(parser)
+    for campo in base.CAMPOS_GRADE:
+        grade[campo] = [it[campo] for it in parser.items]
+    return grade
+
+
+def main():
+    random.seed(20260105)
+    print(f"{'linhas':>8} {'completo (s)':>13} {'1ª execução (s)':>16} {'edição (s)':>11}")
+    for n in TAMANHOS:
+        grade = montar_grade(n)
+        estado = engine.GradeConferencia()
+        inicio = time.perf_counter()
+        atual = estado.atualizar(grade.copy(), grade)
+        t_primeira = time.perf_counter() - inicio
+
+        tempos, tempos_completo = [], []
+        for _ in range(EDICOES):
+            editada = atual.copy()   # o data_editor devolve uma cópia com as edições
+            for _ in range(random.randint(0, 3)):
+                editada.at[random.randrange(n), random.choice(COLUNAS_EDITADAS)] = random.choice(
+                    [0.0, 123.45, float("nan"), 1e7, 55.5])
+            inicio = time.perf_counter()
+            esperado, totais = recalculo_completo(editada)
+            tempos_completo.append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            atual = estado.atualizar(editada, atual)
+            tempos.append(time.perf_counter() - inicio)
+
+            pd.testing.assert_frame_equal(atual, esperado)
+            for col, total in totais.items():
+                assert math.isclose(estado.total(col), total, rel_tol=1e-12, abs_tol=1e-9), f"total de {col} divergente"
+        tempos.sort()
+        tempos_completo.sort()
+        print(f"{n:>8} {tempos_completo[len(tempos_completo) // 2]:>13.4f} {t_primeira:>16.3f} "
+              f"{tempos[len(tempos) // 2]:>11.4f}")
+
+
+if __name__ == "__main__":
+    main()
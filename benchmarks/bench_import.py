@@ -0,0 +1,85 @@
+"""
+Orçamento do tempo de importação de projeto.py (início a frio do app).
+
+Importa o projeto em um processo novo com `python -X importtime` e confere:
+
+1. Nenhuma dependência pesada (PESADOS) é importada junto com o projeto:
+   elas são carregadas pelo módulo do app que as usa, no primeiro uso.
+2. O tempo de importação do projeto, descontado o do próprio Streamlit,
+   fica dentro de ORCAMENTO_MS (menor tempo de REPETICOES importações).
+3. `import engine` (uso sem interface: CLI, scripts) não importa o
+   Streamlit nem as dependências pesadas.
+
+Mostra os módulos que mais pesaram e sai com código 1 se o orçamento for
+estourado. As mesmas verificações (verificar()) rodam em
+tests/test_import_budget.py.
+
+Uso: python benchmarks/bench_import.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+PESADOS = ("numpy", "pandas", "plotly.express", "fitz", "pymupdf", "pdfplumber", "lxml.etree")
+ORCAMENTO_MS = 150
+REPETICOES = 3
+
+
+def importar(modulo="projeto"):
+    """Devolve {módulo: (próprio µs, acumulado µs)} de uma importação de `modulo`."""
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(RAIZ))
+    # cwd temporário: o projeto cria .streamlit/config.toml no diretório atual
+    with tempfile.TemporaryDirectory() as pasta:
+        saida = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+            cwd=pasta, env=env, capture_output=True, text=True, check=True,
+        ).stderr
+    tempos = {}
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "imported package" in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|")
+        tempos.setdefault(nome.strip(), (int(proprio), int(acumulado)))
+    return tempos
+
+
+def verificar(repeticoes=REPETICOES):
+    """
+    Importa o projeto `repeticoes` vezes (fica a mais rápida) e o engine uma
+    vez; devolve (tempos do projeto, ms do projeto sem o Streamlit, tempos do
+    engine, falhas). Uma importação antes, fora da conta, grava os .pyc
+    (checkout novo ou __pycache__ apagado).
+    """
+    importar()
+    medicoes = [importar() for _ in range(repeticoes)]
+    tempos = min(medicoes, key=lambda t: t["projeto"][1] - t["streamlit"][1])
+    projeto_ms = (tempos["projeto"][1] - tempos["streamlit"][1]) / 1000
+
+    falhas = [f"{nome} importado junto com o projeto" for nome in PESADOS if nome in tempos]
+    if projeto_ms > ORCAMENTO_MS:
+        falhas.append(f"importação do projeto em {projeto_ms:.1f} ms (orçamento {ORCAMENTO_MS} ms)")
+
+    motor = importar("engine")
+    falhas += [f"{nome} importado junto com o engine" for nome in ("streamlit",) + PESADOS if nome in motor]
+    return tempos, projeto_ms, motor, falhas
+
+
+def main():
+    tempos, projeto_ms, motor, falhas = verificar()
+
+    print(f"streamlit: {tempos['streamlit'][1] / 1000:8.1f} ms")
+    print(f"projeto:   {projeto_ms:8.1f} ms (sem o Streamlit; orçamento {ORCAMENTO_MS} ms)")
+    print("\nmaiores tempos próprios (ms):")
+    for nome, (proprio, _) in sorted(tempos.items(), key=lambda kv: -kv[1][0])[:10]:
+        print(f"  {proprio / 1000:7.1f}  {nome}")
+    print(f"\nengine:    {motor['engine'][1] / 1000:8.1f} ms")
+    for falha in falhas:
+        print(f"FALHOU: {falha}")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
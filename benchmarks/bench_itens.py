@@ -0,0 +1,147 @@
+"""
+Benchmark de memória da ItemTable (itens por coluna, esquema fixo).
+
+Compara, por 1k itens, a memória da lista de dicts que os parsers
+guardavam na sessão com a da ItemTable que guardam agora:
+
+- Sigraweb: blocos de texto sintéticos no layout da "Conferência do
+  Processo Detalhado" lidos por _parse_item_block. A lista antiga tem
+  também os apelidos (aduaneiro_reais, frete_internacional,
+  seguro_internacional), como os itens tinham antes.
+- DUIMP: itens com os campos de _DUIMP_ITEM_KEYS (texto) e os numéricos
+  já convertidos para float.
+
+A memória é medida com tracemalloc (alocações vivas depois de montar a
+estrutura). Também confere que as duas representações têm os mesmos
+valores e que to_dataframe() não copia as colunas numéricas.
+
+Uso: python benchmarks/bench_itens.py
+"""
+import math
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np  # noqa: E402
+
+import engine  # noqa: E402
+
+N = 1_000
+APELIDOS_SIGRAWEB = {
+    "aduaneiro_reais": "valorAduaneiroReal",
+    "frete_internacional": "freteReal",
+    "seguro_internacional": "seguroReal",
+}
+
+
+def br(valor, casas=2):
+    return f"{valor:,.{casas}f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def bloco_sigraweb(i):
+    r = random.random
+    return (
+        f"\nNR NCM: 8302{i % 10000:04d}\n"
+        f"Part Number: {i:03d}.{i * 7 % 1000:03d}.{i % 97:02d} | Descrição: DOBRADIÇA DE AÇO INOX MODELO {i} "
+        f"PARA PORTAS DE MÓVEIS COM AMORTECEDOR\nFabricante: HAFELE SE & CO KG\n"
+        f"Peso Líquido: {br(r() * 100, 5)} Qnt. Estatística: {br(r() * 1000, 5)}\n"
+        f"Quantidade: {br(r() * 1000, 5)} Unidade: PECA\n"
+        f"Valor FOB: {br(r() * 1e5)} EUR Valor Aduaneiro USD: {br(r() * 1e5)}\n"
+        f"Valor Aduaneiro Real: {br(r() * 5e5)} Valor Unitário: {br(r() * 100, 7)}\n"
+        f"Valor Frete: {br(r() * 1e3)} USD Valor Frete Real: {br(r() * 5e3)}\n"
+        f"Valor Seguro: {br(r() * 1e2)} USD Valor Seguro Real: {br(r() * 5e2)}\n"
+        f"Moeda LI: EURO/COM.EUROPEIA\nPaís Origem: {random.choice(['ALEMANHA', 'ITÁLIA', 'ÁUSTRIA'])}\n"
+        f"Fornecedor: HAFELE SE & CO KG\n"
+        f"II {br(16)} 0,00 0,00 0,00 0,00 {br(r() * 5e5)} {br(r() * 8e4)}\n"
+        f"IPI {br(9.75)} 0,00 0,00 0,00 {br(r() * 5e5)} {br(r() * 5e4)}\n"
+        f"PIS {br(2.1)} 0,00 0,00 0,00 {br(r() * 5e5)} {br(r() * 1e4)}\n"
+        f"COFINS {br(9.65)} 0,00 0,00 0,00 {br(r() * 5e5)} {br(r() * 5e4)}\n"
+    )
+
+
+def item_duimp(i):
+    item = {key: "" for key in engine.DUIMP_ITEM_SCHEMA}
+    item.update(
+        numeroAdicao=f"{i:05d}",
+        ncm=f"8302.{i % 100:02d}.00",
+        paisOrigem=random.choice(["ALEMANHA", "ITÁLIA", "ÁUSTRIA"]),
+        unidade="PECA",
+        moeda="EURO/COM.EUROPEIA",
+        fornecedor_raw="1 - HAFELE SE & CO KG",
+        endereco_raw="ADOLF-HAFELE-STRASSE, 2 - NAGOLD",
+        descricao=f"DOBRADIÇA DE AÇO INOX MODELO {i} PARA PORTAS DE MÓVEIS COM AMORTECEDOR",
+        desc_complementar=f"REF {i:06d}",
+    )
+    for key in engine.duimp._DUIMP_NUMERIC_KEYS:
+        item[key] = engine.parse_br_number(br(random.random() * 1e4, 5), None)
+    return item
+
+
+def medir(construir):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    antes = tracemalloc.get_traced_memory()[0]
+    estrutura = construir()
+    depois = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return estrutura, depois - antes
+
+
+def mesmos_valores(lista, tabela):
+    for antigo, novo in zip(lista, tabela):
+        for campo, valor in novo.items():
+            esperado = antigo[campo]
+            if isinstance(valor, float) and math.isnan(valor):
+                assert esperado is None or math.isnan(esperado), campo
+            else:
+                assert valor == esperado, campo
+    assert len(lista) == len(tabela)
+
+
+def main():
+    random.seed(20260105)
+    parser = engine.SigrawebPDFParser()
+    blocos = [bloco_sigraweb(i) for i in range(1, N + 1)]
+    fontes_duimp = [item_duimp(i) for i in range(1, N + 1)]
+
+    def sigraweb_dicts():
+        itens = []
+        for i, bloco in enumerate(blocos, start=1):
+            item = parser._parse_item_block(str(i), bloco)
+            item.update({apelido: item[campo] for apelido, campo in APELIDOS_SIGRAWEB.items()})
+            itens.append(item)
+        return itens
+
+    def sigraweb_tabela():
+        return engine.ItemTable.from_records(
+            (parser._parse_item_block(str(i), bloco) for i, bloco in enumerate(blocos, start=1)),
+            engine.SIGRAWEB_ITEM_SCHEMA,
+        )
+
+    def duimp_dicts():
+        return [dict(item) for item in fontes_duimp]
+
+    def duimp_tabela():
+        return engine.ItemTable.from_records(fontes_duimp, engine.DUIMP_ITEM_SCHEMA)
+
+    print(f"{'itens (1k)':>12} {'campos':>7} {'dicts (KB)':>11} {'tabela (KB)':>12} {'economia':>9}")
+    for nome, dicts, tabela in (("Sigraweb", sigraweb_dicts, sigraweb_tabela),
+                                ("DUIMP", duimp_dicts, duimp_tabela)):
+        lista, kb_dicts = medir(dicts)
+        tab, kb_tabela = medir(tabela)
+        mesmos_valores(lista, tab)
+
+        df = tab.to_dataframe()
+        for campo, array in tab.columns.items():
+            if array.dtype != object:
+                assert np.shares_memory(df[campo].to_numpy(), array), f"to_dataframe copiou {campo}"
+
+        print(f"{nome:>12} {len(tab.columns):>7} {kb_dicts / 1024:>11.1f} {kb_tabela / 1024:>12.1f} "
+              f"{1 - kb_tabela / kb_dicts:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
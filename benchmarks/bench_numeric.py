@@ -0,0 +1,116 @@
+"""
+Benchmark da camada numérica: valores convertidos uma vez na leitura.
+
+Monta o XML de 1k e 5k adições duas vezes: com os campos numéricos como
+texto no formato brasileiro ("1.234,56", como os parsers entregavam) e como
+float (como entregam agora). Conta quantas conversões de texto para número
+o XMLBuilder faz por adição em cada caso, mede o tempo e confere que os
+dois XMLs são idênticos.
+
+Uso: python benchmarks/bench_numeric.py
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import engine  # noqa: E402
+import engine.integrated  # noqa: E402
+import engine.xml_builder  # noqa: E402
+
+# Módulos que usam parse_br_number na montagem do XML (importam o nome,
+# então a contagem troca a função em cada um deles, não em engine)
+MODULOS_CONVERSAO = (engine.xml_builder, engine.integrated)
+
+TAMANHOS = [1_000, 5_000]
+
+CAMPOS_GRADE = [
+    "Frete (R$)", "Seguro (R$)", "Aduaneiro (R$)",
+    "II (R$)", "II Base (R$)", "II Alíq. (%)",
+    "IPI (R$)", "IPI Base (R$)", "IPI Alíq. (%)",
+    "PIS (R$)", "PIS Base (R$)", "PIS Alíq. (%)",
+    "COFINS (R$)", "COFINS Base (R$)", "COFINS Alíq. (%)",
+]
+
+
+def texto_br(valor, casas):
+    """1234.5 → "1.234,50000" (formato em que os PDFs trazem os números)."""
+    return f"{valor:,.{casas}f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def gerar_itens(n):
+    numericos, texto = [], []
+    for i in range(1, n + 1):
+        item = {
+            "numeroAdicao": str(i).zfill(3),
+            "ncm": "8302.42.00",
+            "paisOrigem": "ALEMANHA",
+            "unidade": "PECA",
+            "moeda": "EURO/COM.EUROPEIA",
+            "fornecedor_raw": "1 - HAFELE SE & CO KG",
+            "endereco_raw": "ADOLF-HAFELE-STRASSE, 2 - NAGOLD",
+            "descricao": f"DOBRADICA {i}",
+            "desc_complementar": "ACO",
+            "NUMBER": f"PN-{i}",
+            "quantidade": texto_br(i * 1.5, 5),
+            "quantidade_comercial": "" if i % 10 == 0 else texto_br(i * 3.0, 5),
+            "pesoLiq": texto_br(i * 0.125, 5),
+            "valorUnit": texto_br(12.3456789, 7),
+            "valorTotal": texto_br(i * 12.3456789, 7),
+        }
+        for j, campo in enumerate(CAMPOS_GRADE):
+            item[campo] = round(i * 0.37 + j, 2)
+        texto.append(item)
+
+        # O que os parsers entregam agora: a mesma leitura, convertida uma vez
+        convertido = dict(item)
+        for campo in engine.duimp._DUIMP_NUMERIC_KEYS:
+            convertido[campo] = engine.parse_br_number(item[campo], None)
+        numericos.append(convertido)
+    return numericos, texto
+
+
+def construir(itens):
+    """Monta o XML contando as conversões de texto feitas pelo XMLBuilder."""
+    original   = engine.numeric.parse_br_number
+    conversoes = 0
+
+    def contando(value, default=0.0):
+        nonlocal conversoes
+        if isinstance(value, str):
+            conversoes += 1
+        return original(value, default)
+
+    parser = SimpleNamespace(
+        header={"numeroDUIMP": "25BR0000123456-7", "cnpj": "12.345.678/0001-90",
+                "pesoBruto": 1234.5, "pesoLiquido": 1000.0, "urf": "0917800"},
+        items=itens,
+    )
+    for modulo in MODULOS_CONVERSAO:
+        modulo.parse_br_number = contando
+    try:
+        inicio = time.perf_counter()
+        xml = engine.XMLBuilder(parser).build()
+        return time.perf_counter() - inicio, conversoes, xml
+    finally:
+        for modulo in MODULOS_CONVERSAO:
+            modulo.parse_br_number = original
+
+
+def main():
+    print(f"{'adições':>8} {'conv./adição texto':>19} {'conv./adição float':>19} "
+          f"{'texto (s)':>10} {'float (s)':>10}")
+    for n in TAMANHOS:
+        numericos, texto = gerar_itens(n)
+        t_texto, conv_texto, xml_texto = construir(texto)
+        t_float, conv_float, xml_float = construir(numericos)
+        assert xml_texto == xml_float, "XML divergente entre itens em texto e em float"
+        assert conv_texto > 0, "nenhuma conversão contada com itens em texto: a contagem não está vendo o XMLBuilder"
+        print(f"{n:>8} {conv_texto / n:>19.1f} {conv_float / n:>19.1f} "
+              f"{t_texto:>10.3f} {t_float:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark do tempo de rerun do app com uma sessão carregada.
+
+Roda projeto.py no AppTest do Streamlit com uma DUIMP sintética de
+bench_xml_template.py (grade montada) e um relatório Sigraweb sintético
+de bench_itens.py já na sessão, como depois do upload e da vinculação.
+Mede a mediana de REPETICOES reruns (o que qualquer interação com um
+widget dispara) com cada módulo da barra lateral selecionado.
+
+O AppTest compila o script de novo a cada run (o servidor guarda o
+bytecode em cache), por isso o tempo medido é só o da execução do
+script: o exec() do ScriptRunner é cronometrado.
+
+Uso: python benchmarks/bench_rerun.py
+"""
+import os
+import statistics
+import sys
+import time
+import warnings
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, AQUI)
+sys.path.insert(0, os.path.join(AQUI, ".."))
+
+import streamlit.runtime.scriptrunner.script_runner as script_runner  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import bench_itens  # noqa: E402
+import bench_xml_template as base  # noqa: E402
+
+import engine  # noqa: E402
+
+TAMANHOS = [2_000, 10_000]
+REPETICOES = 5
+EXECUCOES = []
+
+
+def _exec_cronometrado(code, namespace):
+    inicio = time.perf_counter()
+    try:
+        exec(code, namespace)
+    finally:
+        EXECUCOES.append(time.perf_counter() - inicio)
+
+
+script_runner.exec = _exec_cronometrado
+
+
+def sessao(n):
+    p = base.gerar_parser(n)
+    grade = engine.montar_grade_duimp(p)
+    for campo in base.CAMPOS_GRADE:
+        grade[campo] = [it[campo] for it in p.items]
+
+    sgw = engine.SigrawebPDFParser()
+    sgw.documento["itens"] = engine.ItemTable.from_records(
+        (sgw._parse_item_block(str(i), bench_itens.bloco_sigraweb(i)) for i in range(1, n + 1)),
+        engine.SIGRAWEB_ITEM_SCHEMA,
+    )
+    sgw._calculate_totals()
+    return {"parsed_duimp": p, "merged_df": grade, "parsed_sigraweb": sgw.documento}
+
+
+def medir(at):
+    at.run()   # aquecimento: primeira execução do módulo na sessão
+    del EXECUCOES[:]
+    for _ in range(REPETICOES):
+        at.run()
+    tempos = list(EXECUCOES)
+    assert not at.exception, [e.value for e in at.exception]
+    return statistics.median(tempos)
+
+
+def main():
+    warnings.filterwarnings("ignore")
+    print(f"{'adições':>8} {'módulo':<28} {'script (s)':>11}")
+    for n in TAMANHOS:
+        at = AppTest.from_file(os.path.join(AQUI, "..", "projeto.py"), default_timeout=300)
+        at.run()
+        for chave, valor in sessao(n).items():
+            at.session_state[chave] = valor
+        at.run()
+        if at.sidebar.radio:
+            modulos = at.sidebar.radio[0].options
+            for modulo in modulos:
+                at.sidebar.radio[0].set_value(modulo).run()
+                print(f"{n:>8} {modulo:<28} {medir(at):>11.3f}")
+        else:
+            print(f"{n:>8} {'(todas as abas)':<28} {medir(at):>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
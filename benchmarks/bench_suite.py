@@ -0,0 +1,322 @@
+"""
+Suíte de benchmarks dos três módulos com o corpus sintético de corpus.py.
+
+Mede vazão (unidades por segundo) e pico de memória de cada etapa:
+
+    txt         filtro de TXT SPED (engine.txt.filtrar_txt)     linhas
+    cte         leitura de uma pasta de CT-es (process_paths)   arquivos
+    duimp       leitura do Extrato DUIMP (parse_duimp_file)      páginas
+    sigraweb    leitura do Sigraweb (parse_sigraweb_file)        páginas
+    vinculacao  grade DUIMP x itens Sigraweb (vincular_dados)   adições
+    xml         XML integrado em streaming (build_stream)        adições
+
+O tamanho de cada cenário é o número de linhas, arquivos ou adições do
+corpus; os PDFs têm corpus.LINHAS_POR_PAGINA linhas por página e a vazão
+deles é medida em páginas. O corpus é
+gerado antes da medição, numa pasta temporária ou em --corpus PASTA (que é
+reaproveitada entre execuções). Cada medição roda num subprocesso novo: o
+tempo é o menor de até REPETICOES execuções e o pico de memória é o maior
+RSS amostrado (psutil) durante a primeira, menos o RSS do início, o que
+inclui a memória de PyMuPDF e pdfplumber fora do alocador do Python.
+
+Os resultados são comparados com benchmarks/baseline.json: vazão abaixo de
+(1 - TOLERANCIA) da base ou pico acima de (1 + TOLERANCIA) x base + FOLGA_MB
+contam como regressão e o script sai com código 1. --salvar-base grava os
+resultados desta execução como a nova base (a base vale para a máquina onde
+foi gerada; o ambiente fica registrado no arquivo).
+
+Uso: python benchmarks/bench_suite.py [--rapido] [--cenario NOME ...] [--corpus PASTA] [--salvar-base]
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, AQUI)
+sys.path.insert(0, os.path.join(AQUI, ".."))
+
+import corpus  # noqa: E402
+
+BASE = os.path.join(AQUI, "baseline.json")
+
+CENARIOS = {
+    # nome: (unidade, tamanhos)
+    "txt":        ("linhas",   [200_000, 1_000_000]),
+    "cte":        ("arquivos", [500, 5_000]),
+    "duimp":      ("páginas",  [300, 3_000]),
+    "sigraweb":   ("páginas",  [50, 300]),
+    "vinculacao": ("adições",  [2_000, 20_000]),
+    "xml":        ("adições",  [1_000, 10_000]),
+}
+
+# Importadas antes da medição: o engine só as carrega no primeiro uso
+PRECARREGAR = ("numpy", "pandas", "lxml.etree", "fitz", "pdfplumber", "chardet", "psutil")
+
+REPETICOES = 3
+TEMPO_REPETICOES = 2.0   # segundos: acima disso a etapa roda uma vez só
+AMOSTRAGEM = 0.005       # intervalo da amostragem do RSS
+TOLERANCIA = 0.25
+FOLGA_MB = 5.0
+
+
+# ------------------------------------------------------------------------------
+# Corpus de cada cenário (processo principal)
+# ------------------------------------------------------------------------------
+def preparar(cenario, n, raiz):
+    """Gera (uma vez) os arquivos do cenário em raiz/cenario_n e devolve a pasta."""
+    pasta = os.path.join(raiz, f"{cenario}_{n}")
+    pronto = os.path.join(pasta, ".pronto")
+    if os.path.exists(pronto):
+        return pasta
+    os.makedirs(pasta, exist_ok=True)
+    if cenario == "txt":
+        with open(os.path.join(pasta, "sped.txt"), "wb") as f:
+            f.write(corpus.gerar_txt_sped(n))
+    elif cenario == "cte":
+        corpus.gerar_ctes(pasta, n)
+    elif cenario == "duimp":
+        corpus.gerar_duimp_pdf(os.path.join(pasta, "duimp.pdf"), n)
+    elif cenario == "sigraweb":
+        corpus.gerar_sigraweb_pdf(os.path.join(pasta, "sigraweb.pdf"), n)
+    open(pronto, "w").close()
+    return pasta
+
+
+# ------------------------------------------------------------------------------
+# Etapas (subprocesso): a preparação não entra na medição
+# ------------------------------------------------------------------------------
+def etapa_txt(engine, n, pasta):
+    with open(os.path.join(pasta, "sped.txt"), "rb") as f:
+        conteudo = f.read()
+
+    def executar():
+        texto, total = engine.filtrar_txt(conteudo)
+        assert total == n and texto.count("\n") < n - 1, "filtro não removeu as linhas esperadas"
+        return total
+    return executar
+
+
+def etapa_cte(engine, n, pasta):
+    caminhos = sorted(glob.glob(os.path.join(pasta, "*.xml")))
+
+    def executar():
+        resultados = engine.CTeProcessorDirect().process_paths(caminhos)
+        assert resultados["success"] == n, resultados["messages"][:3]
+        return n
+    return executar
+
+
+def etapa_duimp(engine, n, pasta):
+    caminho = os.path.join(pasta, "duimp.pdf")
+
+    def executar():
+        p = engine.parse_duimp_file(caminho)
+        assert len(p.items) == n, f"{len(p.items)} adições lidas de {n}"
+        return p.stats["pages"]
+    return executar
+
+
+def etapa_sigraweb(engine, n, pasta):
+    import fitz   # PyMuPDF, só para contar as páginas
+
+    caminho = os.path.join(pasta, "sigraweb.pdf")
+    with fitz.open(caminho) as doc:
+        paginas = doc.page_count
+
+    def executar():
+        documento = engine.parse_sigraweb_file(caminho)
+        assert len(documento["itens"]) == n, f"{len(documento['itens'])} adições lidas de {n}"
+        return paginas
+    return executar
+
+
+def etapa_vinculacao(engine, n, pasta):
+    import random
+
+    import bench_itens
+
+    random.seed(n)
+    p = SimpleNamespace(items=engine.ItemTable.from_records(
+        [bench_itens.item_duimp(i) for i in range(1, n + 1)], engine.DUIMP_ITEM_SCHEMA))
+    grade = engine.montar_grade_duimp(p)
+    sgw = engine.SigrawebPDFParser()
+    itens = engine.ItemTable.from_records(
+        (sgw._parse_item_block(str(i), bench_itens.bloco_sigraweb(i)) for i in range(1, n + 1)),
+        engine.SIGRAWEB_ITEM_SCHEMA,
+    )
+
+    def executar():
+        _, vinculados, _ = engine.vincular_dados(grade, itens)
+        assert vinculados == n, f"{vinculados} adições vinculadas de {n}"
+        return n
+    return executar
+
+
+def etapa_xml(engine, n, pasta):
+    import bench_xml_template as base
+
+    p = base.gerar_parser(n)
+
+    def executar():
+        with engine.XMLBuilder(p).build_stream(user_inputs=base.USER_INPUTS) as f:
+            for _ in iter(lambda: f.read(1024 * 1024), b""):
+                pass
+        return n
+    return executar
+
+
+ETAPAS = {
+    "txt": etapa_txt, "cte": etapa_cte, "duimp": etapa_duimp, "sigraweb": etapa_sigraweb,
+    "vinculacao": etapa_vinculacao, "xml": etapa_xml,
+}
+
+
+class PicoRSS:
+    """Maior RSS do processo enquanto o bloco executa (amostrado numa thread)."""
+
+    def __init__(self):
+        import psutil
+
+        self._processo = psutil.Process()
+        self._parar    = threading.Event()
+        self.inicial   = self.pico = 0
+
+    def _amostrar(self):
+        while not self._parar.wait(AMOSTRAGEM):
+            self.pico = max(self.pico, self._processo.memory_info().rss)
+
+    def __enter__(self):
+        self.inicial = self.pico = self._processo.memory_info().rss
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        self.pico = max(self.pico, self._processo.memory_info().rss)
+
+    @property
+    def mb(self):
+        return (self.pico - self.inicial) / 1e6
+
+
+def executar(cenario, n, pasta):
+    """Roda no subprocesso e imprime o resultado em JSON."""
+    import importlib
+    import logging
+
+    import engine
+
+    logging.disable(logging.WARNING)
+    for modulo in PRECARREGAR:
+        importlib.import_module(modulo)
+    executar_etapa = ETAPAS[cenario](engine, n, pasta)
+    with PicoRSS() as memoria:
+        inicio = time.perf_counter()
+        unidades = executar_etapa()
+        segundos = time.perf_counter() - inicio
+    gasto = segundos
+    for _ in range(REPETICOES - 1):
+        if gasto > TEMPO_REPETICOES:
+            break
+        inicio = time.perf_counter()
+        executar_etapa()
+        tempo = time.perf_counter() - inicio
+        segundos, gasto = min(segundos, tempo), gasto + tempo
+    print(json.dumps({
+        "unidades": unidades, "segundos": round(segundos, 4),
+        "por_segundo": round(unidades / segundos, 1), "pico_mb": round(memoria.mb, 1),
+    }))
+
+
+def medir(cenario, n, raiz):
+    pasta = preparar(cenario, n, raiz)
+    saida = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--executar", cenario, str(n), pasta],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+# ------------------------------------------------------------------------------
+# Comparação com a base
+# ------------------------------------------------------------------------------
+def comparar(resultado, base):
+    """Devolve (texto da comparação, lista de regressões)."""
+    if not base:
+        return "sem base", []
+    vazao = resultado["por_segundo"] / base["por_segundo"]
+    falhas = []
+    if vazao < 1 - TOLERANCIA:
+        falhas.append(f"vazão {vazao:.0%} da base")
+    if resultado["pico_mb"] > base["pico_mb"] * (1 + TOLERANCIA) + FOLGA_MB:
+        falhas.append(f"pico {resultado['pico_mb']:.1f} MB (base {base['pico_mb']:.1f} MB)")
+    return f"{vazao:.2f}x vazão, {resultado['pico_mb'] - base['pico_mb']:+.1f} MB", falhas
+
+
+def ambiente():
+    return {
+        "python": platform.python_version(), "plataforma": platform.platform(),
+        "cpus": os.cpu_count(), "data": datetime.now().strftime("%Y-%m-%d"),
+    }
+
+
+def main():
+    if "--executar" in sys.argv:
+        i = sys.argv.index("--executar")
+        executar(sys.argv[i + 1], int(sys.argv[i + 2]), sys.argv[i + 3])
+        return
+
+    args = argparse.ArgumentParser(description="Benchmarks dos três módulos com corpus sintético.")
+    args.add_argument("--cenario", action="append", choices=list(CENARIOS), help="só este cenário (pode repetir)")
+    args.add_argument("--rapido", action="store_true", help="só o menor tamanho de cada cenário")
+    args.add_argument("--corpus", help="pasta onde o corpus é gerado e reaproveitado")
+    args.add_argument("--salvar-base", action="store_true", help=f"grava os resultados em {os.path.basename(BASE)}")
+    args = args.parse_args()
+
+    base = {"ambiente": {}, "resultados": {}}
+    if os.path.exists(BASE):
+        with open(BASE, encoding="utf-8") as f:
+            base = json.load(f)
+
+    with tempfile.TemporaryDirectory() as temporaria:
+        raiz = args.corpus or temporaria
+        print(f"{'cenário':<11} {'tamanho':>9} {'unidades':>18} {'tempo (s)':>10} {'por segundo':>12} "
+              f"{'pico (MB)':>10}  comparação com a base")
+        regressoes = []
+        for cenario in args.cenario or CENARIOS:
+            unidade, tamanhos = CENARIOS[cenario]
+            for n in tamanhos[:1] if args.rapido else tamanhos:
+                resultado = medir(cenario, n, raiz)
+                anterior = base["resultados"].get(cenario, {}).get(str(n))
+                texto, falhas = comparar(resultado, anterior)
+                unidades = f"{resultado['unidades']} {unidade}"
+                print(f"{cenario:<11} {n:>9} {unidades:>18} {resultado['segundos']:>10.3f} "
+                      f"{resultado['por_segundo']:>12,.0f} {resultado['pico_mb']:>10.1f}  {texto}")
+                regressoes += [f"{cenario} {n}: {falha}" for falha in falhas]
+                base["resultados"].setdefault(cenario, {})[str(n)] = resultado
+
+    if args.salvar_base:
+        base["ambiente"] = ambiente()
+        with open(BASE, "w", encoding="utf-8") as f:
+            json.dump(base, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nbase gravada em {BASE}")
+        return
+    for regressao in regressoes:
+        print(f"REGRESSÃO: {regressao}")
+    sys.exit(1 if regressoes else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark da validação de layout do XML integrado (XmlLayoutValidator).
+
+1. O arquivo-ouro não pode ter violações; com defeitos injetados (campo
+   removido de uma adição, valorTotalCondicaoVenda com 11 dígitos, número
+   no formato brasileiro, tag do rodapé ausente) cada defeito tem de
+   aparecer com a adição correspondente.
+2. Tempo de build_stream() sem e com validação durante a geração, e de
+   validar_xml_duimp() sobre o arquivo já gerado, em 2k e 10k adições.
+
+Uso: python benchmarks/bench_validacao.py
+"""
+import os
+import sys
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, AQUI)
+sys.path.insert(0, os.path.join(AQUI, ".."))
+
+import bench_xml_template as base  # noqa: E402
+
+import engine  # noqa: E402
+
+TAMANHOS = [2_000, 10_000]
+
+
+def conferir_defeitos():
+    with open(base.OURO, "rb") as f:
+        ouro = f.read()
+    assert engine.validar_xml_duimp(ouro) == [], "arquivo-ouro com violações"
+
+    defeituoso = (
+        ouro.replace(b"<cideValorDevido>000000000000000</cideValorDevido>", b"", 1)
+            .replace(b"<valorTotalCondicaoVenda>000000246800000</valorTotalCondicaoVenda>",
+                     b"<valorTotalCondicaoVenda>00246800000</valorTotalCondicaoVenda>")
+            .replace(b"<cargaPesoBruto>000000123450000</cargaPesoBruto>", b"<cargaPesoBruto>12,5</cargaPesoBruto>")
+            .replace(b"<armazenamentoSetor>002</armazenamentoSetor>", b"")
+    )
+    encontrados = {(v["adicao"], v["tag"]) for v in engine.validar_xml_duimp(defeituoso)}
+    esperados = {
+        ("001", "adicao"), ("002", "adicao/valorTotalCondicaoVenda"),
+        ("", "duimp/cargaPesoBruto"), ("", "duimp/armazenamentoSetor"),
+    }
+    assert encontrados == esperados, f"violações inesperadas: {encontrados ^ esperados}"
+    print("arquivo-ouro e defeitos injetados OK")
+
+
+def medir(func):
+    inicio = time.perf_counter()
+    resultado = func()
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    conferir_defeitos()
+
+    print(f"\n{'adições':>8} {'stream (s)':>11} {'+validação (s)':>15} {'arquivo (s)':>12} {'violações':>10}")
+    for n in TAMANHOS:
+        parser = base.gerar_parser(n)
+        t_stream, xml_file = medir(lambda: engine.XMLBuilder(parser).build_stream(user_inputs=base.USER_INPUTS))
+
+        validator = engine.XmlLayoutValidator()
+        t_junto, _ = medir(lambda: engine.XMLBuilder(parser).build_stream(
+            user_inputs=base.USER_INPUTS, validator=validator).close())
+        t_arquivo, violacoes = medir(lambda: engine.validar_xml_duimp(xml_file))
+        assert violacoes == validator.finish(), "validação durante a geração divergente da validação do arquivo"
+        print(f"{n:>8} {t_stream:>11.2f} {t_junto:>15.2f} {t_arquivo:>12.2f} {len(violacoes):>10}")
+
+
+if __name__ == "__main__":
+    main()
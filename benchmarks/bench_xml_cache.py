@@ -0,0 +1,79 @@
+"""
+Benchmark da geração incremental do XML (AdicaoFragmentCache).
+
+Gera o XML da declaração sintética de bench_xml_template.py uma vez com
+cache e, em seguida, depois de edições de uma a três células (valores de
+tributo, NaN, descrição, part number). A cada edição confere que o XML e
+as violações de layout são idênticos aos da geração completa, sem cache,
+e mede quanto tempo a geração levou e quantas adições foram montadas.
+
+Uso: python benchmarks/bench_xml_cache.py
+"""
+import os
+import random
+import sys
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, AQUI)
+sys.path.insert(0, os.path.join(AQUI, ".."))
+
+import bench_xml_template as base  # noqa: E402
+
+import engine  # noqa: E402
+
+TAMANHOS = [1_000, 5_000, 10_000]
+EDICOES = 5
+
+
+def montar_grade(parser):
+    grade = engine.montar_grade_duimp(parser)
+    for campo in base.CAMPOS_GRADE:
+        grade[campo] = [it[campo] for it in parser.items]
+    return grade
+
+
+def gerar(parser, grade, cache=None):
+    validator = engine.XmlLayoutValidator()
+    inicio = time.perf_counter()
+    with engine.gerar_xml_integrado(parser, grade, base.USER_INPUTS, validator=validator, cache=cache) as f:
+        xml = f.read()
+    return time.perf_counter() - inicio, xml, validator.finish()
+
+
+def editar(grade, n):
+    grade = grade.copy()
+    for _ in range(random.randint(1, 3)):
+        linha = random.randrange(n)
+        coluna = random.choice(["II (R$)", "Frete (R$)", "COFINS (R$)", "NUMBER", "descricao"])
+        if coluna in ("NUMBER", "descricao"):
+            grade.at[linha, coluna] = f"EDITADO {random.random():.6f}"
+        else:
+            grade.at[linha, coluna] = random.choice([0.1, 12345.675, float("nan"), 1e9])
+    return grade
+
+
+def main():
+    random.seed(20260105)
+    print(f"{'adições':>8} {'completa (s)':>13} {'1ª c/ cache (s)':>16} {'edição (s)':>11} {'montadas':>9}")
+    for n in TAMANHOS:
+        parser = base.gerar_parser(n)
+        grade = montar_grade(parser)
+        cache = engine.AdicaoFragmentCache()
+        t_completa, xml, violacoes = gerar(parser, grade)
+        t_primeira, xml_cache, violacoes_cache = gerar(parser, grade, cache)
+        assert (xml_cache, violacoes_cache) == (xml, violacoes), "cache divergente na primeira geração"
+
+        tempos, montadas = [], []
+        for _ in range(EDICOES):
+            grade = editar(grade, n)
+            t, xml_cache, violacoes_cache = gerar(parser, grade, cache)
+            _, xml, violacoes = gerar(parser, grade)
+            assert (xml_cache, violacoes_cache) == (xml, violacoes), "cache divergente após edição"
+            tempos.append(t)
+            montadas.append(cache.rendered)
+        print(f"{n:>8} {t_completa:>13.3f} {t_primeira:>16.3f} {min(tempos):>11.3f} {max(montadas):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark do XML em streaming (XMLBuilder.build_stream).
+
+Para cada tamanho, roda build() e build_stream() em subprocessos separados
+e compara o pico de memória (ru_maxrss) e o tempo; depois confere que os
+dois geram exatamente os mesmos bytes. Usa a declaração sintética de
+bench_xml_template.py. Só Linux/macOS (módulo resource).
+
+Uso: python benchmarks/bench_xml_stream.py
+"""
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, AQUI)
+sys.path.insert(0, os.path.join(AQUI, ".."))
+
+TAMANHOS = [2_000, 10_000]
+
+
+def executar(modo, n):
+    """Roda no subprocesso: monta o XML e devolve hash, tamanho, tempo e pico de RSS."""
+    import bench_xml_template as base
+    import engine
+
+    parser = base.gerar_parser(n)
+    rss_inicial = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    inicio = time.perf_counter()
+    builder = engine.XMLBuilder(parser)
+    if modo == "build":
+        xml = builder.build(user_inputs=base.USER_INPUTS)
+        digest, tamanho = hashlib.sha256(xml).hexdigest(), len(xml)
+    else:
+        h = hashlib.sha256()
+        tamanho = 0
+        with builder.build_stream(user_inputs=base.USER_INPUTS) as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(bloco)
+                tamanho += len(bloco)
+        digest = h.hexdigest()
+    segundos = time.perf_counter() - inicio
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    escala = 1 if sys.platform == "darwin" else 1024   # Linux informa em KiB
+    print(json.dumps({
+        "sha256": digest, "bytes": tamanho, "segundos": segundos,
+        "pico_mb": (pico - rss_inicial) * escala / 1e6,
+    }))
+
+
+def medir(modo, n):
+    saida = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--executar", modo, str(n)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    if "--executar" in sys.argv:
+        i = sys.argv.index("--executar")
+        executar(sys.argv[i + 1], int(sys.argv[i + 2]))
+        return
+
+    print(f"{'adições':>8} {'XML (MB)':>9} {'build +MB':>10} {'stream +MB':>11} "
+          f"{'build (s)':>10} {'stream (s)':>11}")
+    for n in TAMANHOS:
+        normal = medir("build", n)
+        stream = medir("stream", n)
+        assert normal["sha256"] == stream["sha256"], "build_stream() divergente de build()"
+        print(f"{n:>8} {normal['bytes'] / 1e6:>9.1f} {normal['pico_mb']:>10.1f} {stream['pico_mb']:>11.1f} "
+              f"{normal['segundos']:>10.2f} {stream['segundos']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark do modelo pré-compilado de <adicao> no XMLBuilder.
+
+1. Tempo por adição: montagem antiga (um SubElement por campo de
+   ADICAO_FIELDS_ORDER) contra deepcopy do modelo + texto só nos slots.
+2. Tempo do build() completo em 1k e 5k adições.
+
+A declaração sintética (itens com campos ausentes, texto em vez de número,
+fornecedor sem endereço etc.) também gera o arquivo-ouro
+benchmarks/golden/duimp_integrado.xml, conferido em tests/test_xml_golden.py;
+--atualizar-ouro o regrava.
+
+Uso: python benchmarks/bench_xml_template.py [--atualizar-ouro]
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(AQUI, ".."))
+
+from lxml import etree  # noqa: E402
+
+import engine  # noqa: E402
+
+OURO = os.path.join(AQUI, "golden", "duimp_integrado.xml")
+
+USER_INPUTS = {
+    "quantidadeVolume": "00003", "cargaDataChegada": "20260105", "dataDesembaraco": "20260110",
+    "dataRegistro": "20260110", "conhecimentoCargaEmbarqueData": "20251210",
+    "cargaPesoBruto": "000000123450000", "cargaPesoLiquido": "000000100000000",
+    "agenciaPagamento": "3715", "bancoPagamento": "341", "valorReceita7811": "000000000015423",
+    "localDescargaTotalDolares": "000000000000000", "localDescargaTotalReais": "000000000000000",
+    "localEmbarqueTotalDolares": "000000000000000", "localEmbarqueTotalReais": "000000000000000",
+    "conhecimentoCargaId": "CE999", "conhecimentoCargaIdMaster": "CE888",
+}
+
+CAMPOS_GRADE = [
+    "Frete (R$)", "Seguro (R$)", "Aduaneiro (R$)",
+    "II (R$)", "II Base (R$)", "II Alíq. (%)",
+    "IPI (R$)", "IPI Base (R$)", "IPI Alíq. (%)",
+    "PIS (R$)", "PIS Base (R$)", "PIS Alíq. (%)",
+    "COFINS (R$)", "COFINS Base (R$)", "COFINS Alíq. (%)",
+]
+
+
+def gerar_parser(n):
+    itens = []
+    for i in range(1, n + 1):
+        item = {
+            "numeroAdicao": str(i).zfill(3),
+            "ncm": "8302.42.00" if i % 7 else "",
+            "paisOrigem": "ALEMANHA" if i % 5 else "ITÁLIA",
+            "unidade": "PECA" if i % 3 else "quilograma líquido",
+            "moeda": "EURO/COM.EUROPEIA",
+            "fornecedor_raw": f"{i} - HAFELE SE & CO KG" if i % 4 else "FORNECEDOR SEM CÓDIGO",
+            "endereco_raw": "ADOLF-HAFELE-STRASSE, 2 - NAGOLD" if i % 6 else "",
+            "descricao": f"DOBRADIÇA <{i}> & CIA\nLINHA 2",
+            "desc_complementar": "AÇO INOX",
+            "NUMBER": f"PN-{i}" if i % 9 else "",
+            "quantidade": i * 1.5,
+            "quantidade_comercial": None if i % 10 == 0 else i * 3.0,
+            "pesoLiq": i * 0.125 if i % 8 else None,
+            "valorUnit": 12.3456789,
+            "valorTotal": "1.234,56" if i % 11 == 0 else i * 12.34,
+        }
+        for j, campo in enumerate(CAMPOS_GRADE):
+            item[campo] = 0.0 if (i + j) % 13 == 0 else round(i * 0.37 + j, 2)
+        itens.append(item)
+    return SimpleNamespace(
+        header={"numeroDUIMP": "25BR0000123456-7/0001", "cnpj": "12.345.678/0001-90",
+                "nomeImportador": "HAFELE BRASIL LTDA", "pesoBruto": 1234.5, "pesoLiquido": 1000.0,
+                "urf": "0917800", "paisProcedencia": "Alemanha"},
+        items=itens,
+    )
+
+
+def construir(n, user_inputs=USER_INPUTS):
+    return engine.XMLBuilder(gerar_parser(n)).build(user_inputs=user_inputs)
+
+
+def atualizar_ouro():
+    os.makedirs(os.path.dirname(OURO), exist_ok=True)
+    with open(OURO, "wb") as f:
+        f.write(construir(13))
+    print(f"arquivo-ouro atualizado: {OURO}")
+
+
+def adicao_legado(parent, valores):
+    """Montagem anterior: um SubElement por campo, mantida só como referência."""
+    adicao = etree.SubElement(parent, "adicao")
+    for field in engine.ADICAO_FIELDS_ORDER:
+        tag_name = field["tag"]
+        if field.get("type") == "complex":
+            sub = etree.SubElement(adicao, tag_name)
+            for child in field["children"]:
+                etree.SubElement(sub, child["tag"]).text = valores.get(child["tag"], child["default"])
+        else:
+            etree.SubElement(adicao, tag_name).text = valores.get(tag_name, field["default"])
+
+
+def medir(func, repeticoes=3):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    if "--atualizar-ouro" in sys.argv:
+        atualizar_ouro()
+
+    valores = {tag: "1" for tag in getattr(engine.xml_builder, "ADICAO_SLOT_TAGS", ())}
+    n = 5_000
+    t_legado = medir(lambda: [adicao_legado(etree.Element("duimp"), valores) for _ in range(n)])
+    print(f"\nmontagem antiga: {t_legado / n * 1e6:8.1f} µs/adição")
+    if hasattr(engine.xml_builder, "ADICAO_SLOT_TAGS"):
+        def novo():
+            parent = etree.Element("duimp")
+            for _ in range(n):
+                engine.xml_builder.append_adicao(parent, valores)
+        t_novo = medir(novo)
+        print(f"modelo + slots:  {t_novo / n * 1e6:8.1f} µs/adição ({t_legado / t_novo:.1f}x)")
+
+    print(f"\n{'adições':>8} {'build() (s)':>12}")
+    for n in [1_000, 5_000]:
+        parser = gerar_parser(n)
+        t = medir(lambda: engine.XMLBuilder(parser).build(user_inputs=USER_INPUTS))
+        print(f"{n:>8} {t:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
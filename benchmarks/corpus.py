@@ -0,0 +1,204 @@
+"""
+Corpus sintético para os benchmarks dos três módulos do app.
+
+- TXT: relatório SPED com cabeçalhos "SPED EFD-ICMS/IPI", linhas de
+  separação e termos abreviados pelo filtro (engine.txt). Só ASCII: a
+  detecção de encoding varia entre versões do chardet com poucos acentos.
+- CT-e: XMLs nas variantes de namespace que o CTeProcessorDirect lê
+  (namespace padrão, prefixo cte: e sem namespace), alternando os tipos de
+  peso (PESO BRUTO, PESO BASE DE CALCULO...) e os formatos de data.
+- DUIMP: Extrato da Duimp em PDF (PyMuPDF), com cabeçalho, rodapé e
+  contador de páginas como no documento do Siscomex.
+- Sigraweb: "Conferência do Processo Detalhado" em PDF, um bloco por adição.
+
+Os PDFs têm LINHAS_POR_PAGINA linhas por página (configurável), então o
+número de páginas acompanha o de itens. Os valores variam com o número do
+item e são determinísticos: o mesmo tamanho gera sempre os mesmos arquivos.
+
+Uso: python benchmarks/corpus.py PASTA [--itens N] [--ctes N] [--linhas-txt N]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+LINHAS_POR_PAGINA = 45
+CTE_VARIANTES = ("padrao", "prefixo", "sem_namespace")
+CTE_TIPOS_PESO = ("PESO BRUTO", "PESO BASE DE CALCULO", "PESO BASE CÁLCULO", "PESO", "M3")
+CTE_NAMESPACE = "http://www.portalfiscal.inf.br/cte"
+
+
+def br(valor, casas=2):
+    return f"{valor:,.{casas}f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+# ------------------------------------------------------------------------------
+# TXT (SPED)
+# ------------------------------------------------------------------------------
+def gerar_txt_sped(linhas: int) -> bytes:
+    """Relatório com `linhas` linhas; cerca de 1 em 10 é removida pelo filtro padrão."""
+    historicos = ("IMPOSTO IMPORTACAO", "TAXA SICOMEX", "FRETE INTERNACIONAL", "SEGURO INTERNACIONAL",
+                  "MERCADORIA PARA REVENDA", "DESPESAS ADUANEIRAS")
+    saida = []
+    for i in range(linhas):
+        if i % 60 == 0:
+            saida.append(f"SPED EFD-ICMS/IPI - Pagina {i // 60 + 1} - HAFELE BRASIL LTDA")
+        elif i % 60 == 1 or i % 60 == 59:
+            saida.append("-" * 120)
+        else:
+            saida.append(
+                f"|C170|{i:08d}|8302{i % 10000:04d}|{historicos[i % len(historicos)]}|"
+                f"{br(i * 1.37)}|{br(i * 0.16)}|{br(i * 0.0975)}|CFOP 3102|"
+            )
+    return ("\r\n".join(saida) + "\r\n").encode("ascii")
+
+
+# ------------------------------------------------------------------------------
+# CT-e
+# ------------------------------------------------------------------------------
+def gerar_cte_xml(i: int, variante: str = "padrao") -> bytes:
+    tipo = CTE_TIPOS_PESO[i % len(CTE_TIPOS_PESO)]
+    emissao = f"2026-01-{i % 28 + 1:02d}T10:00:00-03:00" if i % 4 else f"{i % 28 + 1:02d}/01/2026"
+    chave = f"3526011234567800019055001{i:09d}1{i % 10:09d}"[:44]
+    corpo = (
+        f"<CTe><infCte Id=\"CTe{chave}\" versao=\"4.00\">"
+        f"<ide><cUF>35</cUF><nCT>{i}</nCT><serie>1</serie><dhEmi>{emissao}</dhEmi>"
+        f"<cMunIni>3548500</cMunIni><UFIni>SP</UFIni><cMunFim>4106902</cMunFim><UFFim>PR</UFFim></ide>"
+        f"<emit><CNPJ>12345678000190</CNPJ><xNome>TRANSPORTADORA {i % 17}</xNome></emit>"
+        f"<rem><xNome>HAFELE SE &amp; CO KG</xNome></rem>"
+        f"<dest><CNPJ>98765432000110</CNPJ><xNome>HAFELE BRASIL LTDA</xNome>"
+        f"<enderDest><xLgr>RUA DAS INDUSTRIAS</xLgr><nro>{i % 900 + 1}</nro><xBairro>CIC</xBairro>"
+        f"<cMun>4106902</cMun><xMun>CURITIBA</xMun><CEP>81000000</CEP><UF>PR</UF></enderDest></dest>"
+        f"<vPrest><vTPrest>{i * 3.17 % 5000 + 100:.2f}</vTPrest></vPrest>"
+        f"<infCTeNorm><infCarga><vCarga>{i * 41.5:.2f}</vCarga>"
+        f"<infQ><cUnid>01</cUnid><tpMed>{tipo}</tpMed><qCarga>{i * 1.25 % 9000 + 1:.4f}</qCarga></infQ>"
+        f"</infCarga><infDoc><infNFe><chave>{chave}</chave></infNFe></infDoc></infCTeNorm>"
+        f"</infCte></CTe>"
+    )
+    if variante == "padrao":
+        xml = f"<cteProc xmlns=\"{CTE_NAMESPACE}\" versao=\"4.00\">{corpo}</cteProc>"
+    elif variante == "prefixo":
+        # Mesmo documento com o prefixo cte: em todos os elementos
+        corpo = corpo.replace("</", "\0").replace("<", "<cte:").replace("\0", "</cte:")
+        xml = f"<cte:cteProc xmlns:cte=\"{CTE_NAMESPACE}\" versao=\"4.00\">{corpo}</cte:cteProc>"
+    else:
+        xml = f"<cteProc versao=\"4.00\">{corpo}</cteProc>"
+    return ('<?xml version="1.0" encoding="UTF-8"?>' + xml).encode("utf-8")
+
+
+def gerar_ctes(pasta: str, n: int):
+    """Grava `n` CT-es em `pasta`, alternando as variantes; devolve os caminhos."""
+    os.makedirs(pasta, exist_ok=True)
+    caminhos = []
+    for i in range(1, n + 1):
+        caminho = os.path.join(pasta, f"cte_{i:06d}.xml")
+        with open(caminho, "wb") as f:
+            f.write(gerar_cte_xml(i, CTE_VARIANTES[i % len(CTE_VARIANTES)]))
+        caminhos.append(caminho)
+    return caminhos
+
+
+# ------------------------------------------------------------------------------
+# PDFs (DUIMP e Sigraweb)
+# ------------------------------------------------------------------------------
+def _gravar_pdf(caminho, linhas, linhas_por_pagina, cabecalho=None, rodape=None):
+    import fitz   # PyMuPDF
+
+    doc = fitz.open()
+    paginas = [linhas[k:k + linhas_por_pagina] for k in range(0, len(linhas), linhas_por_pagina)]
+    for numero, conteudo in enumerate(paginas, start=1):
+        page = doc.new_page()
+        if cabecalho:
+            page.insert_text((40, 30), cabecalho, fontsize=9)
+        y = 60
+        for linha in conteudo:
+            page.insert_text((40, y), linha, fontsize=9)
+            y += 15
+        if rodape:
+            page.insert_text((40, 800), rodape, fontsize=8)
+            page.insert_text((520, 815), f"{numero} / {len(paginas)}", fontsize=8)
+    doc.save(caminho, garbage=1, deflate=True)
+    doc.close()
+    return len(paginas)
+
+
+def gerar_duimp_pdf(caminho: str, itens: int, linhas_por_pagina: int = LINHAS_POR_PAGINA) -> int:
+    """Extrato da Duimp com `itens` adições; devolve o número de páginas."""
+    linhas = [
+        "Extrato da Duimp 25BR00001234567/0001", "CNPJ do importador: 12.345.678/0001-90",
+        "Nome do importador:", "HAFELE BRASIL LTDA", "Peso Bruto (kg): 1.234,50000",
+        "Peso Liquido (kg): 1.000,00000", "Unidade de despacho: 0917800", "País de Procedência:", "ALEMANHA",
+    ]
+    for i in range(1, itens + 1):
+        linhas += [
+            f"Item {i:05d}", f"NCM: 8302.{i % 100:02d}.00", "País de origem:", ("ALEMANHA", "ITÁLIA", "ÁUSTRIA")[i % 3],
+            f"Código do Exportador Estrangeiro: EX{i % 50:02d} - HAFELE SE & CO KG",
+            "Endereço: ADOLF HAFELE STR, 2 - NAGOLD", "Dados da Mercadoria", "Aplicação: REVENDA",
+            f"Quantidade na unidade estatística: {br(i * 1.5, 5)}", "Unidade estatística: QUILOGRAMA LIQUIDO",
+            f"Quantidade na unidade comercializada: {br(i * 10, 5)}", f"Peso líquido (kg): {br(i * 0.75, 5)}",
+            "Moeda negociada: EURO/COM.EUROPEIA", f"Valor unitário na condição de venda: {br(1 + i % 97 / 7, 7)}",
+            f"Valor total na condição de venda: {br(i * 12.34)}",
+            f"Detalhamento do Produto: DOBRADIÇA DE AÇO MODELO {i}", "PARA MÓVEIS COM AMORTECEDOR",
+            f"Número de Identificação: {i:06d}", f"Descrição complementar da mercadoria: REF {i:06d}",
+        ]
+    return _gravar_pdf(
+        caminho, linhas, linhas_por_pagina,
+        cabecalho="Extrato da DUIMP 25BR00001234567",
+        rodape="Data, hora e responsável pela geração: 01/01/2026 SISTEMA",
+    )
+
+
+def gerar_sigraweb_pdf(caminho: str, itens: int, linhas_por_pagina: int = LINHAS_POR_PAGINA) -> int:
+    """Conferência do Processo Detalhado com `itens` adições; devolve o número de páginas."""
+    linhas = [
+        "Conferência do Processo Detalhado", "Número DI: 25BR00001234567", "SIGRAWEB: 12345",
+        "Identificação: ABC123", "CNPJ: 12.345.678/0001-90", "Nome da Empresa: HAFELE BRASIL LTDA",
+        "Data Registro:2026-01-10T10:00:00", "Peso Bruto:1.234,50", "Peso Líquido:1.000,00", "Volumes:3",
+        "Embalagem:PALLETS", "URF de Entrada: 0917800 PORTO DE PARANAGUA", "Via Transporte: Maritima",
+        "País de Procedência: 023 Alemanha", "Data de Embarque: 10/12/2025", "Data de Chegada no Brasil: 05/01/2026",
+        "Incoterms: FCA", "IDT. Conhecimento: CE999", "IDT. Master: CE888",
+        "1.000,00 200,00 150,00 700,00 154,23 Itau 3715 12345-6",
+        "Taxa EUR: 6,1234", "Taxa do Dólar: 5,4321", "FOB: 1.234,00 (EUR) ; 1.300,00 (USD); 7.000,00 (BRL)",
+    ]
+    for i in range(1, itens + 1):
+        base = i * 80.0
+        linhas += [
+            f"Informações da Adição Nº: {i:03d}", f"NR NCM: 8302{i % 100:02d}00",
+            f"Part Number: {i}.45.{i % 1000:03d} | Descrição: DOBRADIÇA DE AÇO MODELO {i}", "PARA MÓVEIS",
+            "Fabricante: HAFELE SE & CO KG", f"Peso Líquido: {br(i * 0.75)}", f"Qnt. Estatística: {br(i * 1.5, 5)}",
+            f"Quantidade: {br(i * 10, 5)} Unidade: peca", f"Valor FOB: {br(i * 12.34)} EUR",
+            f"Valor Aduaneiro USD: {br(i * 15.1)}", f"Valor Aduaneiro Real: {br(base)}",
+            f"Valor Unitário: {br(1 + i % 97 / 7, 7)}", f"Valor Frete: {br(i * 0.2)} USD",
+            f"Valor Frete Real: {br(i * 1.1)}", f"Valor Seguro: {br(i * 0.02)} USD",
+            f"Valor Seguro Real: {br(i * 0.11)}", "Moeda LI: EURO/COM.EUROPEIA",
+            f"País Origem: {('ALEMANHA', 'ITÁLIA', 'ÁUSTRIA')[i % 3]}", "Fornecedor: HAFELE SE & CO KG",
+            f"II 16,00 0,00 0,00 0,00 0,00 {br(base)} {br(base * 0.16)}",
+            f"IPI 9,75 0,00 0,00 0,00 {br(base * 1.16)} {br(base * 1.16 * 0.0975)}",
+            f"PIS 2,10 0,00 0,00 0,00 {br(base)} {br(base * 0.021)}",
+            f"COFINS 9,65 0,00 0,00 0,00 {br(base)} {br(base * 0.0965)}",
+        ]
+    return _gravar_pdf(caminho, linhas, linhas_por_pagina)
+
+
+def main():
+    args = argparse.ArgumentParser(description="Gera o corpus sintético dos benchmarks.")
+    args.add_argument("pasta")
+    args.add_argument("--itens", type=int, default=300, help="adições da DUIMP e do Sigraweb")
+    args.add_argument("--ctes", type=int, default=300, help="quantidade de XMLs de CT-e")
+    args.add_argument("--linhas-txt", type=int, default=100_000, help="linhas do TXT SPED")
+    args.add_argument("--linhas-por-pagina", type=int, default=LINHAS_POR_PAGINA)
+    args = args.parse_args()
+
+    os.makedirs(args.pasta, exist_ok=True)
+    with open(os.path.join(args.pasta, "sped.txt"), "wb") as f:
+        f.write(gerar_txt_sped(args.linhas_txt))
+    gerar_ctes(os.path.join(args.pasta, "ctes"), args.ctes)
+    paginas_duimp = gerar_duimp_pdf(os.path.join(args.pasta, "duimp.pdf"), args.itens, args.linhas_por_pagina)
+    paginas_sgw = gerar_sigraweb_pdf(os.path.join(args.pasta, "sigraweb.pdf"), args.itens, args.linhas_por_pagina)
+    print(f"{args.pasta}: sped.txt ({args.linhas_txt} linhas), ctes/ ({args.ctes} XMLs), "
+          f"duimp.pdf ({paginas_duimp} páginas), sigraweb.pdf ({paginas_sgw} páginas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Motor de processamento do Sistema de Processamento Unificado, sem Streamlit.
+
+Leitura do Extrato DUIMP e do relatório Sigraweb, vinculação, grade de
+conferência, geração e validação do XML, lote de declarações, CT-e e filtro
+de TXT. O app (projeto.py) é uma interface sobre estes módulos; o mesmo
+processamento roda em scripts, testes e na linha de comando
+(`python -m engine --help`).
+
+numpy, pandas, PyMuPDF, pdfplumber e lxml só são importados no primeiro uso
+(engine.lazy), então `import engine` é barato.
+"""
+from .batch import identificar_declaracao, normalizar_numero_declaracao, processar_lote, processar_par
+from .cte import CTeProcessorDirect
+from .duimp import DUIMP_ITEM_SCHEMA, DuimpPDFParser, montar_descricao_final
+from .grid import (
+    GRADE_COLUNAS_TOTAIS,
+    GRADE_TRIBUTOS,
+    VINCULO_COLUNAS,
+    GradeConferencia,
+    linhas_grade,
+    montar_grade_duimp,
+    vincular_dados,
+)
+from .instrumentation import RunProfile, record_run, span
+from .integrated import (
+    AdicaoFragmentCache,
+    gerar_xml_integrado,
+    nome_arquivo_xml,
+    parse_duimp_file,
+    parse_sigraweb_file,
+    xml_config_padrao,
+)
+from .items import ItemTable, itens_para_dataframe
+from .jobs import ParseJob, ParseJobHandle, ParseJobQueue
+from .memory import MemoryBudget, SpillableState, estimate_nbytes
+from .numeric import ExactSum, exact_float_sum, is_missing_number, parse_br_number
+from .parallel import ParseCancelled, call_in_process, imap_processes
+from .pool import PoolTask, WorkerPool
+from .progress import LogProgress, ProgressReporter
+from .snapshot import SessionSnapshot, listar_snapshots
+from .sigraweb import SIGRAWEB_ITEM_SCHEMA, SigrawebDocument, SigrawebPDFParser
+from .txt import PADROES_PADRAO, filtrar_txt
+from .uploads import spooled_upload
+from .validation import XmlLayoutValidator, campos_nao_lidos, validar_xml_duimp
+from .xml_builder import ADICAO_FIELDS_ORDER, BatchFormatter, DataFormatter, XMLBuilder
+
+__all__ = [
+    "ADICAO_FIELDS_ORDER", "DUIMP_ITEM_SCHEMA", "GRADE_COLUNAS_TOTAIS", "GRADE_TRIBUTOS",
+    "PADROES_PADRAO", "SIGRAWEB_ITEM_SCHEMA", "VINCULO_COLUNAS",
+    "AdicaoFragmentCache", "BatchFormatter", "CTeProcessorDirect", "DataFormatter", "DuimpPDFParser",
+    "ExactSum", "GradeConferencia", "ItemTable", "LogProgress", "MemoryBudget", "ParseCancelled",
+    "ParseJob", "ParseJobHandle", "ParseJobQueue", "PoolTask", "ProgressReporter", "RunProfile",
+    "SessionSnapshot", "SigrawebDocument", "SigrawebPDFParser", "SpillableState", "WorkerPool",
+    "XMLBuilder", "XmlLayoutValidator",
+    "call_in_process", "campos_nao_lidos", "estimate_nbytes", "exact_float_sum", "filtrar_txt",
+    "gerar_xml_integrado", "identificar_declaracao", "imap_processes", "is_missing_number",
+    "itens_para_dataframe", "linhas_grade", "listar_snapshots", "montar_descricao_final",
+    "montar_grade_duimp", "nome_arquivo_xml", "normalizar_numero_declaracao", "parse_br_number",
+    "parse_duimp_file", "parse_sigraweb_file", "processar_lote", "processar_par", "record_run", "span",
+    "spooled_upload", "validar_xml_duimp", "vincular_dados", "xml_config_padrao",
+]
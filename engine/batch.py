@@ -0,0 +1,174 @@
+"""Lote: várias DUIMPs + Sigraweb → ZIP de XMLs."""
+from __future__ import annotations
+
+import contextlib
+import functools
+import os
+import re
+import tempfile
+import time
+import zipfile
+from typing import Any, Dict, Tuple
+
+from .duimp import DuimpPDFParser, _duimp_extract_pages
+from .grid import montar_grade_duimp, vincular_dados
+from .instrumentation import record_run
+from .integrated import gerar_xml_integrado, nome_arquivo_xml, parse_duimp_file, parse_sigraweb_file, xml_config_padrao
+from .lazy import LazyModule
+from .parallel import imap_processes
+from .progress import LogProgress
+from .sigraweb import SigrawebPDFParser
+from .uploads import spooled_upload
+from .validation import XmlLayoutValidator, campos_nao_lidos
+from .xml_builder import XML_SPOOL_MAX_MEMORY
+
+pd         = LazyModule("pandas", "pd", globals())
+pdfplumber = LazyModule("pdfplumber", "pdfplumber", globals())
+
+
+LOTE_PAGINAS_IDENTIFICACAO = 2   # o número da DUIMP/DI fica no início do PDF
+LOTE_RELATORIO = "relatorio_lote.csv"
+
+
+def _linha_relatorio(numero="", **campos) -> Dict[str, Any]:
+    linha = {
+        "numero": numero, "arquivo_duimp": "", "arquivo_sigraweb": "", "status": "", "xml": "",
+        "adicoes": 0, "vinculados": 0, "nao_encontrados": "", "violacoes": 0, "segundos": 0.0,
+        "mensagem": "",
+    }
+    linha.update(campos)
+    return linha
+
+
+def normalizar_numero_declaracao(numero) -> str:
+    """'25BR0000123456-7/0001' (DUIMP) e '25BR00001234567' (DI) → '25BR00001234567'."""
+    return re.sub(r"[^0-9A-Z]", "", str(numero or "").split("/")[0].upper())
+
+
+def identificar_declaracao(kind: str, path: str) -> Tuple[str, str]:
+    """
+    Lê só as primeiras páginas do PDF e devolve (número normalizado, erro),
+    usando os mesmos extratores de cabeçalho da leitura completa.
+    """
+    try:
+        if kind == "duimp":
+            p = DuimpPDFParser(path)
+            stop = min(LOTE_PAGINAS_IDENTIFICACAO, p.doc.page_count)
+            p.doc.close()
+            p.full_text = "\n".join(_duimp_extract_pages(path, 0, stop, None))
+            p.extract_header()
+            numero = p.header.get("numeroDUIMP")
+        else:
+            with pdfplumber.open(path) as pdf:
+                textos = [page.extract_text() or "" for page in pdf.pages[:LOTE_PAGINAS_IDENTIFICACAO]]
+            parser = SigrawebPDFParser()
+            parser._extract_header(*(textos + ["", ""])[:2])
+            numero = parser.documento['cabecalho'].get('numeroDI')
+    except Exception as e:
+        return "", f"{type(e).__name__}: {e}"
+    numero = normalizar_numero_declaracao(numero)
+    return numero, "" if numero else "número da declaração não encontrado"
+
+
+def processar_par(duimp_path: str, sgw_path: str, xml_path: str) -> Dict[str, Any]:
+    """Leitura, vinculação e XML de uma declaração; erros voltam no próprio status."""
+    inicio = time.perf_counter()
+    status = {"status": "ok"}
+    try:
+        with record_run(f"Declaração {os.path.basename(duimp_path)}"):
+            p       = parse_duimp_file(duimp_path)
+            doc_sgw = parse_sigraweb_file(sgw_path)
+            grade, count, not_found = vincular_dados(montar_grade_duimp(p), doc_sgw['itens'])
+            validator = XmlLayoutValidator()
+            with open(xml_path, "wb") as out:
+                gerar_xml_integrado(p, grade, xml_config_padrao(doc_sgw['cabecalho']), out=out, validator=validator)
+            violacoes = campos_nao_lidos(p.slow_items) + validator.finish()
+        status.update(
+            xml=nome_arquivo_xml(p), adicoes=len(p.items), vinculados=count,
+            nao_encontrados=" ".join(str(n) for n in not_found), violacoes=len(violacoes),
+        )
+        mensagens = []
+        if p.slow_items:
+            mensagens.append(f"{len(p.slow_items)} item(ns) da DUIMP excederam o tempo de leitura")
+        if violacoes:
+            primeira = violacoes[0]
+            mensagens.append(
+                f"{len(violacoes)} campo(s) fora do layout, ex.: adição {primeira['adicao'] or '-'} "
+                f"{primeira['tag']}='{primeira['valor']}' (esperado {primeira['esperado']})"
+            )
+        status["mensagem"] = "; ".join(mensagens)
+    except Exception as e:
+        status.update(status="erro", mensagem=f"{type(e).__name__}: {e}")
+    status["segundos"] = round(time.perf_counter() - inicio, 2)
+    return status
+
+
+def processar_lote(arquivos_duimp, arquivos_sigraweb, progress=None, pool=None, session=None):
+    """
+    Pareia DUIMPs e relatórios Sigraweb pelo número da declaração, processa
+    cada par em um processo do pool (imap_processes) e grava os XMLs, à
+    medida que ficam prontos, num ZIP com o relatório do lote. Devolve
+    (arquivo ZIP posicionado no início, linhas do relatório).
+    `progress(feitos, total)` é chamado a cada declaração concluída; sem
+    ele, o andamento vai para o log. Com `pool` (WorkerPool), as tarefas
+    vão para os workers persistentes, na fila da `session`.
+    """
+    if progress is None:
+        progress = LogProgress("Lote DUIMP", "declarações")
+    mapear = imap_processes if pool is None else functools.partial(pool.imap, session=session)
+    relatorio = []
+    zip_file  = tempfile.SpooledTemporaryFile(max_size=XML_SPOOL_MAX_MEMORY)
+    with contextlib.ExitStack() as stack:
+        pasta = stack.enter_context(tempfile.TemporaryDirectory())
+        entradas = [
+            (kind, f.name, stack.enter_context(spooled_upload(f)))
+            for kind, files in (("duimp", arquivos_duimp), ("sigraweb", arquivos_sigraweb))
+            for f in files
+        ]
+
+        # 1) Identificação (só o início de cada PDF), avaliada na ordem do upload
+        identificados = [None] * len(entradas)
+        for i, resultado in mapear(identificar_declaracao, [(kind, path) for kind, _, path in entradas]):
+            identificados[i] = resultado
+
+        por_numero = {"duimp": {}, "sigraweb": {}}
+        for (kind, nome, path), (numero, erro) in zip(entradas, identificados):
+            arquivo = {f"arquivo_{kind}": nome}
+            if erro:
+                relatorio.append(_linha_relatorio(numero, status="erro", mensagem=erro, **arquivo))
+            elif numero in por_numero[kind]:
+                relatorio.append(_linha_relatorio(
+                    numero, status="ignorado",
+                    mensagem=f"número repetido (já usado por {por_numero[kind][numero][0]})", **arquivo,
+                ))
+            else:
+                por_numero[kind][numero] = (nome, path)
+
+        # 2) Pareamento
+        pares = []
+        for numero in sorted(set(por_numero["duimp"]) | set(por_numero["sigraweb"])):
+            duimp, sgw = por_numero["duimp"].get(numero), por_numero["sigraweb"].get(numero)
+            if duimp and sgw:
+                pares.append((numero, duimp, sgw))
+            else:
+                falta = "Sigraweb" if duimp else "DUIMP"
+                relatorio.append(_linha_relatorio(
+                    numero, arquivo_duimp=duimp[0] if duimp else "", arquivo_sigraweb=sgw[0] if sgw else "",
+                    status="sem par", mensagem=f"nenhum {falta} com o mesmo número",
+                ))
+
+        # 3) Processamento dos pares; cada XML entra no ZIP assim que fica pronto
+        tarefas = [(duimp[1], sgw[1], os.path.join(pasta, f"{n}.xml")) for n, (numero, duimp, sgw) in enumerate(pares)]
+        with zipfile.ZipFile(zip_file, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for feitos, (i, status) in enumerate(mapear(processar_par, tarefas), start=1):
+                numero, duimp, sgw = pares[i]
+                if status["status"] == "ok":
+                    zf.write(tarefas[i][2], status["xml"])
+                    os.unlink(tarefas[i][2])
+                relatorio.append(_linha_relatorio(numero, arquivo_duimp=duimp[0], arquivo_sigraweb=sgw[0], **status))
+                if progress:
+                    progress(feitos, len(pares))
+            zf.writestr(LOTE_RELATORIO, pd.DataFrame(relatorio).to_csv(index=False, sep=";"))
+
+    zip_file.seek(0)
+    return zip_file, relatorio
@@ -0,0 +1,112 @@
+"""
+Linha de comando do motor, sem Streamlit:
+
+    python -m engine duimp build --duimp extrato.pdf --sigraweb relatorio.pdf -o saida.xml
+    python -m engine cte ingest pasta_ctes/ -o ctes.parquet
+    python -m engine txt filter entrada.txt -o saida.txt
+
+Mensagens e andamento vão para o stderr (logging); o código de saída é 0 em
+caso de sucesso e 1 em caso de erro, para uso em scripts e agendadores.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from .batch import processar_par
+from .cte import CTeProcessorDirect
+from .progress import LogProgress
+from .txt import PADROES_PADRAO, filtrar_txt
+
+logger = logging.getLogger("engine")
+
+
+def duimp_build(args) -> int:
+    status = processar_par(args.duimp, args.sigraweb, args.output)
+    if status["status"] != "ok":
+        logger.error("Falha ao gerar o XML: %s", status["mensagem"])
+        return 1
+    logger.info(
+        "XML gravado em %s (%d adições, %d vinculadas ao Sigraweb, %d campo(s) fora do layout, %.2f s)",
+        args.output, status["adicoes"], status["vinculados"], status["violacoes"], status["segundos"],
+    )
+    if status["nao_encontrados"]:
+        logger.warning("Adições sem item no Sigraweb: %s", status["nao_encontrados"])
+    if status["mensagem"]:
+        logger.warning(status["mensagem"])
+    return 0
+
+
+def cte_ingest(args) -> int:
+    paths = sorted(str(p) for p in Path(args.pasta).rglob("*.xml"))
+    if not paths:
+        logger.error("Nenhum XML encontrado em %s", args.pasta)
+        return 1
+    processor = CTeProcessorDirect()
+    results = processor.process_paths(paths, LogProgress("CT-e", "arquivos"))
+    df = processor.get_dataframe()
+    if df.empty:
+        logger.error("Nenhum CT-e processado (%d erro(s))", results['errors'])
+        return 1
+    if Path(args.output).suffix.lower() == ".csv":
+        df.to_csv(args.output, index=False)
+    else:
+        df.to_parquet(args.output, index=False)
+    logger.info("%d CT-e(s) gravados em %s; %d erro(s)", results['success'], args.output, results['errors'])
+    for msg in results['messages']:
+        logger.debug(msg)
+    return 0
+
+
+def txt_filter(args) -> int:
+    with open(args.entrada, "rb") as f:
+        conteudo = f.read()
+    resultado, total_linhas = filtrar_txt(conteudo, PADROES_PADRAO + (args.padrao or []))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(resultado)
+    else:
+        sys.stdout.write(resultado + "\n")
+    linhas_processadas = len(resultado.splitlines())
+    logger.info(
+        "Linhas originais: %d; processadas: %d; removidas: %d",
+        total_linhas, linhas_processadas, total_linhas - linhas_processadas,
+    )
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m engine", description="Processamento DUIMP, CT-e e TXT sem a interface.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="mostra também as mensagens de depuração")
+    grupos = parser.add_subparsers(dest="grupo", required=True)
+
+    duimp = grupos.add_parser("duimp", help="Extrato DUIMP + Sigraweb").add_subparsers(dest="comando", required=True)
+    build = duimp.add_parser("build", help="gera o XML integrado de uma declaração")
+    build.add_argument("--duimp", required=True, help="PDF do Extrato DUIMP")
+    build.add_argument("--sigraweb", required=True, help="PDF do relatório Sigraweb")
+    build.add_argument("-o", "--output", required=True, help="arquivo XML de saída")
+    build.set_defaults(func=duimp_build)
+
+    cte = grupos.add_parser("cte", help="XMLs de CT-e").add_subparsers(dest="comando", required=True)
+    ingest = cte.add_parser("ingest", help="lê os CT-es de uma pasta (recursivamente) para uma tabela")
+    ingest.add_argument("pasta", help="pasta com os XMLs")
+    ingest.add_argument("-o", "--output", required=True, help="arquivo .parquet (ou .csv) de saída")
+    ingest.set_defaults(func=cte_ingest)
+
+    txt = grupos.add_parser("txt", help="arquivos TXT").add_subparsers(dest="comando", required=True)
+    filtro = txt.add_parser("filter", help="remove linhas indesejadas e abrevia termos longos")
+    filtro.add_argument("entrada", help="arquivo TXT de entrada")
+    filtro.add_argument("-o", "--output", help="arquivo de saída (padrão: stdout)")
+    filtro.add_argument("--padrao", action="append", help="padrão adicional de linha a remover (pode repetir)")
+    filtro.set_defaults(func=txt_filter)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(levelname)s %(message)s")
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        logger.error("%s: %s", type(e).__name__, e)
+        return 1
@@ -0,0 +1,246 @@
+"""Extração dos dados de CT-e (XML), inclusive peso bruto e peso base de cálculo."""
+from __future__ import annotations
+
+import logging
+import os
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from .lazy import LazyModule
+
+logger = logging.getLogger(__name__)
+
+pd = LazyModule("pandas", "pd", globals())
+
+
+CTE_NAMESPACES = {
+    'cte': 'http://www.portalfiscal.inf.br/cte'
+}
+
+# Lotes grandes vão para o pool de processos em blocos (process_multiple_files com pool)
+CTE_POOL_MIN_FILES = 200   # abaixo disso a cópia dos arquivos para os workers não compensa
+CTE_POOL_BLOCO     = 250   # CT-es por tarefa: uma leitura de outra sessão espera no máximo um bloco
+
+
+class CTeProcessorDirect:
+    def __init__(self):
+        self.processed_data = []
+
+    def extract_nfe_number_from_key(self, chave_acesso):
+        if not chave_acesso or len(chave_acesso) != 44:
+            return None
+        try:
+            numero_nfe = chave_acesso[25:34]
+            return numero_nfe
+        except Exception:
+            return None
+
+    def extract_peso_bruto(self, root):
+        try:
+            tipos_peso = ['PESO BRUTO', 'PESO BASE DE CALCULO', 'PESO BASE CÁLCULO', 'PESO']
+            for prefix, uri in CTE_NAMESPACES.items():
+                infQ_elements = root.findall(f'.//{{{uri}}}infQ')
+                for infQ in infQ_elements:
+                    tpMed = infQ.find(f'{{{uri}}}tpMed')
+                    qCarga = infQ.find(f'{{{uri}}}qCarga')
+                    if tpMed is not None and tpMed.text and qCarga is not None and qCarga.text:
+                        for tipo_peso in tipos_peso:
+                            if tipo_peso in tpMed.text.upper():
+                                peso = float(qCarga.text)
+                                return peso, tipo_peso
+            infQ_elements = root.findall('.//infQ')
+            for infQ in infQ_elements:
+                tpMed = infQ.find('tpMed')
+                qCarga = infQ.find('qCarga')
+                if tpMed is not None and tpMed.text and qCarga is not None and qCarga.text:
+                    for tipo_peso in tipos_peso:
+                        if tipo_peso in tpMed.text.upper():
+                            peso = float(qCarga.text)
+                            return peso, tipo_peso
+            return 0.0, "Não encontrado"
+        except Exception as e:
+            logger.warning(f"Não foi possível extrair o peso: {str(e)}")
+            return 0.0, "Erro na extração"
+
+    def extract_cte_data(self, xml_content, filename):
+        try:
+            root = ET.fromstring(xml_content)
+            for prefix, uri in CTE_NAMESPACES.items():
+                ET.register_namespace(prefix, uri)
+
+            def find_text(element, xpath):
+                try:
+                    for prefix, uri in CTE_NAMESPACES.items():
+                        full_xpath = xpath.replace('cte:', f'{{{uri}}}')
+                        found = element.find(full_xpath)
+                        if found is not None and found.text:
+                            return found.text
+                    found = element.find(xpath.replace('cte:', ''))
+                    if found is not None and found.text:
+                        return found.text
+                    return None
+                except Exception:
+                    return None
+
+            nCT = find_text(root, './/cte:nCT')
+            dhEmi = find_text(root, './/cte:dhEmi')
+            cMunIni = find_text(root, './/cte:cMunIni')
+            UFIni = find_text(root, './/cte:UFIni')
+            cMunFim = find_text(root, './/cte:cMunFim')
+            UFFim = find_text(root, './/cte:UFFim')
+            emit_xNome = find_text(root, './/cte:emit/cte:xNome')
+            vTPrest = find_text(root, './/cte:vTPrest')
+            rem_xNome = find_text(root, './/cte:rem/cte:xNome')
+            dest_xNome = find_text(root, './/cte:dest/cte:xNome')
+            dest_CNPJ = find_text(root, './/cte:dest/cte:CNPJ')
+            dest_CPF = find_text(root, './/cte:dest/cte:CPF')
+            documento_destinatario = dest_CNPJ or dest_CPF or 'N/A'
+            dest_xLgr = find_text(root, './/cte:dest/cte:enderDest/cte:xLgr')
+            dest_nro = find_text(root, './/cte:dest/cte:enderDest/cte:nro')
+            dest_xBairro = find_text(root, './/cte:dest/cte:enderDest/cte:xBairro')
+            dest_cMun = find_text(root, './/cte:dest/cte:enderDest/cte:cMun')
+            dest_xMun = find_text(root, './/cte:dest/cte:enderDest/cte:xMun')
+            dest_CEP = find_text(root, './/cte:dest/cte:enderDest/cte:CEP')
+            dest_UF = find_text(root, './/cte:dest/cte:enderDest/cte:UF')
+            endereco_destinatario = ""
+            if dest_xLgr:
+                endereco_destinatario += f"{dest_xLgr}"
+                if dest_nro:
+                    endereco_destinatario += f", {dest_nro}"
+                if dest_xBairro:
+                    endereco_destinatario += f" - {dest_xBairro}"
+                if dest_xMun:
+                    endereco_destinatario += f", {dest_xMun}"
+                if dest_UF:
+                    endereco_destinatario += f"/{dest_UF}"
+                if dest_CEP:
+                    endereco_destinatario += f" - CEP: {dest_CEP}"
+            if not endereco_destinatario:
+                endereco_destinatario = "N/A"
+            infNFe_chave = find_text(root, './/cte:infNFe/cte:chave')
+            numero_nfe = self.extract_nfe_number_from_key(infNFe_chave) if infNFe_chave else None
+            peso_bruto, tipo_peso_encontrado = self.extract_peso_bruto(root)
+            data_formatada = None
+            if dhEmi:
+                try:
+                    try:
+                        data_obj = datetime.strptime(dhEmi[:10], '%Y-%m-%d')
+                    except:
+                        try:
+                            data_obj = datetime.strptime(dhEmi[:10], '%d/%m/%Y')
+                        except:
+                            data_obj = datetime.strptime(dhEmi[:10], '%d/%m/%y')
+                    data_formatada = data_obj.strftime('%d/%m/%y')
+                except:
+                    data_formatada = dhEmi[:10]
+            try:
+                vTPrest = float(vTPrest) if vTPrest else 0.0
+            except (ValueError, TypeError):
+                vTPrest = 0.0
+            return {
+                'Arquivo': filename,
+                'nCT': nCT or 'N/A',
+                'Data Emissão': data_formatada or dhEmi or 'N/A',
+                'Código Município Início': cMunIni or 'N/A',
+                'UF Início': UFIni or 'N/A',
+                'Código Município Fim': cMunFim or 'N/A',
+                'UF Fim': UFFim or 'N/A',
+                'Emitente': emit_xNome or 'N/A',
+                'Valor Prestação': vTPrest,
+                'Peso Bruto (kg)': peso_bruto,
+                'Tipo de Peso Encontrado': tipo_peso_encontrado,
+                'Remetente': rem_xNome or 'N/A',
+                'Destinatário': dest_xNome or 'N/A',
+                'Documento Destinatário': documento_destinatario,
+                'Endereço Destinatário': endereco_destinatario,
+                'Município Destino': dest_xMun or 'N/A',
+                'UF Destino': dest_UF or 'N/A',
+                'Chave NFe': infNFe_chave or 'N/A',
+                'Número NFe': numero_nfe or 'N/A',
+                'Data Processamento': datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+            }
+        except Exception as e:
+            logger.error(f"Erro ao extrair dados do CT-e {filename}: {str(e)}")
+            return None
+
+    def process_single_file(self, uploaded_file):
+        return self.process_content(uploaded_file.getvalue(), uploaded_file.name)
+
+    def process_path(self, path):
+        with open(path, "rb") as f:
+            return self.process_content(f.read(), os.path.basename(path))
+
+    def process_content(self, file_content, filename):
+        try:
+            if not filename.lower().endswith('.xml'):
+                return False, "Arquivo não é XML"
+            content_str = file_content.decode('utf-8', errors='ignore')
+            if 'CTe' not in content_str and 'conhecimento' not in content_str.lower():
+                return False, "Arquivo não parece ser um CT-e"
+            cte_data = self.extract_cte_data(content_str, filename)
+            if cte_data:
+                self.processed_data.append(cte_data)
+                return True, f"CT-e {filename} processado com sucesso!"
+            else:
+                return False, f"Erro ao processar CT-e {filename}"
+        except Exception as e:
+            return False, f"Erro ao processar arquivo {filename}: {str(e)}"
+
+    def process_multiple_files(self, uploaded_files, progress=None, pool=None, session=None):
+        if pool is not None and len(uploaded_files) >= CTE_POOL_MIN_FILES:
+            return self._process_in_pool(uploaded_files, progress, pool, session)
+        return self._process_all(uploaded_files, self.process_single_file, lambda f: f.name, progress)
+
+    def _process_in_pool(self, uploaded_files, progress, pool, session):
+        """Blocos de CTE_POOL_BLOCO arquivos nos workers do pool; dados e mensagens na ordem do upload."""
+        inicios = range(0, len(uploaded_files), CTE_POOL_BLOCO)
+        tarefas = (
+            ([(f.name, f.getvalue()) for f in uploaded_files[i:i + CTE_POOL_BLOCO]],) for i in inicios
+        )
+        partes = {}
+        feitos = 0
+        for n, parte in pool.imap(processar_ctes, tarefas, session=session):
+            partes[n] = parte
+            feitos += len(parte[1])
+            if progress:
+                progress(feitos, len(uploaded_files), uploaded_files[n * CTE_POOL_BLOCO].name)
+
+        results = {'success': 0, 'errors': 0, 'messages': []}
+        for n in sorted(partes):
+            registros, status = partes[n]
+            self.processed_data.extend(registros)
+            for success, message in status:
+                results['success' if success else 'errors'] += 1
+                results['messages'].append(message)
+        return results
+
+    def process_paths(self, paths, progress=None):
+        return self._process_all(paths, self.process_path, os.path.basename, progress)
+
+    def _process_all(self, files, process, name, progress):
+        results = {'success': 0, 'errors': 0, 'messages': []}
+        for i, file in enumerate(files):
+            success, message = process(file)
+            if success:
+                results['success'] += 1
+            else:
+                results['errors'] += 1
+            results['messages'].append(message)
+            if progress:
+                progress(i + 1, len(files), name(file))
+        return results
+
+    def get_dataframe(self):
+        if self.processed_data:
+            return pd.DataFrame(self.processed_data)
+        return pd.DataFrame()
+
+    def clear_data(self):
+        self.processed_data = []
+
+
+def processar_ctes(arquivos):
+    """Lê um bloco de CT-es [(nome, conteúdo)] num worker do pool; devolve (dados, [(ok, mensagem)])."""
+    processor = CTeProcessorDirect()
+    status = [processor.process_content(conteudo, nome) for nome, conteudo in arquivos]
+    return processor.processed_data, status
@@ -0,0 +1,331 @@
+"""Parser do Extrato DUIMP (Siscomex) e funções auxiliares."""
+import bisect
+import gc
+import logging
+import os
+import re
+import time
+
+from .items import ItemTable
+from .lazy import LazyModule
+from .numeric import parse_br_number
+from .parallel import PARALLEL_MAX_WORKERS, imap_processes, processes_available
+
+logger = logging.getLogger(__name__)
+
+fitz = LazyModule("fitz", "fitz", globals())   # PyMuPDF
+
+
+def montar_descricao_final(desc_complementar, codigo_extra, detalhamento):
+    """
+    Concatena: Descrição Complementar - Código - Detalhamento
+    """
+    parte1 = str(desc_complementar).strip()
+    parte2 = str(codigo_extra).strip()
+    parte3 = str(detalhamento).strip()
+    return f"{parte1} - {parte2} - {parte3}"
+
+
+# Parâmetros do pré-processamento paralelo do Extrato DUIMP
+DUIMP_PARALLEL_MIN_PAGES = 24      # abaixo disso o custo de criar processos não compensa
+
+_DUIMP_PAGE_COUNTER_RE = re.compile(r'^\d+\s*/\s*\d+$')
+
+def _duimp_is_noise_line(line):
+    """Banner "Extrato da DUIMP", rodapé de emissão e contador de páginas."""
+    return (
+        "Extrato da DUIMP" in line
+        or "Data, hora e responsável" in line
+        or _DUIMP_PAGE_COUNTER_RE.match(line) is not None
+    )
+
+
+def _duimp_body_margins(page):
+    """
+    Mede as faixas de cabeçalho e rodapé repetidas da página: devolve
+    (margem_superior, margem_inferior) em pontos, ou None se a página não tiver
+    as linhas de banner/rodapé em nenhuma das faixas.
+    """
+    rect = page.rect
+    faixa = rect.height / 5
+    top, bottom = rect.y0, rect.y1
+    found = False
+    for block in page.get_text("dict")["blocks"]:
+        for line in block.get("lines", []):
+            text = "".join(span["text"] for span in line["spans"]).strip()
+            if not _duimp_is_noise_line(text):
+                continue
+            y0, y1 = line["bbox"][1], line["bbox"][3]
+            if y1 <= rect.y0 + faixa:
+                top, found = max(top, y1), True
+            elif y0 >= rect.y1 - faixa:
+                bottom, found = min(bottom, y0), True
+    if not found:
+        return None
+    return top - rect.y0, rect.y1 - bottom
+
+
+def _duimp_extract_pages(source, start, stop, margins, progress=None):
+    """
+    Extrai o texto das páginas [start, stop). Com `margins`, recorta cada página
+    ao retângulo do corpo (clip) e o banner/rodapé nem chegam a ser extraídos.
+    As margens são medidas só nas primeiras páginas: o filtro linha a linha
+    roda também no texto recortado, para as páginas em que o banner ou o
+    rodapé estão em outra altura e sobram dentro do recorte.
+    """
+    doc = fitz.open(source) if isinstance(source, str) else fitz.open(stream=source, filetype="pdf")
+    try:
+        texts = []
+        for page in doc.pages(start, stop):
+            if margins:
+                rect = page.rect
+                clip = fitz.Rect(rect.x0, rect.y0 + margins[0], rect.x1, rect.y1 - margins[1])
+                text = page.get_text("text", clip=clip)
+            else:
+                text = page.get_text("text")
+            lines = text.split('\n')
+            texts.append("\n".join(l for l in lines if not _duimp_is_noise_line(l.strip())))
+            if progress:
+                progress(start + len(texts), stop)
+        return texts
+    finally:
+        doc.close()
+
+
+DUIMP_ITEM_TIME_BUDGET = 0.05   # segundos de CPU desta thread por item (time.thread_time)
+
+_DUIMP_ITEM_SPLIT_RE = re.compile(r"Item\s+(\d+)")
+
+# Campos de uma linha: (chave, rótulo, padrão do valor logo após o rótulo)
+_DUIMP_INLINE_FIELDS = [
+    ("ncm",                  "NCM:",                                  r"\s*([\d\.]+)"),
+    ("paisOrigem",           "País de origem:",                       r"\s*\n?(.+)"),
+    ("quantidade",           "Quantidade na unidade estatística:",    r"\s*([\d\.,]+)"),
+    ("quantidade_comercial", "Quantidade na unidade comercializada:", r"\s*([\d\.,]+)"),
+    ("unidade",              "Unidade estatística:",                  r"\s*(.+)"),
+    ("pesoLiq",              "Peso líquido (kg):",                    r"\s*([\d\.,]+)"),
+    ("valorUnit",            "Valor unitário na condição de venda:",  r"\s*([\d\.,]+)"),
+    ("valorTotal",           "Valor total na condição de venda:",     r"\s*([\d\.,]+)"),
+    ("moeda",                "Moeda negociada:",                      r"\s*(.+)"),
+]
+
+# Campos de várias linhas: (chave, rótulo, rótulos que encerram o valor no início de uma linha)
+_DUIMP_BLOCK_FIELDS = [
+    ("fornecedor_raw", "Código do Exportador Estrangeiro:", ("Endereço", "Dados")),
+    ("endereco_raw",   "Endereço:",                         ("Dados da Mercadoria", "Aplicação")),
+    ("descricao",      "Detalhamento do Produto:",
+     ("Número de Identificação", "Versão", "Código de Class", "Descrição complementar")),
+]
+
+_DUIMP_COMPL_FIELD = ("desc_complementar", "Descrição complementar da mercadoria:", r"\s*(.+)")
+
+# Ordem das colunas do item (a mesma da grade de edição)
+_DUIMP_ITEM_KEYS = (
+    [key for key, _, _ in _DUIMP_INLINE_FIELDS]
+    + [key for key, _, _ in _DUIMP_BLOCK_FIELDS]
+    + [_DUIMP_COMPL_FIELD[0]]
+)
+# Campos convertidos para float já na leitura (None quando ausentes no item)
+_DUIMP_NUMERIC_KEYS = ("quantidade", "quantidade_comercial", "pesoLiq", "valorUnit", "valorTotal")
+
+# Campos de cada item da DUIMP: texto, salvo os numéricos (ausente → NaN)
+DUIMP_ITEM_SCHEMA = {"numeroAdicao": ""}
+DUIMP_ITEM_SCHEMA.update((key, None if key in _DUIMP_NUMERIC_KEYS else "") for key in _DUIMP_ITEM_KEYS)
+
+_DUIMP_INLINE_VALUE_RES = {
+    label: re.compile(pattern) for _, label, pattern in _DUIMP_INLINE_FIELDS + [_DUIMP_COMPL_FIELD]
+}
+_DUIMP_LABELS_RE = re.compile("|".join(
+    re.escape(label) for _, label, _ in sorted(
+        _DUIMP_INLINE_FIELDS + [_DUIMP_COMPL_FIELD] + [(k, l, None) for k, l, _ in _DUIMP_BLOCK_FIELDS],
+        key=lambda f: -len(f[1]),
+    )
+))
+# Campos na ordem em que _duimp_item_fields os lê (os que sobram quando o tempo acaba)
+_DUIMP_READ_ORDER = tuple(
+    key for key, _, _ in _DUIMP_INLINE_FIELDS + [_DUIMP_COMPL_FIELD] + _DUIMP_BLOCK_FIELDS
+)
+_DUIMP_STOPS_RE = re.compile(r"\n\s*(" + "|".join(sorted(
+    {re.escape(term) for _, _, terms in _DUIMP_BLOCK_FIELDS for term in terms}, key=len, reverse=True
+)) + ")")
+
+
+def _duimp_item_fields(content, deadline):
+    """
+    Lê os campos de um item da DUIMP a partir das posições dos rótulos,
+    encontradas em uma única passada. Para de ler (campos restantes vazios)
+    se `deadline` (time.thread_time) for ultrapassado: só o trabalho desta
+    thread conta, não a espera pelo GIL enquanto outras sessões rodam.
+    Devolve (campos, chaves que ficaram sem leitura).
+    """
+    first  = {}
+    starts = []
+    for m in _DUIMP_LABELS_RE.finditer(content):
+        starts.append(m.start())
+        first.setdefault(m.group(), m.end())
+    stops = [(m.start(), m.group(1)) for m in _DUIMP_STOPS_RE.finditer(content)]
+    stop_starts = [pos for pos, _ in stops]
+
+    fields = dict.fromkeys(_DUIMP_ITEM_KEYS, "")
+
+    for n, (key, label, _) in enumerate(_DUIMP_INLINE_FIELDS + [_DUIMP_COMPL_FIELD]):
+        if time.thread_time() > deadline:
+            return fields, _DUIMP_READ_ORDER[n:]
+        end = first.get(label)
+        if end is None:
+            continue
+        nxt = bisect.bisect_right(starts, end)
+        window_end = starts[nxt] if nxt < len(starts) else len(content)
+        m = _DUIMP_INLINE_VALUE_RES[label].match(content, end, window_end)
+        if m:
+            fields[key] = m.group(1).strip()
+
+    for n, (key, label, terms) in enumerate(_DUIMP_BLOCK_FIELDS):
+        if time.thread_time() > deadline:
+            return fields, _DUIMP_READ_ORDER[len(_DUIMP_INLINE_FIELDS) + 1 + n:]
+        end = first.get(label)
+        if end is None:
+            continue
+        for idx in range(bisect.bisect_right(stop_starts, end), len(stops)):
+            pos, word = stops[idx]
+            if word.startswith(terms):
+                fields[key] = content[end:pos].strip()
+                break
+    return fields, ()
+
+
+class DuimpPDFParser:
+    """Parser do App 1 (Mantido original + Correção Leitura Qtd Comercial e Memória)"""
+
+    def __init__(self, source):
+        # `source` é o caminho do PDF (preferencial, sem cópia em memória) ou os bytes
+        self.source = source
+        if isinstance(source, (str, os.PathLike)):
+            self.source = os.fspath(source)
+            self.doc = fitz.open(self.source)
+        else:
+            self.doc = fitz.open(stream=source, filetype="pdf")
+        self.full_text = ""
+        self.header = {}
+        self.items = ItemTable.from_records([], DUIMP_ITEM_SCHEMA)
+        self.stats = {}
+        self.slow_items = []
+
+    @classmethod
+    def restaurar(cls, header, items: ItemTable, stats=None, slow_items=()):
+        """Parser já lido, remontado a partir do que foi salvo (sem abrir o PDF)."""
+        p = cls.__new__(cls)
+        p.source     = None
+        p.doc        = None
+        p.full_text  = ""
+        p.header     = dict(header)
+        p.items      = items
+        p.stats      = dict(stats or {})
+        # Snapshots antigos guardam (item, segundos), sem os campos não lidos
+        p.slow_items = [(item[0], item[1], tuple(item[2]) if len(item) > 2 else ()) for item in slow_items]
+        return p
+
+    def preprocess(self, progress=None):
+        """Extrai o texto de todas as páginas; `progress(paginas, total)` é opcional."""
+        inicio = time.perf_counter()
+        total_pages = self.doc.page_count
+
+        margins = None
+        try:
+            for page in self.doc.pages(0, min(3, total_pages)):
+                margins = _duimp_body_margins(page)
+                if margins:
+                    break
+        finally:
+            self.doc.close()
+
+        workers = PARALLEL_MAX_WORKERS if total_pages >= DUIMP_PARALLEL_MIN_PAGES else 1
+        if workers == 1 or not processes_available():
+            workers    = 1
+            page_texts = _duimp_extract_pages(self.source, 0, total_pages, margins, progress)
+        else:
+            # Duas faixas contíguas por worker: poucos reopens do PDF e algum andamento visível
+            step  = -(-total_pages // (workers * 2))
+            tasks = [
+                (self.source, start, min(start + step, total_pages), margins)
+                for start in range(0, total_pages, step)
+            ]
+            chunks = [None] * len(tasks)
+            done   = 0
+            for i, chunk in imap_processes(_duimp_extract_pages, tasks, workers):
+                chunks[i] = chunk
+                done += len(chunk)
+                if progress:
+                    progress(done, total_pages)
+            page_texts = [text for chunk in chunks for text in chunk]
+        self.full_text = "\n".join(page_texts)
+
+        elapsed = time.perf_counter() - inicio
+        self.stats = {
+            "pages": total_pages,
+            "workers": workers,
+            "clip": margins is not None,
+            "seconds": round(elapsed, 3),
+            "pages_per_second": round(total_pages / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        logger.info(f"DUIMP pré-processado: {self.stats}")
+        gc.collect()
+
+    def extract_header(self):
+        txt = self.full_text
+        self.header["numeroDUIMP"]    = self._regex(r"Extrato da Duimp\s+([\w\-\/]+)", txt)
+        self.header["cnpj"]           = self._regex(r"CNPJ do importador:\s*([\d\.\/\-]+)", txt)
+        self.header["nomeImportador"] = self._regex(r"Nome do importador:\s*\n?(.+)", txt)
+        self.header["pesoBruto"]      = parse_br_number(self._regex(r"Peso Bruto \(kg\):\s*([\d\.,]+)", txt), None)
+        self.header["pesoLiquido"]    = parse_br_number(self._regex(r"Peso Liquido \(kg\):\s*([\d\.,]+)", txt), None)
+        self.header["urf"]            = self._regex(r"Unidade de despacho:\s*([\d]+)", txt)
+        self.header["paisProcedencia"] = self._regex(r"País de Procedência:\s*\n?(.+)", txt)
+
+    def extract_items(self):
+        """
+        Separa o texto em itens e lê os campos de cada um por janelas: os
+        rótulos são localizados uma única vez por item e cada valor é lido só
+        no trecho entre o seu rótulo e o próximo. Sem padrões DOTALL varrendo
+        o item inteiro, um terminador ausente não custa uma varredura por
+        posição. Itens que estouram DUIMP_ITEM_TIME_BUDGET (tempo de CPU da
+        thread) ficam em `self.slow_items` como (item, segundos, campos não
+        lidos); esses campos ficam vazios.
+        """
+        self.slow_items = []
+        rows   = []
+        chunks = _DUIMP_ITEM_SPLIT_RE.split(self.full_text)
+        if len(chunks) > 1:
+            for i in range(1, len(chunks), 2):
+                num     = chunks[i]
+                content = chunks[i + 1]
+                inicio  = time.thread_time()
+                item    = {"numeroAdicao": num}
+                fields, nao_lidos = _duimp_item_fields(content, inicio + DUIMP_ITEM_TIME_BUDGET)
+                item.update(fields)
+
+                elapsed = time.thread_time() - inicio
+                if elapsed > DUIMP_ITEM_TIME_BUDGET:
+                    self.slow_items.append((num, round(elapsed, 3), tuple(nao_lidos)))
+                    logger.warning(
+                        f"Item {num} da DUIMP excedeu o tempo de leitura ({elapsed:.3f}s); "
+                        f"campos não lidos: {', '.join(nao_lidos) or 'nenhum'}"
+                    )
+
+                rows.append(item)
+        # Os campos numéricos são convertidos uma única vez, ao montar a tabela
+        self.items = ItemTable.from_records(rows, DUIMP_ITEM_SCHEMA)
+
+    def release(self):
+        """
+        Solta o que só servia à leitura: o texto extraído, o documento (já
+        fechado) e os bytes do PDF. Ficam cabeçalho, itens e estatísticas,
+        que é o que a grade e o XML usam.
+        """
+        self.full_text = ""
+        self.doc = None
+        if not isinstance(self.source, str):
+            self.source = None
+
+    def _regex(self, pattern, text):
+        match = re.search(pattern, text)
+        return match.group(1).strip() if match else ""
@@ -0,0 +1,200 @@
+"""
+Grade de conferência da DUIMP: montagem a partir dos itens, vinculação com o
+Sigraweb e recálculo dos tributos só nas linhas editadas.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+from .instrumentation import span
+from .items import itens_para_dataframe
+from .lazy import LazyModule
+from .numeric import ExactSum
+
+np = LazyModule("numpy", "np", globals())
+pd = LazyModule("pandas", "pd", globals())
+
+
+# ------------------------------------------------------------------------------
+# Montagem da grade e vinculação DUIMP x Sigraweb
+# ------------------------------------------------------------------------------
+GRADE_COLUNAS_FISCAIS = [
+    "NUMBER", "Frete (R$)", "Seguro (R$)",
+    "II (R$)", "II Base (R$)", "II Alíq. (%)",
+    "IPI (R$)", "IPI Base (R$)", "IPI Alíq. (%)",
+    "PIS (R$)", "PIS Base (R$)", "PIS Alíq. (%)",
+    "COFINS (R$)", "COFINS Base (R$)", "COFINS Alíq. (%)",
+    "Aduaneiro (R$)"
+]
+
+
+def montar_grade_duimp(p) -> pd.DataFrame:
+    """Grade de edição a partir dos itens da DUIMP, com as colunas fiscais zeradas."""
+    with span("grade", linhas=len(p.items)):
+        df = itens_para_dataframe(p.items, copy=True)
+        for col in GRADE_COLUNAS_FISCAIS:
+            df[col] = 0.00 if col != "NUMBER" else ""
+    return df
+
+def linhas_grade(p, grade: pd.DataFrame, indices=None) -> List[Dict]:
+    """
+    Itens da DUIMP (todos ou só `indices`) com os valores da linha
+    correspondente da grade por cima. p.items não é alterado.
+    """
+    indices  = range(len(p.items)) if indices is None else indices
+    na_grade = [i for i in indices if i < len(grade)]
+    records  = dict(zip(na_grade, grade.iloc[na_grade].to_dict("records")))
+    return [{**p.items[i], **records.get(i, {})} for i in indices]
+
+# Coluna da grade de edição → campo do item Sigraweb (valor padrão quando ausente)
+VINCULO_COLUNAS = {
+    "NUMBER":           ("codigo_interno",       ""),    # Part Number do Sigraweb
+    "Frete (R$)":       ("freteReal",            0.0),
+    "Seguro (R$)":      ("seguroReal",           0.0),
+    "Aduaneiro (R$)":   ("valorAduaneiroReal",   0.0),   # Valor Aduaneiro Real (BRL)
+    "II (R$)":          ("ii_valor_devido",      0.0),
+    "II Base (R$)":     ("ii_base_calculo",      0.0),
+    "II Alíq. (%)":     ("ii_aliquota",          0.0),
+    "IPI (R$)":         ("ipi_valor_devido",     0.0),
+    "IPI Base (R$)":    ("ipi_base_calculo",     0.0),
+    "IPI Alíq. (%)":    ("ipi_aliquota",         0.0),
+    "PIS (R$)":         ("pis_valor_devido",     0.0),
+    "PIS Base (R$)":    ("pis_base_calculo",     0.0),
+    "PIS Alíq. (%)":    ("pis_aliquota",         0.0),
+    "COFINS (R$)":      ("cofins_valor_devido",  0.0),
+    "COFINS Base (R$)": ("cofins_base_calculo",  0.0),
+    "COFINS Alíq. (%)": ("cofins_aliquota",      0.0),
+}
+
+
+def vincular_dados(df_dest: pd.DataFrame, itens_sgw) -> Tuple[pd.DataFrame, int, List[int]]:
+    """
+    Preenche as colunas fiscais da grade DUIMP com os itens do Sigraweb, por
+    junção no número da adição. Devolve (grade, adições vinculadas, números
+    da DUIMP sem correspondência no Sigraweb).
+    """
+    with span("vinculacao", linhas=len(df_dest)) as etapa:
+        df = df_dest.copy()
+
+        campos = {campo: coluna for coluna, (campo, _) in VINCULO_COLUNAS.items()}
+        src = itens_para_dataframe(itens_sgw, columns=["numero_item", *campos], rename=campos)
+        src["numero_item"] = pd.to_numeric(src["numero_item"], errors="coerce")
+        src = src.dropna(subset=["numero_item"]).drop_duplicates("numero_item", keep="last")
+        src = src.set_index(src["numero_item"].astype(int)).drop(columns="numero_item")
+        src = src.fillna({coluna: padrao for coluna, (_, padrao) in VINCULO_COLUNAS.items()})
+
+        chave = pd.to_numeric(df["numeroAdicao"].astype(str).str.strip(), errors="coerce")
+        vinculado = chave.isin(src.index)
+
+        # Linhas sem correspondência ficam com NaN em todas as colunas e o update as ignora
+        alinhado = src.reindex(chave.where(vinculado))
+        alinhado.index = df.index
+        df.update(alinhado)
+
+        not_found = chave[~vinculado & chave.notna()].astype(int).tolist()
+        etapa["vinculadas"] = int(vinculado.sum())
+    return df, etapa["vinculadas"], not_found
+
+# ------------------------------------------------------------------------------
+# Grade de conferência: recálculo dos tributos só nas linhas editadas
+# ------------------------------------------------------------------------------
+GRADE_TRIBUTOS = ("II", "IPI", "PIS", "COFINS")
+GRADE_COLUNAS_TOTAIS = ("II (R$)", "IPI (R$)", "PIS (R$)", "COFINS (R$)", "Frete (R$)", "Seguro (R$)")
+
+
+class GradeConferencia:
+    """
+    Estado da grade de edição entre execuções do script: o último DataFrame
+    (com os tributos já recalculados) e os totais das colunas de valor.
+    A cada execução, a saída do st.data_editor é comparada com esse estado
+    e só as linhas alteradas têm o tributo recalculado (valor = base ×
+    alíquota / 100); os totais são corrigidos pela diferença dessas linhas.
+    """
+
+    # Acima dessa fração de linhas alteradas (colagem em massa), a passada
+    # vetorizada nas colunas inteiras sai mais barata que célula a célula
+    LIMITE_PARCIAL = 0.05
+
+    def __init__(self):
+        self.df      = None
+        self.sums    = {}
+        self.changed = []   # posições recalculadas na última atualização
+
+    @staticmethod
+    def _colunas_tributo(df):
+        for tax in GRADE_TRIBUTOS:
+            base_col, aliq_col, val_col = f"{tax} Base (R$)", f"{tax} Alíq. (%)", f"{tax} (R$)"
+            if base_col in df.columns and aliq_col in df.columns:
+                yield base_col, aliq_col, val_col
+
+    @staticmethod
+    def _numeros(values) -> np.ndarray:
+        """Como pd.to_numeric(errors='coerce').fillna(0.0): texto inválido e vazio contam zero."""
+        values = np.asarray(values)
+        if values.dtype.kind != "f":
+            values = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(
+                dtype=float, na_value=np.nan)
+        return np.where(np.isnan(values), 0.0, values)
+
+    def _recalcular_tudo(self, df):
+        for base_col, aliq_col, val_col in self._colunas_tributo(df):
+            df[base_col] = pd.to_numeric(df[base_col], errors='coerce').fillna(0.0)
+            df[aliq_col] = pd.to_numeric(df[aliq_col], errors='coerce').fillna(0.0)
+            df[val_col]  = df[base_col] * (df[aliq_col] / 100.0)
+        self.sums = {}
+        for col in GRADE_COLUNAS_TOTAIS:
+            if col in df.columns:
+                self.sums[col] = ExactSum()
+                self.sums[col].add_many(self._numeros(df[col].to_numpy()))
+        self.changed = list(range(len(df)))
+
+    def _linhas_alteradas(self, df) -> np.ndarray:
+        """Posições em que alguma base, alíquota ou coluna totalizada difere do estado anterior."""
+        mask = np.zeros(len(df), dtype=bool)
+        for col in df.columns:
+            if col not in GRADE_COLUNAS_TOTAIS and not col.endswith((" Base (R$)", " Alíq. (%)")):
+                continue
+            novo, antigo = df[col], self.df[col]
+            a, b = novo.to_numpy(), antigo.to_numpy()
+            if a.dtype.kind == "f" and b.dtype.kind == "f":
+                mask |= (a != b) & ~(np.isnan(a) & np.isnan(b))
+            else:
+                mask |= (novo.ne(antigo) & ~(novo.isna() & antigo.isna())).to_numpy()
+        return np.flatnonzero(mask)
+
+    def atualizar(self, df: pd.DataFrame, anterior: pd.DataFrame) -> pd.DataFrame:
+        """
+        Recebe a saída do st.data_editor e o DataFrame que foi passado a ele.
+        Se `anterior` não é o estado guardado (grade nova, revinculada ou
+        recarregada), recalcula tudo; senão, só as linhas alteradas.
+        """
+        if (self.df is None or anterior is not self.df
+                or not df.columns.equals(self.df.columns) or not df.index.equals(self.df.index)):
+            self._recalcular_tudo(df)
+            self.df = df
+            return df
+
+        pos = self._linhas_alteradas(df)
+        if len(pos) > self.LIMITE_PARCIAL * len(df):
+            self._recalcular_tudo(df)
+        elif len(pos):
+            for col, total in self.sums.items():
+                total.add_many(self._numeros(self.df[col].to_numpy()[pos]), -1)
+            for base_col, aliq_col, val_col in self._colunas_tributo(df):
+                j_base, j_aliq, j_val = (df.columns.get_loc(c) for c in (base_col, aliq_col, val_col))
+                bases = self._numeros(df[base_col].to_numpy()[pos])
+                aliqs = self._numeros(df[aliq_col].to_numpy()[pos])
+                for r, base, aliq in zip(pos, bases, aliqs):
+                    df.iat[r, j_base] = base
+                    df.iat[r, j_aliq] = aliq
+                    df.iat[r, j_val]  = base * (aliq / 100.0)
+            for col, total in self.sums.items():
+                total.add_many(self._numeros(df[col].to_numpy()[pos]))
+            self.changed = pos.tolist()
+        else:
+            self.changed = []
+        self.df = df
+        return df
+
+    def total(self, col) -> float:
+        return self.sums[col].value() if col in self.sums else 0.0
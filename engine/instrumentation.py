@@ -0,0 +1,137 @@
+"""
+Medição por etapa do processamento: tempo, CPU e memória.
+
+    with record_run("Leitura DUIMP") as execucao:
+        with span("duimp.texto", paginas=n):
+            ...
+
+Cada `span` mede o tempo de relógio, o tempo de CPU da thread atual e o RSS
+do processo (psutil) no início e no fim, e grava o resultado no log como uma
+linha JSON (logger "engine.instrumentation", nível INFO). Spans aninhados
+têm o nome composto ("xml.adicoes"). Dentro de `record_run`, as etapas
+também ficam em `execucao.etapas`, que o app mostra no painel Diagnóstico.
+
+O estado é por thread: leituras em paralelo na fila de jobs não se misturam.
+Trabalho feito em processos filhos não entra no CPU da thread; as etapas
+medidas no filho de call_in_process voltam junto com o resultado
+(collect_spans/merge_spans).
+"""
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+from .lazy import LazyModule
+
+logger = logging.getLogger(__name__)
+
+psutil = LazyModule("psutil", "psutil", globals())
+
+MB = 1024 * 1024
+
+_estado = threading.local()
+_processo = None
+
+
+def _rss():
+    global _processo
+    if _processo is None or _processo.pid != os.getpid():   # depois de um fork, o processo é outro
+        _processo = psutil.Process()
+    return _processo.memory_info().rss
+
+
+class RunProfile:
+    """Etapas medidas em uma execução (leitura, vinculação, geração do XML...)."""
+
+    def __init__(self, nome):
+        self.nome   = nome
+        self.inicio = time.time()
+        self.etapas: List[Dict[str, Any]] = []
+
+    @property
+    def total(self) -> Dict[str, Any]:
+        """Registro da execução inteira (a última etapa, "total"), se já terminou."""
+        return self.etapas[-1] if self.etapas and self.etapas[-1]["etapa"] == "total" else {}
+
+
+@contextlib.contextmanager
+def _medir(registro):
+    rss_inicial = _rss()
+    cpu_inicial = time.thread_time()
+    inicio      = time.perf_counter()
+    try:
+        yield registro
+    except BaseException as e:
+        registro["erro"] = type(e).__name__
+        raise
+    finally:
+        rss_final = _rss()
+        registro.update(
+            segundos=round(time.perf_counter() - inicio, 4),
+            cpu_segundos=round(time.thread_time() - cpu_inicial, 4),
+            rss_mb=round(rss_final / MB, 1),
+            rss_delta_mb=round((rss_final - rss_inicial) / MB, 1),
+        )
+
+
+def _registrar(registro):
+    execucao = getattr(_estado, "execucao", None)
+    if execucao is not None:
+        execucao.etapas.append(registro)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(
+            {"execucao": execucao.nome if execucao else None, "pid": os.getpid(), **registro},
+            ensure_ascii=False, default=str,
+        ))
+
+
+@contextlib.contextmanager
+def span(etapa, **atributos):
+    """
+    Mede uma etapa. Devolve o registro (dict), onde quem chamou pode
+    acrescentar atributos conhecidos só no fim (ex.: quantidade de itens).
+    """
+    pilha = getattr(_estado, "pilha", None)
+    if pilha is None:
+        pilha = _estado.pilha = []
+    pilha.append(etapa)
+    registro = {"etapa": ".".join(pilha), **atributos}
+    try:
+        with _medir(registro):
+            yield registro
+    finally:
+        pilha.pop()
+        _registrar(registro)
+
+
+@contextlib.contextmanager
+def collect_spans(nome=""):
+    """Junta as etapas medidas na thread atual em um RunProfile novo, sem registrar o total."""
+    anterior = getattr(_estado, "execucao", None)
+    execucao = _estado.execucao = RunProfile(nome or (anterior.nome if anterior else ""))
+    try:
+        yield execucao
+    finally:
+        _estado.execucao = anterior
+
+
+@contextlib.contextmanager
+def record_run(nome):
+    """Execução com as etapas medidas dentro dela; a última etapa é o "total"."""
+    with collect_spans(nome) as execucao:
+        registro = {"etapa": "total"}
+        try:
+            with _medir(registro):
+                yield execucao
+        finally:
+            _registrar(registro)
+
+
+def merge_spans(etapas):
+    """Acrescenta à execução atual etapas medidas em outro processo."""
+    execucao = getattr(_estado, "execucao", None)
+    if execucao is not None and etapas:
+        execucao.etapas.extend(etapas)
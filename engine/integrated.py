@@ -0,0 +1,157 @@
+"""
+Sistema integrado DUIMP + Sigraweb: leitura dos dois PDFs e geração do XML
+integrado a partir da grade de conferência.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from .duimp import DuimpPDFParser
+from .grid import linhas_grade
+from .instrumentation import span
+from .lazy import LazyModule
+from .numeric import ExactSum, parse_br_number
+from .sigraweb import SigrawebPDFParser
+from .validation import XmlLayoutValidator
+from .xml_builder import XML_TOTAL_COLUMNS, DataFormatter, XMLBuilder, serialize_duimp_child
+
+np = LazyModule("numpy", "np", globals())
+pd = LazyModule("pandas", "pd", globals())
+
+
+def parse_duimp_file(path, progress=None):
+    """Leitura completa do Extrato DUIMP; `progress(paginas, total)` é opcional."""
+    p = DuimpPDFParser(path)
+    with span("duimp.texto", paginas=p.doc.page_count):
+        p.preprocess(progress)
+    with span("duimp.cabecalho"):
+        p.extract_header()
+    with span("duimp.itens") as etapa:
+        p.extract_items()
+        etapa["itens"] = len(p.items)
+    p.release()
+    return p
+
+
+def parse_sigraweb_file(path, progress=None):
+    """Leitura completa do relatório Sigraweb; devolve o documento (cabeçalho, itens, totais)."""
+    return SigrawebPDFParser().parse_pdf(path, progress)
+
+def xml_config_padrao(cab_sgw: Optional[Dict]) -> Dict[str, str]:
+    """Valores iniciais das tags manuais do XML, tirados do cabeçalho do Sigraweb."""
+    cab_sgw = cab_sgw or {}
+    zeros   = "000000000000000"
+    return {
+        "quantidadeVolume":              cab_sgw.get('volumes', '00001').zfill(5) if cab_sgw.get('volumes') else '00001',
+        "cargaDataChegada":              cab_sgw.get('dataChegadaISO', '20251120') or '20251120',
+        "dataDesembaraco":               cab_sgw.get('dataRegistro', '20251124') or '20251124',
+        "dataRegistro":                  cab_sgw.get('dataRegistro', '20251124') or '20251124',
+        "conhecimentoCargaEmbarqueData": cab_sgw.get('dataEmbarqueISO', '20251025') or '20251025',
+        "cargaPesoBruto":                DataFormatter.format_quantity(cab_sgw['pesoBruto'], 15) if cab_sgw.get('pesoBruto') else zeros,
+        "cargaPesoLiquido":              DataFormatter.format_quantity(cab_sgw['pesoLiquido'], 15) if cab_sgw.get('pesoLiquido') else zeros,
+        "agenciaPagamento":              cab_sgw.get('agencia', '3715') or '3715',
+        "bancoPagamento":                "341",
+        "valorReceita7811":              zeros,
+        "localDescargaTotalDolares":     zeros,
+        "localDescargaTotalReais":       zeros,
+        "localEmbarqueTotalDolares":     zeros,
+        "localEmbarqueTotalReais":       zeros,
+        "conhecimentoCargaId":           cab_sgw.get('idtConhecimento', 'CE123456') or 'CE123456',
+        "conhecimentoCargaIdMaster":     cab_sgw.get('idtMaster', 'CE123456') or 'CE123456',
+    }
+
+
+def nome_arquivo_xml(p) -> str:
+    duimp_num = p.header.get("numeroDUIMP", "0000").replace("/", "-")
+    return f"DUIMP_{duimp_num}_INTEGRADO.xml"
+
+class AdicaoFragmentCache:
+    """
+    <adicao> já serializadas (com a indentação que as precede), uma por
+    item da DUIMP, com a chave (hash da linha da grade) que as gerou. Fica
+    na sessão: ao gerar o XML de novo, só as linhas com chave diferente são
+    montadas; as demais são copiadas do cache na ordem. Os totais do rodapé são corrigidos pela diferença
+    das linhas refeitas (ExactSum), sem somar a grade inteira.
+    """
+
+    def __init__(self):
+        self.context    = None
+        self.keys       = None
+        self.fragments  = []
+        self.violations = []
+        self.values     = []
+        self.sums       = {}
+        self.rendered   = 0
+
+    @staticmethod
+    def row_keys(p, grade: pd.DataFrame) -> np.ndarray:
+        """Uma chave por item: hash da linha da grade (0 para item sem linha na grade)."""
+        keys = np.zeros(len(p.items), dtype=np.uint64)
+        n = min(len(p.items), len(grade))
+        if n:
+            keys[:n] = pd.util.hash_pandas_object(grade.iloc[:n], index=False).to_numpy()
+        return keys
+
+    def refresh(self, p, grade: pd.DataFrame, progress=None) -> List[int]:
+        """
+        Monta de novo só as adições cuja linha mudou; devolve os índices
+        refeitos. `progress(montadas, a_montar)` é opcional.
+        """
+        builder = XMLBuilder(p)
+        keys    = self.row_keys(p, grade)
+        # Além da grade, a adição depende do parser (itens e cabeçalho) e das colunas
+        context = (p, builder.duimp_number(), p.header.get("urf"), tuple(grade.columns))
+        if self.keys is None or context != self.context or len(keys) != len(self.keys):
+            n = len(keys)
+            self.context    = context
+            self.fragments  = [b""] * n
+            self.violations = [[] for _ in range(n)]
+            self.values     = [(0.0,) * len(XML_TOTAL_COLUMNS)] * n
+            self.sums       = {name: ExactSum() for name in XML_TOTAL_COLUMNS}
+            changed = list(range(n))
+        else:
+            changed = np.flatnonzero(keys != self.keys).tolist()
+
+        rows = linhas_grade(p, grade, changed)
+        for n, (i, row, element) in enumerate(zip(changed, rows, builder.iter_adicoes(rows)), start=1):
+            checker = XmlLayoutValidator()
+            self.fragments[i]  = b"\n    " + serialize_duimp_child(element, checker)
+            self.violations[i] = checker.violations
+            values = tuple(parse_br_number(row.get(column)) for column in XML_TOTAL_COLUMNS.values())
+            for name, old, new in zip(XML_TOTAL_COLUMNS, self.values[i], values):
+                self.sums[name].remove(old)
+                self.sums[name].add(new)
+            self.values[i] = values
+            if progress:
+                progress(n, len(changed))
+
+        self.keys     = keys
+        self.rendered = len(changed)
+        return changed
+
+    def iter_fragments(self, validator=None):
+        for fragment, violations in zip(self.fragments, self.violations):
+            if validator is not None:
+                validator.replay(violations)
+            yield fragment
+
+    def totals(self) -> Dict[str, float]:
+        return {name: total.value() for name, total in self.sums.items()}
+
+
+def gerar_xml_integrado(p, grade: pd.DataFrame, user_inputs: Dict, out=None, validator=None, cache=None,
+                        progress=None):
+    """
+    Aplica a grade aos itens da DUIMP e gera o XML em streaming (ver
+    XMLBuilder.build_stream). Com `cache` (AdicaoFragmentCache guardado
+    entre execuções), só as adições das linhas alteradas são montadas.
+    `progress(feitas, total)` acompanha as adições montadas.
+    """
+    if cache is None:
+        with span("xml.gravacao", adicoes=len(p.items)):
+            return XMLBuilder(p, linhas_grade(p, grade)).build_stream(
+                user_inputs=user_inputs, out=out, validator=validator, progress=progress)
+    with span("xml.adicoes") as etapa:
+        etapa["montadas"] = len(cache.refresh(p, grade, progress))
+    with span("xml.gravacao", adicoes=len(p.items)):
+        return XMLBuilder(p).build_stream(user_inputs=user_inputs, out=out, validator=validator, cache=cache)
@@ -0,0 +1,128 @@
+"""Tabela de itens com esquema fixo, guardada por coluna."""
+from __future__ import annotations
+
+import math
+import sys
+from typing import Any, Dict
+
+from .lazy import LazyModule
+from .numeric import parse_br_number
+
+np = LazyModule("numpy", "np", globals())
+pd = LazyModule("pandas", "pd", globals())
+pa = LazyModule("pyarrow", "pa", globals())
+
+
+class ItemTable:
+    """
+    Itens de uma declaração guardados por coluna, em esquema fixo (campo →
+    valor padrão): números em np.ndarray float64/int64 e textos em
+    np.ndarray de objetos, com as strings repetidas (unidade, moeda, país,
+    fornecedor) compartilhadas. Substitui a lista de dicts dos parsers, que
+    repetia as chaves em cada item e fica na sessão o tempo todo.
+
+    Indexar ou iterar devolve um dict por item (cópia montada na hora), para
+    o código que lê campo a campo. to_dataframe() monta um DataFrame sobre os
+    mesmos arrays, sem cópia; os arrays são somente leitura, então quem for
+    editar (a grade) pede copy=True.
+    """
+
+    __slots__ = ("schema", "columns", "_length")
+
+    def __init__(self, schema: Dict[str, Any], columns: Dict[str, np.ndarray], length: int):
+        self.schema  = schema
+        self.columns = columns
+        self._length = length
+
+    @classmethod
+    def from_records(cls, records, schema: Dict[str, Any]) -> "ItemTable":
+        """
+        Monta a tabela a partir de dicts. Campo ausente recebe o padrão do
+        esquema; campos fora do esquema são descartados. Colunas com padrão
+        float ou None são numéricas (ausente/inválido → NaN).
+        """
+        records = list(records)
+        columns = {}
+        for name, default in schema.items():
+            values = [r.get(name, default) for r in records]
+            if default is None or isinstance(default, float):
+                array = np.array([parse_br_number(v, math.nan) for v in values], dtype=np.float64)
+            elif isinstance(default, int) and not isinstance(default, bool):
+                array = np.array(values, dtype=np.int64)
+            else:
+                pool  = {}
+                array = np.empty(len(values), dtype=object)
+                array[:] = [pool.setdefault(v, v) for v in values]
+            array.flags.writeable = False
+            columns[name] = array
+        return cls(schema, columns, len(records))
+
+    @classmethod
+    def from_arrow(cls, table: pa.Table, schema: Dict[str, Any]) -> "ItemTable":
+        """Tabela gravada por to_arrow(); colunas do esquema ausentes no arquivo recebem o padrão."""
+        columns = {}
+        for name, default in schema.items():
+            if name in table.column_names:
+                array = table.column(name).to_numpy(zero_copy_only=False)
+            else:
+                array = np.full(table.num_rows, default, dtype=object)
+            if default is None or isinstance(default, float):
+                array = array.astype(np.float64, copy=False)
+            elif isinstance(default, int) and not isinstance(default, bool):
+                array = array.astype(np.int64, copy=False)
+            else:
+                pool  = {}
+                texts = np.empty(len(array), dtype=object)
+                texts[:] = [pool.setdefault(v, v) for v in array]
+                array = texts
+            array.flags.writeable = False
+            columns[name] = array
+        return cls(schema, columns, table.num_rows)
+
+    def to_arrow(self) -> pa.Table:
+        """Colunas como tabela Arrow (números sem cópia), para gravar em disco."""
+        return pa.table({name: pa.array(array) for name, array in self.columns.items()})
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i) -> Dict[str, Any]:
+        row = {}
+        for name, array in self.columns.items():
+            value = array[i]
+            row[name] = value.item() if isinstance(value, np.generic) else value
+        return row
+
+    def __iter__(self):
+        names = list(self.columns)
+        for values in zip(*(array.tolist() for array in self.columns.values())):
+            yield dict(zip(names, values))
+
+    def column(self, name) -> np.ndarray:
+        return self.columns[name]
+
+    def to_dataframe(self, columns=None, rename=None, copy=False) -> pd.DataFrame:
+        names = list(self.columns) if columns is None else list(columns)
+        rename = rename or {}
+        return pd.DataFrame({rename.get(n, n): self.columns[n] for n in names}, copy=copy)
+
+    def nbytes(self) -> int:
+        """Memória dos arrays mais a das strings distintas (contadas uma vez)."""
+        total = 0
+        seen  = set()
+        for array in self.columns.values():
+            total += array.nbytes
+            if array.dtype == object:
+                for value in array:
+                    if id(value) not in seen:
+                        seen.add(id(value))
+                        total += sys.getsizeof(value)
+        return total
+
+
+def itens_para_dataframe(itens, columns=None, rename=None, copy=False) -> pd.DataFrame:
+    """DataFrame de uma ItemTable (sem cópia, salvo copy=True) ou de uma lista de dicts."""
+    if hasattr(itens, "to_dataframe"):
+        return itens.to_dataframe(columns, rename, copy)
+    df = pd.DataFrame.from_records(list(itens), columns=columns)
+    return df.rename(columns=rename) if rename else df
@@ -0,0 +1,270 @@
+"""
+Fila de leituras de PDF em segundo plano: uma por servidor, compartilhada
+pelas sessões do app.
+"""
+from __future__ import annotations
+
+import contextlib
+import logging
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from .instrumentation import record_run
+from .integrated import parse_duimp_file, parse_sigraweb_file
+from .parallel import PARALLEL_MAX_WORKERS, ParseCancelled, call_in_process
+from .uploads import spooled_upload, upload_digest
+
+logger = logging.getLogger(__name__)
+
+
+PARSE_JOB_WORKERS     = max(2, PARALLEL_MAX_WORKERS)
+PARSE_JOB_RESULT_TTL  = 30 * 60   # segundos que um resultado não coletado fica guardado
+
+PARSE_JOB_KINDS = {
+    # tipo: (rótulo, função de leitura, roda em processo separado)
+    "duimp":    ("DUIMP", parse_duimp_file, False),
+    "sigraweb": ("Sigraweb", parse_sigraweb_file, True),
+}
+
+
+class ParseJob:
+    """
+    Uma leitura de PDF em segundo plano. Sessões que enviam o mesmo arquivo
+    compartilham o mesmo ParseJob, cada uma pelo seu ParseJobHandle; `refs`
+    conta os handles que ainda esperam o resultado.
+    """
+
+    def __init__(self, kind, filename, key=None, session=None):
+        self.id          = uuid.uuid4().hex
+        self.kind        = kind
+        self.key         = key          # (tipo, SHA-256 do arquivo)
+        self.session     = session      # sessão que pediu primeiro (fila justa do pool)
+        self.label       = PARSE_JOB_KINDS[kind][0]
+        self.filename    = filename
+        self.status      = "pendente"   # pendente | executando | concluido | erro | cancelado
+        self.done        = 0
+        self.total       = 0
+        self.result      = None
+        self.error       = None
+        self.profile     = None   # RunProfile com as etapas da leitura
+        self.finished_at = None
+        self.refs        = 0
+        self.cancel_event = threading.Event()
+        self.future      = None
+        self._cleanup    = contextlib.ExitStack()
+
+    @property
+    def running(self):
+        return self.status in ("pendente", "executando")
+
+    @property
+    def fraction(self):
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    def _progress(self, done, total):
+        if self.cancel_event.is_set():
+            raise ParseCancelled()
+        self.done, self.total = done, total
+
+    def _finish(self, status):
+        self.status = status
+        self.finished_at = time.time()
+        self._cleanup.close()
+
+
+class ParseJobHandle:
+    """
+    O que a sessão guarda de uma leitura: id e nome de arquivo próprios, e o
+    andamento, o resultado e o erro do ParseJob compartilhado. Cancelar pelo
+    handle só desiste desta sessão; a leitura para quando ninguém mais espera.
+    """
+
+    def __init__(self, job: ParseJob, filename):
+        self.id        = uuid.uuid4().hex
+        self.job       = job
+        self.filename  = filename
+        self.shared    = False   # outra sessão começou esta leitura
+        self.cancelled = False
+        self.released  = False
+
+    @property
+    def status(self):
+        return "cancelado" if self.cancelled else self.job.status
+
+    @property
+    def running(self):
+        return not self.cancelled and self.job.running
+
+    def __getattr__(self, name):
+        # kind, label, done, total, fraction, result, error, profile, finished_at
+        return getattr(self.job, name)
+
+
+class ParseJobQueue:
+    """
+    Executa as leituras de PDF fora do script do Streamlit. Os jobs continuam
+    rodando entre reruns (troca de aba, reconexão do websocket); a sessão guarda
+    só o id do job e recolhe o resultado quando ele termina.
+
+    Leitura única por conteúdo: o upload é identificado pelo SHA-256 e, se o
+    mesmo arquivo já está sendo lido, a nova sessão espera essa leitura em vez
+    de começar outra. Resultados concluídos continuam compartilhados enquanto
+    alguma sessão os guarda (referência fraca: o último a soltar libera a
+    memória). O resultado compartilhado é só para leitura — a grade de edição
+    é sempre uma cópia. O MemoryBudget grava esses resultados em disco pela
+    chave de conteúdo (result_key/adopt_result), não uma cópia por sessão.
+
+    Com `pool` (WorkerPool), as leituras que rodam em outro processo usam os
+    workers persistentes em vez de um processo novo por leitura.
+    """
+
+    def __init__(self, max_workers=PARSE_JOB_WORKERS, pool=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="parse-job")
+        self._pool = pool
+        self._jobs: Dict[str, ParseJobHandle] = {}
+        self._inflight: Dict[tuple, ParseJob] = {}
+        self._results = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def submit(self, kind, uploaded_file, session=None) -> str:
+        self._prune()
+        key = (kind, upload_digest(uploaded_file))
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is None:
+                job = self._concluido(key, uploaded_file.name)
+            novo = job is None
+            if novo:
+                job = ParseJob(kind, uploaded_file.name, key, session)
+                self._inflight[key] = job
+            job.refs += 1
+            handle = ParseJobHandle(job, uploaded_file.name)
+            handle.shared = not novo
+            self._jobs[handle.id] = handle
+
+        if novo:
+            try:
+                path = job._cleanup.enter_context(spooled_upload(uploaded_file))
+                job.future = self._executor.submit(self._run, job, path)
+            except Exception:
+                self.discard(handle.id)
+                raise
+            logger.info(f"Job {job.id} ({job.label}) enfileirado: {job.filename}")
+        else:
+            logger.info(f"{job.label} {uploaded_file.name}: mesmo conteúdo do job {job.id}, leitura compartilhada")
+        return handle.id
+
+    def _concluido(self, key, filename) -> Optional[ParseJob]:
+        """Job já terminado com o resultado que alguma sessão ainda guarda (ou None)."""
+        result = self._results.get(key)
+        if result is None:
+            return None
+        job = ParseJob(key[0], filename, key)
+        job.result = result
+        job._finish("concluido")
+        return job
+
+    def _run(self, job, path):
+        if job.cancel_event.is_set():
+            self._finish(job, "cancelado")
+            return
+        job.status = "executando"
+        _, func, in_process = PARSE_JOB_KINDS[job.kind]
+        try:
+            with record_run(f"Leitura {job.label}") as job.profile:
+                if in_process and self._pool is not None:
+                    job.result = self._pool.run(func, (path,), job.session, job._progress, job.cancel_event)
+                elif in_process:
+                    job.result = call_in_process(func, (path,), job._progress, job.cancel_event)
+                else:
+                    job.result = func(path, job._progress)
+            self._finish(job, "concluido")
+        except ParseCancelled:
+            self._finish(job, "cancelado")
+        except Exception as e:
+            logger.error(f"Erro no job {job.id} ({job.label}): {e}")
+            job.error = e
+            self._finish(job, "erro")
+        logger.info(f"Job {job.id} ({job.label}) finalizado: {job.status}")
+
+    def _finish(self, job, status):
+        with self._lock:
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            if status == "concluido":
+                try:
+                    self._results[job.key] = job.result
+                except TypeError:
+                    pass   # resultado sem suporte a referência fraca: não fica compartilhado
+        job._finish(status)
+
+    # -- resultados compartilhados (MemoryBudget grava em disco por esta chave) --
+
+    def result_key(self, value) -> Optional[tuple]:
+        """Chave (tipo, SHA-256) de `value` se ele é um resultado compartilhado."""
+        with self._lock:
+            for key, result in self._results.items():
+                if result is value:
+                    return key
+        return None
+
+    def shared_result(self, key):
+        with self._lock:
+            return self._results.get(key)
+
+    def adopt_result(self, key, value):
+        """Registra `value` (relido do disco) para a chave, a menos que outro objeto já esteja lá."""
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                self._results[key] = result = value
+            return result
+
+    def shared_values(self) -> list:
+        with self._lock:
+            return list(self._results.values())
+
+    def get(self, job_id) -> Optional[ParseJobHandle]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _release(self, handle):
+        """Tira o handle da contagem do job; sem ninguém esperando, a leitura é cancelada."""
+        with self._lock:
+            if handle.released:
+                return
+            handle.released = True
+            job = handle.job
+            job.refs -= 1
+            if job.refs > 0 or not job.running:
+                return
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job._finish("cancelado")
+
+    def cancel(self, job_id):
+        handle = self.get(job_id)
+        if handle is None or not handle.running:
+            return
+        handle.cancelled = True
+        self._release(handle)
+
+    def discard(self, job_id):
+        """Remove o job da fila (cancela se ainda estiver rodando e ninguém mais esperar)."""
+        with self._lock:
+            handle = self._jobs.pop(job_id, None)
+        if handle is not None:
+            self._release(handle)
+
+    def _prune(self):
+        limite = time.time() - PARSE_JOB_RESULT_TTL
+        with self._lock:
+            antigos = [h.id for h in self._jobs.values() if h.finished_at and h.finished_at < limite]
+        for job_id in antigos:
+            self.discard(job_id)
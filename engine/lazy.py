@@ -0,0 +1,27 @@
+"""
+Dependências pesadas importadas sob demanda.
+
+`np = LazyModule("numpy", "np", globals())` cria um substituto que importa o
+módulo no primeiro acesso a um atributo e então toma o lugar do próprio nome
+global. Quem só usa o Processador TXT não paga pandas, PyMuPDF e plotly.
+Os módulos que citam esses nomes em anotações de tipo usam
+`from __future__ import annotations` para que elas não sejam avaliadas.
+"""
+import importlib
+
+
+class LazyModule:
+    """Módulo importado no primeiro acesso a um atributo."""
+
+    def __init__(self, name, alias, namespace):
+        self._name      = name
+        self._alias     = alias
+        self._namespace = namespace
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        self._namespace[self._alias] = module
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f"<módulo {self._name} (ainda não importado)>"
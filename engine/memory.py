@@ -0,0 +1,386 @@
+"""
+Orçamento de memória do estado das sessões do app.
+
+As leituras de cada sessão (DUIMP, Sigraweb, grade de edição, cache do XML)
+ficam num SpillableState em vez de soltas no st.session_state. O
+MemoryBudget, um por servidor, acompanha esses estados e o RSS do processo
+(psutil) e grava em disco (pickle) o estado das sessões ociosas, da menos
+usada para a mais usada; no próximo acesso o estado volta à memória sozinho.
+
+Resultados de leitura compartilhados entre sessões (ParseJobQueue) não vão
+no pickle de cada sessão: são gravados uma vez por conteúdo e, na volta,
+a sessão recebe o mesmo objeto que as outras ainda guardam.
+"""
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from typing import Dict, List, Optional
+
+from .items import ItemTable
+from .lazy import LazyModule
+
+logger = logging.getLogger(__name__)
+
+psutil = LazyModule("psutil", "psutil", globals())
+
+
+SESSION_BUDGET_MB        = 512       # estado de uma sessão acima disso é gravado em disco mais cedo
+PROCESS_BUDGET_MB        = 3 * 1024  # RSS do servidor acima disso grava sessões até voltar ao orçamento
+IDLE_SPILL_SECONDS       = 15 * 60   # sessão sem acesso há mais que isso vai para o disco
+OVER_BUDGET_IDLE_SECONDS = 60        # o mesmo, para sessões acima de SESSION_BUDGET_MB
+
+
+def estimate_nbytes(value, _seen=None) -> int:
+    """
+    Memória aproximada de `value`: DataFrame pelo memory_usage(deep=True),
+    ItemTable pelo nbytes() e o resto percorrendo dicts, sequências e
+    atributos. Objetos compartilhados (a grade guardada na GradeConferencia
+    é o próprio merged_df) contam uma vez.
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if value is None or isinstance(value, (str, bytes, bytearray, int, float)):
+        return sys.getsizeof(value)
+    if isinstance(value, ItemTable):
+        return value.nbytes()
+    pd_ = sys.modules.get("pandas")
+    if pd_ is not None and isinstance(value, (pd_.DataFrame, pd_.Series)):
+        total = value.memory_usage(deep=True)
+        return int(total.sum() if hasattr(total, "sum") else total)
+    np_ = sys.modules.get("numpy")
+    if np_ is not None and isinstance(value, np_.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_nbytes(k, seen) + estimate_nbytes(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v, seen) for v in value)
+    attrs = getattr(value, "__dict__", None)
+    if attrs is not None:
+        return sys.getsizeof(value) + estimate_nbytes(attrs, seen)
+    return sys.getsizeof(value)
+
+
+def _remover_arquivo(caminho: List[Optional[str]]):
+    if caminho[0] is not None:
+        try:
+            os.remove(caminho[0])
+        except OSError:
+            pass
+
+
+class _Compartilhado:
+    """Marca, no pickle da sessão, o lugar de um resultado compartilhado."""
+
+    __slots__ = ("chave",)
+
+    def __init__(self, chave):
+        self.chave = chave
+
+
+class SharedResults:
+    """
+    Resultados que várias sessões guardam (o mesmo objeto), gravados em disco
+    pela chave de conteúdo em vez de uma cópia por sessão.
+
+    `registro` é quem mantém esses resultados vivos (ParseJobQueue):
+    result_key(valor) devolve a chave do resultado compartilhado (ou None),
+    shared_result(chave) o objeto ainda em memória e adopt_result(chave,
+    valor) devolve o objeto registrado para a chave, registrando `valor` se
+    não houver, e shared_values() os que estão em memória. Cada arquivo fica em disco enquanto algum estado gravado
+    aponta para ele.
+    """
+
+    def __init__(self, spill_dir: str, registro=None):
+        self.registro   = registro
+        self._spill_dir = spill_dir
+        self._arquivos: Dict = {}   # chave -> [caminho, estados gravados que apontam para ele]
+        self._lock      = threading.Lock()
+
+    def chave(self, valor):
+        if self.registro is None or valor is None:
+            return None
+        return self.registro.result_key(valor)
+
+    def gravar(self, chave, valor):
+        """Garante o arquivo da chave em disco e conta mais um estado apontando para ele."""
+        with self._lock:
+            entrada = self._arquivos.get(chave)
+            if entrada is None:
+                fd, caminho = tempfile.mkstemp(prefix="compartilhado-", suffix=".pkl", dir=self._spill_dir)
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+                except Exception:
+                    os.remove(caminho)
+                    raise
+                entrada = self._arquivos[chave] = [caminho, 0]
+            entrada[1] += 1
+
+    def ler(self, chave):
+        """O resultado da chave: o objeto ainda em memória ou, sem ele, o do disco (registrado de novo)."""
+        valor = self.registro.shared_result(chave)
+        if valor is None:
+            with self._lock:
+                caminho = self._arquivos[chave][0]
+                with open(caminho, "rb") as f:
+                    valor = pickle.load(f)
+            valor = self.registro.adopt_result(chave, valor)
+        self.soltar(chave)
+        return valor
+
+    def soltar(self, chave):
+        with self._lock:
+            entrada = self._arquivos.get(chave)
+            if entrada is None:
+                return
+            entrada[1] -= 1
+            if entrada[1] <= 0:
+                del self._arquivos[chave]
+                _remover_arquivo(entrada)
+
+    def nbytes(self) -> int:
+        """Memória estimada dos resultados compartilhados ainda em memória."""
+        if self.registro is None:
+            return 0
+        return estimate_nbytes(self.registro.shared_values())
+
+
+def _soltar_estado(arquivo: List[Optional[str]], chaves: List, compartilhados: Optional[SharedResults]):
+    _remover_arquivo(arquivo)
+    for chave in chaves:
+        compartilhados.soltar(chave)
+
+
+class SpillableState:
+    """
+    Estado de uma sessão, lido e gravado como um dict (estado["merged_df"]).
+    spill() grava todos os valores num único pickle (referências
+    compartilhadas entre eles continuam compartilhadas na volta) e os solta da
+    memória; o primeiro acesso seguinte relê o arquivo. Valores que são
+    resultados compartilhados com outras sessões (`compartilhados`) entram no
+    pickle só pela chave e não contam em nbytes(): gravar esta sessão não os
+    libera enquanto outra os guarda. Os valores de
+    `descartaveis` são caches que podem ser refeitos: drop_discardable() os
+    zera quando a própria sessão passa do orçamento.
+
+    Outra sessão pode gravar este estado enquanto o script desta roda: o
+    acesso é protegido por lock, e quem já tinha o objeto em mãos continua
+    com ele (a gravação seguinte relê o arquivo antes de trocar o valor).
+    """
+
+    def __init__(self, spill_dir: str, descartaveis=(), compartilhados: Optional[SharedResults] = None, **valores):
+        self.id           = uuid.uuid4().hex
+        self.descartaveis = tuple(descartaveis)
+        self.last_access  = time.time()
+        self._spill_dir   = spill_dir
+        self._compartilhados = compartilhados
+        self._valores: Dict = dict(valores)
+        self._nbytes      = None
+        self._lock        = threading.RLock()
+        self._arquivo     = [None]   # lista para o finalize apagar o arquivo da vez
+        self._chaves      = []       # resultados compartilhados que o arquivo da vez aponta
+        weakref.finalize(self, _soltar_estado, self._arquivo, self._chaves, compartilhados)
+
+    @property
+    def spilled(self) -> bool:
+        return self._arquivo[0] is not None
+
+    def __getitem__(self, key):
+        with self._lock:
+            self._carregar()
+            return self._valores[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._carregar()
+            if self._valores.get(key) is not value:
+                self._nbytes = None
+            self._valores[key] = value
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._carregar()
+            return self._valores.get(key, default)
+
+    def _carregar(self):
+        self.last_access = time.time()
+        if not self.spilled:
+            return
+        inicio = time.perf_counter()
+        with open(self._arquivo[0], "rb") as f:
+            valores = pickle.load(f)
+        for key, value in valores.items():
+            if isinstance(value, _Compartilhado):
+                valores[key] = self._compartilhados.ler(value.chave)
+        self._valores = valores
+        _remover_arquivo(self._arquivo)
+        self._arquivo[0] = None
+        self._chaves.clear()
+        logger.info(f"Estado da sessão {self.id[:8]} recarregado do disco em {time.perf_counter() - inicio:.2f}s")
+
+    def _chave(self, value):
+        return None if self._compartilhados is None else self._compartilhados.chave(value)
+
+    def nbytes(self) -> int:
+        """
+        Memória estimada dos valores próprios da sessão (0 quando está em
+        disco; resultados compartilhados ficam de fora); guardada até a
+        próxima troca de valor.
+        """
+        with self._lock:
+            if self.spilled:
+                return 0
+            if self._nbytes is None:
+                proprios = {k: v for k, v in self._valores.items() if self._chave(v) is None}
+                self._nbytes = estimate_nbytes(proprios)
+            return self._nbytes
+
+    def spill(self) -> int:
+        """Grava os valores em disco e os solta da memória; devolve os bytes liberados (estimados)."""
+        with self._lock:
+            if self.spilled or all(v is None for v in self._valores.values()):
+                return 0
+            liberados = self.nbytes()
+            valores, chaves = {}, []
+            for key, value in self._valores.items():
+                chave = self._chave(value)
+                if chave is not None:
+                    self._compartilhados.gravar(chave, value)
+                    chaves.append(chave)
+                    value = _Compartilhado(chave)
+                valores[key] = value
+            fd, caminho = tempfile.mkstemp(prefix=f"{self.id[:8]}-", suffix=".pkl", dir=self._spill_dir)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(valores, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                os.remove(caminho)
+                for chave in chaves:
+                    self._compartilhados.soltar(chave)
+                raise
+            self._chaves[:] = chaves
+            self._arquivo[0] = caminho
+            self._valores    = {}
+            self._nbytes     = None
+        logger.info(f"Estado da sessão {self.id[:8]} gravado em disco ({liberados / 1e6:.1f} MB estimados)")
+        return liberados
+
+    def drop_discardable(self) -> int:
+        """Zera os caches refazíveis; devolve os bytes liberados (estimados)."""
+        with self._lock:
+            if self.spilled:
+                return 0
+            antes = self.nbytes()
+            for key in self.descartaveis:
+                if self._valores.get(key) is not None:
+                    self._valores[key] = None
+            self._nbytes = None
+            return antes - self.nbytes()
+
+
+class MemoryBudget:
+    """
+    Orçamentos de memória do servidor (um objeto por processo, compartilhado
+    pelas sessões). enforce() roda a cada execução do script, com o estado
+    da sessão que está rodando, e:
+
+      - grava em disco os estados sem acesso há IDLE_SPILL_SECONDS (ou há
+        OVER_BUDGET_IDLE_SECONDS, se passam do orçamento por sessão);
+      - zera os caches refazíveis da sessão atual se ela passa do orçamento;
+      - enquanto o RSS do processo passa do orçamento, grava os outros
+        estados, primeiro os acima do orçamento por sessão e depois do acesso
+        mais antigo para o mais recente.
+
+    Com `shared` (ParseJobQueue), os resultados de leitura compartilhados
+    entre sessões são gravados por conteúdo (SharedResults) e ficam fora da
+    conta de cada sessão; o resumo os mostra à parte.
+    """
+
+    def __init__(self, session_mb=SESSION_BUDGET_MB, process_mb=PROCESS_BUDGET_MB, spill_dir=None, shared=None):
+        self.session_bytes = int(session_mb * 1e6)
+        self.process_bytes = int(process_mb * 1e6)
+        self.spill_dir     = spill_dir or tempfile.mkdtemp(prefix="sessoes-")
+        self.compartilhados = SharedResults(self.spill_dir, shared)
+        self._states       = weakref.WeakSet()
+        self._lock         = threading.Lock()
+        if spill_dir is None:
+            weakref.finalize(self, shutil.rmtree, self.spill_dir, ignore_errors=True)
+
+    def new_state(self, descartaveis=(), **valores) -> SpillableState:
+        state = SpillableState(self.spill_dir, descartaveis, self.compartilhados, **valores)
+        with self._lock:
+            self._states.add(state)
+        return state
+
+    @staticmethod
+    def rss() -> int:
+        return psutil.Process().memory_info().rss
+
+    def _acima(self, state) -> bool:
+        return state.nbytes() > self.session_bytes
+
+    def enforce(self, atual: Optional[SpillableState] = None) -> List[SpillableState]:
+        """Aplica os orçamentos; devolve os estados gravados em disco nesta chamada."""
+        with self._lock:
+            outros = [s for s in self._states if s is not atual and not s.spilled]
+        agora     = time.time()
+        gravados  = []
+        restantes = []
+        for state in outros:
+            limite = OVER_BUDGET_IDLE_SECONDS if self._acima(state) else IDLE_SPILL_SECONDS
+            if agora - state.last_access >= limite and state.spill():
+                gravados.append(state)
+            else:
+                restantes.append(state)
+
+        if atual is not None and self._acima(atual):
+            liberados = atual.drop_discardable()
+            logger.warning(
+                f"Sessão {atual.id[:8]} acima do orçamento ({atual.nbytes() / 1e6:.0f} MB de "
+                f"{self.session_bytes / 1e6:.0f} MB); caches liberados: {liberados / 1e6:.1f} MB"
+            )
+
+        if gravados:
+            gc.collect()
+        if self.rss() > self.process_bytes:
+            restantes.sort(key=lambda s: (not self._acima(s), s.last_access))
+            for state in restantes:
+                if state.spill():
+                    gravados.append(state)
+                    gc.collect()
+                    if self.rss() <= self.process_bytes:
+                        break
+            else:
+                logger.warning(
+                    f"RSS do processo ({self.rss() / 1e6:.0f} MB) acima do orçamento "
+                    f"({self.process_bytes / 1e6:.0f} MB) sem outras sessões para gravar em disco"
+                )
+        return gravados
+
+    def summary(self) -> Dict:
+        """Números para o painel de diagnóstico."""
+        with self._lock:
+            states = list(self._states)
+        em_disco = sum(1 for s in states if s.spilled)
+        return {
+            "rss_mb":         round(self.rss() / 1e6, 1),
+            "orcamento_mb":   round(self.process_bytes / 1e6),
+            "sessoes":        len(states),
+            "sessoes_disco":  em_disco,
+            "estado_mb":      round(sum(s.nbytes() for s in states) / 1e6, 1),
+            "compartilhado_mb": round(self.compartilhados.nbytes() / 1e6, 1),
+        }
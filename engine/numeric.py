@@ -0,0 +1,88 @@
+"""Números no formato brasileiro e somas sem erro de arredondamento."""
+import math
+from fractions import Fraction
+
+
+def parse_br_number(value, default=0.0):
+    """
+    Converte "1.234,56" → 1234.56; números passam direto como float e vazio,
+    None ou texto inválido devolvem `default`. Os parsers convertem os campos
+    numéricos uma única vez, ao montar os itens: daí em diante (grade, totais
+    e XML) os valores já chegam como float.
+    """
+    if isinstance(value, str):
+        value = value.replace('.', '').replace(',', '.')
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def is_missing_number(value):
+    """None, NaN ou texto vazio (campo numérico ausente no PDF ou vazio na grade)."""
+    return value is None or value == "" or (isinstance(value, float) and value != value)
+
+class ExactSum:
+    """
+    Soma exata de floats (Fraction) que aceita retirar parcelas: os totais
+    do rodapé são corrigidos pela diferença das linhas alteradas e chegam ao
+    mesmo valor que exact_float_sum sobre todas as linhas. NaN e ±inf são
+    contados à parte e dão o mesmo resultado da soma comum.
+    """
+    __slots__ = ("finite", "nan", "pos_inf", "neg_inf")
+
+    def __init__(self):
+        self.finite  = Fraction(0)
+        self.nan     = 0
+        self.pos_inf = 0
+        self.neg_inf = 0
+
+    def add(self, value, count=1):
+        if value != value:
+            self.nan += count
+        elif value == math.inf:
+            self.pos_inf += count
+        elif value == -math.inf:
+            self.neg_inf += count
+        else:
+            self.finite += count * Fraction(value)
+
+    def remove(self, value):
+        self.add(value, -1)
+
+    def add_many(self, values, count=1):
+        """Várias parcelas de uma vez: numeradores inteiros sobre a maior potência de 2 dos denominadores."""
+        ratios = []
+        for value in values:
+            value = float(value)
+            if math.isfinite(value):
+                ratios.append(value.as_integer_ratio())
+            else:
+                self.add(value, count)
+        if ratios:
+            den = max(d for _, d in ratios)
+            self.finite += count * Fraction(sum(n * (den // d) for n, d in ratios), den)
+
+    def has_special(self):
+        return bool(self.nan or self.pos_inf or self.neg_inf)
+
+    def value(self) -> float:
+        if self.nan or (self.pos_inf and self.neg_inf):
+            return math.nan
+        if self.pos_inf:
+            return math.inf
+        if self.neg_inf:
+            return -math.inf
+        return float(self.finite)
+
+
+def exact_float_sum(values) -> float:
+    """Soma corretamente arredondada (math.fsum), igual a ExactSum.value() para as mesmas parcelas."""
+    finite  = []
+    special = ExactSum()
+    for value in values:
+        if math.isfinite(value):
+            finite.append(value)
+        else:
+            special.add(value)
+    return special.value() if special.has_special() else math.fsum(finite)
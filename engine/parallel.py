@@ -0,0 +1,148 @@
+"""
+Execução em processos filhos para os parsers de PDF e o lote.
+
+Os filhos saem do forkserver (spawn onde ele não existe), nunca de fork
+direto: as leituras rodam em threads do servidor do Streamlit, e um fork no
+meio de outros threads pode herdar um lock (logging, import, alocador)
+preso para sempre. O forkserver é um processo limpo, iniciado uma vez, que
+já importa PROCESS_PRELOAD; cada filho nasce dele com essas bibliotecas
+carregadas. As funções executadas vão por pickle e precisam ser funções de
+módulo importáveis (as do pacote engine).
+"""
+import functools
+import multiprocessing
+import os
+import sys
+import traceback
+from queue import Empty
+
+from .instrumentation import collect_spans, merge_spans
+
+
+PARALLEL_MAX_WORKERS     = max(1, min(4, os.cpu_count() or 1))
+PROCESS_PRELOAD          = ("fitz", "pdfplumber", "lxml.etree", "engine.batch", "engine.cte", "engine.integrated")
+
+# Como em todo filho de spawn/forkserver, o __main__ é importado de novo em cada
+# filho; sob `streamlit run` ele é o lançador do Streamlit, e com o módulo do
+# lançador já carregado no forkserver essa importação não custa nada.
+_LANCADORES = ("streamlit.web.cli",)
+
+class ParseCancelled(Exception):
+    """Leitura interrompida a pedido do usuário."""
+
+
+def processes_available():
+    # Processos daemon (os próprios workers) não podem criar filhos: lá dentro, tudo em sequência
+    return not multiprocessing.current_process().daemon
+
+
+@functools.lru_cache(maxsize=None)
+def process_context():
+    """Contexto do forkserver com PROCESS_PRELOAD (spawn sem forkserver, como no Windows)."""
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload(list(PROCESS_PRELOAD) + [m for m in _LANCADORES if m in sys.modules])
+    return ctx
+
+
+def _imap_worker(queue, func, tasks):
+    for i, args in tasks:
+        try:
+            queue.put((i, True, func(*args)))
+        except Exception as e:
+            queue.put((i, False, f"{type(e).__name__}: {e}"))
+
+
+def imap_processes(func, tasks, max_workers=None):
+    """
+    Executa func(*args) para cada tupla de `tasks` em processos filhos e
+    devolve (indice, resultado) à medida que cada tarefa termina. Com um
+    único worker, ou dentro de um worker, executa em sequência no próprio
+    processo.
+    """
+    tasks = list(tasks)
+    workers = min(max_workers or PARALLEL_MAX_WORKERS, len(tasks))
+    if workers <= 1 or not processes_available():
+        for i, args in enumerate(tasks):
+            yield i, func(*args)
+        return
+
+    ctx   = process_context()
+    queue = ctx.Queue()
+    procs = [
+        ctx.Process(target=_imap_worker, daemon=True,
+                    args=(queue, func, [(i, tasks[i]) for i in range(w, len(tasks), workers)]))
+        for w in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    try:
+        pending = len(tasks)
+        while pending:
+            try:
+                i, ok, result = queue.get(timeout=0.5)
+            except Empty:
+                if not any(proc.is_alive() for proc in procs) and queue.empty():
+                    raise RuntimeError("Processo de trabalho encerrado antes de concluir as tarefas.")
+                continue
+            if not ok:
+                raise RuntimeError(f"Falha na tarefa {i}: {result}")
+            pending -= 1
+            yield i, result
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+        queue.close()
+
+
+def _call_child(queue, func, args):
+    try:
+        with collect_spans() as execucao:
+            result = func(*args, progress=lambda done, total: queue.put(("progress", done, total)))
+        queue.put(("ok", result, execucao.etapas))
+    except Exception as e:
+        queue.put(("error", f"{type(e).__name__}: {e}", traceback.format_exc()))
+
+
+def call_in_process(func, args=(), progress=None, cancel_event=None):
+    """
+    Executa func(*args, progress=...) em um processo filho e devolve o
+    resultado. O andamento reportado no filho é repassado para `progress` no
+    processo atual, assim como as etapas medidas no filho (instrumentation).
+    Se `cancel_event` for sinalizado, o filho é encerrado e ParseCancelled é
+    levantada. Dentro de um worker, executa diretamente.
+    """
+    if not processes_available():
+        return func(*args, progress=progress)
+
+    ctx   = process_context()
+    queue = ctx.Queue()
+    proc  = ctx.Process(target=_call_child, args=(queue, func, args), daemon=True)
+    proc.start()
+    try:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                raise ParseCancelled()
+            try:
+                kind, value, extra = queue.get(timeout=0.5)
+            except Empty:
+                if not proc.is_alive() and queue.empty():
+                    raise RuntimeError("Processo de trabalho encerrado sem devolver resultado.")
+                continue
+            if kind == "progress":
+                if progress:
+                    progress(value, extra)
+            elif kind == "ok":
+                merge_spans(extra)
+                return value
+            else:
+                raise RuntimeError(f"{value}\n{extra}")
+    finally:
+        proc.join(timeout=1)
+        if proc.is_alive():
+            proc.terminate()
+            proc.join()
+        queue.close()
@@ -0,0 +1,369 @@
+"""
+Pool de processos persistente, criado uma vez por servidor (st.cache_resource
+no app) e compartilhado pelas sessões.
+
+call_in_process e imap_processes criam processos a cada chamada, e cada
+processo novo paga a importação de PyMuPDF, pdfplumber e lxml se o
+processo principal ainda não as carregou. O WorkerPool mantém os workers
+vivos entre execuções do script. Eles saem do forkserver de
+process_context(), que já importou PROCESS_PRELOAD, então um worker novo
+(inclusive o que substitui um reciclado depois de POOL_MAX_TASKS tarefas)
+já começa com tudo carregado, sem fork a partir dos threads do servidor.
+Sem forkserver (Windows), os workers usam spawn e importam PROCESS_PRELOAD
+ao iniciar.
+
+A fila é limitada (POOL_MAX_QUEUED) e justa entre sessões: cada sessão tem
+a sua fila e os workers pegam a próxima tarefa alternando entre elas, então
+um lote grande de uma sessão não segura a leitura de outra.
+"""
+from __future__ import annotations
+
+import collections
+import importlib
+import logging
+import threading
+import traceback
+from queue import Queue
+from typing import Iterable, Optional
+
+from .instrumentation import collect_spans, merge_spans
+from .parallel import PARALLEL_MAX_WORKERS, PROCESS_PRELOAD, ParseCancelled, process_context
+
+logger = logging.getLogger(__name__)
+
+
+POOL_WORKERS    = PARALLEL_MAX_WORKERS
+POOL_MAX_TASKS  = 50    # tarefas por worker antes de trocá-lo (contém vazamentos das bibliotecas de PDF)
+POOL_MAX_QUEUED = 64    # tarefas esperando, somando as sessões; submit() espera abaixo disso
+POOL_POLL       = 0.5   # segundos entre as verificações de cancelamento
+
+
+def _importar(modulos):
+    for modulo in modulos:
+        try:
+            importlib.import_module(modulo)
+        except ImportError as e:
+            logger.warning(f"Pré-carga de {modulo} no pool falhou: {e}")
+
+
+def _worker_main(conn, preload):
+    """Laço do worker: recebe (func, args, com_andamento) pelo pipe até receber None."""
+    _importar(preload)   # já importados no forkserver; aqui só vale para spawn
+    while True:
+        try:
+            tarefa = conn.recv()
+        except EOFError:   # processo principal encerrado
+            break
+        if tarefa is None:
+            break
+        func, args, com_andamento = tarefa
+        try:
+            with collect_spans() as execucao:
+                if com_andamento:
+                    result = func(*args, progress=lambda done, total: conn.send(("progress", done, total)))
+                else:
+                    result = func(*args)
+            conn.send(("ok", result, execucao.etapas))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}", traceback.format_exc()))
+    conn.close()
+
+
+class PoolTask:
+    """Tarefa enviada ao pool: espera com wait(), que devolve o resultado ou levanta o erro."""
+
+    def __init__(self, session, func, args, progress=None, cancel_event=None):
+        self.session      = session
+        self.func         = func
+        self.args         = args
+        self.progress     = progress
+        self.cancel_event = cancel_event or threading.Event()
+        self.status       = "pendente"   # pendente | executando | concluido | erro | cancelado
+        self.result       = None
+        self.error        = None
+        self.etapas       = []
+        self.index        = None
+        self._done        = threading.Event()
+        self._fila        = None   # _FairQueue onde está esperando
+        self._avisar      = None   # Queue de imap()
+
+    def _finish(self, status, result=None, error=None):
+        self.status, self.result, self.error = status, result, error
+        self._done.set()
+        if self._avisar is not None:
+            self._avisar.put(self)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def wait(self):
+        """
+        Espera a tarefa no thread de quem chamou (as etapas medidas no worker
+        entram na execução em andamento desse thread).
+        """
+        while not self._done.wait(POOL_POLL):
+            if self.cancel_event.is_set() and self._fila.remove(self):
+                self._finish("cancelado")
+        if self.status == "cancelado":
+            raise ParseCancelled()
+        if self.status == "erro":
+            raise RuntimeError(self.error)
+        merge_spans(self.etapas)
+        return self.result
+
+
+class _FairQueue:
+    """
+    Uma fila por sessão. get() entrega a tarefa da sessão com menos tarefas
+    em execução nos workers e, no empate, alterna entre as sessões.
+    """
+
+    def __init__(self, limite):
+        self.limite   = limite
+        self._filas   = collections.OrderedDict()
+        self._rodando = collections.Counter()
+        self._total   = 0
+        self._cond    = threading.Condition()
+        self.fechada  = False
+
+    def put(self, task: PoolTask):
+        with self._cond:
+            while self._total >= self.limite and not self.fechada:
+                if task.cancel_event.is_set():
+                    raise ParseCancelled()
+                self._cond.wait(POOL_POLL)
+            if self.fechada:
+                raise RuntimeError("Pool de processos encerrado.")
+            self._filas.setdefault(task.session, collections.deque()).append(task)
+            self._total += 1
+            task._fila = self
+            self._cond.notify_all()
+
+    def get(self, timeout) -> Optional[PoolTask]:
+        with self._cond:
+            if not self._total and not self.fechada:
+                self._cond.wait(timeout)
+            if not self._total:
+                return None
+            session = min(self._filas, key=self._rodando.__getitem__)
+            fila = self._filas.pop(session)
+            task = fila.popleft()
+            if fila:
+                self._filas[session] = fila   # volta para o fim da rodada
+            self._rodando[session] += 1
+            self._total -= 1
+            self._cond.notify_all()
+            return task
+
+    def task_done(self, task):
+        with self._cond:
+            self._rodando[task.session] -= 1
+            if not self._rodando[task.session]:
+                del self._rodando[task.session]
+
+    def remove(self, task) -> bool:
+        """Tira da fila uma tarefa que ainda não começou; False se ela já saiu."""
+        with self._cond:
+            fila = self._filas.get(task.session)
+            if fila is None or task not in fila:
+                return False
+            fila.remove(task)
+            if not fila:
+                del self._filas[task.session]
+            self._total -= 1
+            self._cond.notify_all()
+            return True
+
+    def __len__(self):
+        return self._total
+
+    def close(self):
+        with self._cond:
+            self.fechada = True
+            restantes = [task for fila in self._filas.values() for task in fila]
+            self._filas.clear()
+            self._total = 0
+            self._cond.notify_all()
+        return restantes
+
+
+class _Worker:
+    def __init__(self, ctx, preload):
+        self.conn, filho = ctx.Pipe()
+        self.proc  = ctx.Process(target=_worker_main, args=(filho, preload), daemon=True)
+        self.proc.start()
+        filho.close()
+        self.tasks = 0
+
+    def stop(self, terminate=False):
+        if not terminate:
+            try:
+                self.conn.send(None)
+            except OSError:
+                terminate = True
+        if terminate:
+            self.proc.terminate()
+        self.proc.join(timeout=5)
+        if self.proc.is_alive():
+            self.proc.kill()
+            self.proc.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """
+    Workers persistentes, cada um atendido por um thread do processo
+    principal que pega a próxima tarefa da fila justa, repassa o andamento
+    e devolve o resultado. Cancelar uma tarefa em execução encerra o worker
+    dela, e outro é criado no lugar.
+
+    As tarefas vão para o worker por pickle depois que ele já existe, então
+    as funções enviadas precisam ser funções de módulo importáveis (as do
+    pacote engine), não funções do script do Streamlit.
+    """
+
+    def __init__(self, workers=POOL_WORKERS, max_tasks=POOL_MAX_TASKS, max_queued=POOL_MAX_QUEUED,
+                 preload=PROCESS_PRELOAD):
+        self._ctx = process_context()
+        self.workers   = workers
+        self.max_tasks = max_tasks
+        self._preload  = tuple(preload)
+        self._fila     = _FairQueue(max_queued)
+        self._slots    = [
+            threading.Thread(target=self._slot, name=f"pool-{i}", daemon=True) for i in range(workers)
+        ]
+        for slot in self._slots:
+            slot.start()
+        logger.info(f"Pool de processos: {workers} worker(s) ({self._ctx.get_start_method()}), "
+                    f"troca a cada {max_tasks} tarefas")
+
+    # --------------------------------------------------------------------------
+    # Envio de tarefas
+    # --------------------------------------------------------------------------
+    def submit(self, func, args=(), session=None, progress=None, cancel_event=None) -> PoolTask:
+        """Enfileira func(*args) (com progress=..., se dado); espera vaga se a fila estiver cheia."""
+        task = PoolTask(session, func, tuple(args), progress, cancel_event)
+        self._fila.put(task)
+        return task
+
+    def run(self, func, args=(), session=None, progress=None, cancel_event=None):
+        """Como call_in_process: func(*args, progress=...) num worker, com andamento e cancelamento."""
+        return self.submit(func, args, session, progress, cancel_event).wait()
+
+    def imap(self, func, tasks: Iterable, session=None):
+        """
+        Como imap_processes: devolve (índice, resultado) de func(*args) para
+        cada tupla de `tasks`, na ordem em que terminam. A sessão mantém no
+        máximo 2 tarefas por worker na fila, e `tasks` é consumido aos poucos.
+        """
+        concluidas = Queue()
+        pendentes  = enumerate(tasks)
+        enviadas   = []
+        em_curso   = 0
+        try:
+            while True:
+                while em_curso < 2 * self.workers:
+                    proxima = next(pendentes, None)
+                    if proxima is None:
+                        break
+                    task = PoolTask(session, func, tuple(proxima[1]))
+                    task.index, task._avisar = proxima[0], concluidas
+                    self._fila.put(task)
+                    enviadas.append(task)
+                    em_curso += 1
+                if not em_curso:
+                    return
+                task = concluidas.get()
+                enviadas.remove(task)
+                em_curso -= 1
+                if task.status != "concluido":
+                    raise RuntimeError(f"Falha na tarefa {task.index}: {task.error or task.status}")
+                merge_spans(task.etapas)
+                yield task.index, task.result
+        finally:
+            for task in enviadas:
+                task.cancel()
+
+    @property
+    def queued(self) -> int:
+        return len(self._fila)
+
+    def shutdown(self):
+        for task in self._fila.close():
+            task._finish("cancelado")
+        for slot in self._slots:
+            slot.join(timeout=10)
+
+    # --------------------------------------------------------------------------
+    # Workers
+    # --------------------------------------------------------------------------
+    def _slot(self):
+        worker = _Worker(self._ctx, self._preload)
+        try:
+            while not self._fila.fechada:
+                task = self._fila.get(POOL_POLL)
+                if task is None:
+                    continue
+                if task.cancel_event.is_set():
+                    self._fila.task_done(task)
+                    task._finish("cancelado")
+                    continue
+                if worker is None or not worker.proc.is_alive():
+                    worker = _Worker(self._ctx, self._preload)
+                try:
+                    inteiro = self._executar(worker, task)
+                finally:
+                    self._fila.task_done(task)
+                if not inteiro:
+                    worker = None   # encerrado no cancelamento ou morreu no meio da tarefa
+                    continue
+                worker.tasks += 1
+                if worker.tasks >= self.max_tasks:
+                    logger.info(f"Worker {worker.proc.pid} reciclado após {worker.tasks} tarefas")
+                    worker.stop()
+                    worker = None
+        finally:
+            if worker is not None:
+                worker.stop()
+
+    def _executar(self, worker, task) -> bool:
+        """Roda a tarefa no worker; False se o worker teve de ser encerrado."""
+        task.status = "executando"
+        try:
+            worker.conn.send((task.func, task.args, task.progress is not None))
+        except (OSError, EOFError) as e:
+            worker.stop(terminate=True)
+            task._finish("erro", error=f"Worker indisponível: {e}")
+            return False
+        except Exception as e:   # argumentos que não podem ir para outro processo
+            task._finish("erro", error=f"{type(e).__name__}: {e}")
+            return True
+        while True:
+            if task.cancel_event.is_set():
+                worker.stop(terminate=True)
+                task._finish("cancelado")
+                return False
+            try:
+                if not worker.conn.poll(POOL_POLL):
+                    if not worker.proc.is_alive():
+                        raise EOFError()
+                    continue
+                kind, value, extra = worker.conn.recv()
+            except (OSError, EOFError):
+                worker.stop(terminate=True)
+                task._finish("erro", error="Processo de trabalho encerrado sem devolver resultado.")
+                return False
+            if kind == "progress":
+                try:
+                    task.progress(value, extra)
+                except ParseCancelled:
+                    task.cancel_event.set()
+                except Exception as e:
+                    logger.warning(f"Erro ao repassar o andamento da tarefa: {e}")
+            elif kind == "ok":
+                task.etapas = extra
+                task._finish("concluido", value)
+                return True
+            else:
+                task._finish("erro", error=f"{value}\n{extra}")
+                return True
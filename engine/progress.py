@@ -0,0 +1,78 @@
+"""Andamento do processamento em unidades reais de trabalho."""
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressReporter:
+    """
+    Andamento de um trabalho em unidades reais (páginas, arquivos, linhas,
+    adições). Quem faz o trabalho chama `reporter(feitos, total)`, a mesma
+    assinatura dos callbacks `progress` dos parsers, ou `advance(n)`. A
+    atualização só chega ao backend (_emit) se passou `min_interval` desde
+    a anterior ou se o trabalho terminou, para que a tela nunca custe mais
+    que o próprio trabalho. Esta classe não mostra nada; os backends são
+    StreamlitProgress e LogProgress.
+    """
+    MIN_INTERVAL = 0.1
+
+    def __init__(self, label="", unit="", min_interval=None):
+        self.label        = label
+        self.unit         = unit
+        self.min_interval = self.MIN_INTERVAL if min_interval is None else min_interval
+        self.done         = 0
+        self.total        = 0
+        self.detail       = ""
+        self._last        = -math.inf
+
+    def __call__(self, done, total=None, detail=""):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if detail:
+            self.detail = detail
+        now = time.monotonic()
+        if now - self._last >= self.min_interval or (self.total and done >= self.total):
+            self._last = now
+            self._emit()
+
+    def advance(self, n=1, detail=""):
+        self(self.done + n, detail=detail)
+
+    @property
+    def fraction(self):
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def text(self):
+        texto = f"{self.label}: {self.done} de {self.total} {self.unit}".rstrip()
+        return f"{texto} — {self.detail}" if self.detail else texto
+
+    def finish(self):
+        """Encerra o andamento (remove a barra da tela, registra o fim no log)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.finish()
+
+    def _emit(self):
+        pass
+
+class LogProgress(ProgressReporter):
+    """Andamento no log (execução sem Streamlit: lote, linha de comando)."""
+    MIN_INTERVAL = 5.0
+
+    def __init__(self, label="", unit="", min_interval=None, log=None):
+        super().__init__(label, unit, min_interval)
+        self._log   = log or logger
+        self._start = time.monotonic()
+
+    def _emit(self):
+        self._log.info("%s (%.0f%%)", self.text, self.fraction * 100)
+
+    def finish(self):
+        self._log.info("%s: concluído em %.1f s", self.label, time.monotonic() - self._start)
@@ -0,0 +1,435 @@
+"""
+Parser do relatório Sigraweb (Conferência do Processo Detalhado): cabeçalho
+global e adições com os tributos de cada item.
+"""
+import gc
+import logging
+import re
+from datetime import datetime
+from typing import Dict, Optional
+
+from .instrumentation import span
+from .items import ItemTable
+from .lazy import LazyModule
+from .numeric import parse_br_number
+
+logger = logging.getLogger(__name__)
+
+pdfplumber = LazyModule("pdfplumber", "pdfplumber", globals())
+
+
+# Campos de cada adição do Sigraweb → valor padrão (define também o tipo da coluna)
+SIGRAWEB_ITEM_SCHEMA = {
+    'numero_item':  0,
+    'numeroAdicao': '',
+
+    # Identificação
+    'ncm':             '',
+    'codigo_interno':  '',
+    'descricao':       '',
+    'paisOrigem':      '',
+    'fornecedor_raw':  'HAFELE SE & CO KG',
+    'endereco_raw':    '',
+
+    # Quantidades
+    'quantidade':            0.0,   # Qnt. Estatística
+    'quantidade_comercial':  0.0,   # Quantidade na linha do item
+    'unidade':               'PECA',
+
+    # Valores
+    'pesoLiq':      0.0,
+    'valorTotal':   0.0,   # FOB em EUR
+    'valorUnit':    0.0,
+    'valorAduaneiroReal': 0.0,   # Valor Aduaneiro em BRL
+    'valorAduaneiroUSD':  0.0,   # Valor Aduaneiro em USD
+    'moeda':        'EURO/COM.EUROPEIA',
+
+    # Frete e Seguro (em USD e BRL)
+    'freteUSD':     0.0,
+    'freteReal':    0.0,
+    'seguroUSD':    0.0,
+    'seguroReal':   0.0,
+
+    # Tributos
+    'ii_aliquota':      0.0,
+    'ii_base_calculo':  0.0,
+    'ii_valor_devido':  0.0,
+
+    'ipi_aliquota':     0.0,
+    'ipi_base_calculo': 0.0,
+    'ipi_valor_devido': 0.0,
+
+    'pis_aliquota':     0.0,
+    'pis_base_calculo': 0.0,
+    'pis_valor_devido': 0.0,
+
+    'cofins_aliquota':     0.0,
+    'cofins_base_calculo': 0.0,
+    'cofins_valor_devido': 0.0,
+
+    # Totais calculados
+    'total_impostos':            0.0,
+    'valor_total_com_impostos':  0.0,
+}
+
+
+class SigrawebDocument(dict):
+    """Documento lido do Sigraweb (cabecalho, itens, totais); dict que aceita referência fraca."""
+
+    __slots__ = ("__weakref__",)
+
+
+class SigrawebPDFParser:
+    """
+    Parser dedicado para o layout de exportação do Sigraweb
+    (Conferência do Processo Detalhado).
+    Extrai cabeçalho global e todas as adições com tributos por item.
+    """
+
+    def __init__(self):
+        self.documento = SigrawebDocument({
+            'cabecalho': {},
+            'itens': ItemTable.from_records([], SIGRAWEB_ITEM_SCHEMA),
+            'totais': {}
+        })
+
+    @staticmethod
+    def _parse_valor(valor_str: str) -> float:
+        return parse_br_number(valor_str)
+
+    @staticmethod
+    def _fmt_date_to_yyyymmdd(date_str: str) -> str:
+        """Converte datas como 17/04/2026 → 20260417"""
+        try:
+            d = datetime.strptime(date_str.strip(), '%d/%m/%Y')
+            return d.strftime('%Y%m%d')
+        except:
+            return date_str.replace('/', '').replace('-', '')[:8]
+
+    def parse_pdf(self, pdf_path: str, progress=None) -> Dict:
+        """
+        Lê o PDF e preenche cabeçalho, itens e totais. Não usa Streamlit: o
+        andamento é reportado por `progress(paginas_lidas, total_paginas)` e os
+        erros são propagados para quem chamou.
+        """
+        logger.info(f"Iniciando parsing Sigraweb: {pdf_path}")
+
+        text_chunks = []
+        with span("sigraweb.texto") as etapa, pdfplumber.open(pdf_path) as pdf:
+            total_pages = etapa["paginas"] = len(pdf.pages)
+            for i, page in enumerate(pdf.pages):
+                text = page.extract_text(layout=False)
+                # Caracteres e objetos da página ficam em cache no pdfplumber até o fim do arquivo
+                (getattr(page, "close", None) or page.flush_cache)()
+                if text:
+                    text_chunks.append(text)
+                if progress:
+                    progress(i + 1, total_pages)
+
+        full_text = "\n".join(text_chunks)
+        with span("sigraweb.cabecalho"):
+            self._extract_header(text_chunks[0] if text_chunks else "", text_chunks[1] if len(text_chunks) > 1 else "")
+        with span("sigraweb.itens") as etapa:
+            self._extract_items(full_text)
+            self._calculate_totals()
+            etapa["itens"] = len(self.documento['itens'])
+
+        del text_chunks
+        del full_text
+        gc.collect()
+
+        return self.documento
+
+    def _extract_header(self, page1_text: str, page2_text: str):
+        """Extrai todos os dados do cabeçalho do processo da página 1 e 2."""
+        h = {}
+
+        def _find(pattern, text, group=1, default=''):
+            m = re.search(pattern, text)
+            return m.group(group).strip() if m else default
+
+        # --- Página 1 ---
+        h['numeroDI']        = _find(r'Número DI:\s*([\w]+)', page1_text)
+        h['sigraweb']        = _find(r'SIGRAWEB:\s*([\w]+)', page1_text)
+        h['identificacao']   = _find(r'Identificação:\s*([\w]+)', page1_text)
+        h['cnpj']            = _find(r'CNPJ:\s*([\d\.\/\-]+)', page1_text)
+        h['nomeImportador']  = _find(r'Nome da Empresa:\s*(.+?)(?:\n|CNPJ)', page1_text)
+        h['dataRegistro']    = _find(r'Data Registro:([\d\-T:\.+]+)', page1_text)
+        if h['dataRegistro']:
+            h['dataRegistro'] = h['dataRegistro'][:10].replace('-', '')
+
+        h['pesoBruto']       = _find(r'Peso Bruto:([\d\.,]+)', page1_text)
+        h['pesoLiquido']     = _find(r'Peso Líquido:([\d\.,]+)', page1_text)
+        h['volumes']         = _find(r'Volumes:([\d]+)', page1_text)
+        h['embalagem']       = _find(r'Embalagem:(\w+)', page1_text)
+
+        h['urf']             = _find(r'URF de Entrada:\s*(\d+)', page1_text, default='0917900')
+        h['urfDespacho']     = _find(r'URF de Despacho:\s*(\d+)', page1_text, default='0917900')
+        h['urfNome']         = _find(r'URF de Entrada:\s*\d+\s*(.+?)(?:\n|URF)', page1_text, default='ALF - CURITIBA')
+        h['modalidade']      = _find(r'Modalidade de Despacho:\s*(.+?)(?:\n)', page1_text, default='Normal')
+        h['viaTransporte']   = _find(r'Via Transporte:\s*(.+?)(?:\n)', page1_text, default='Aéreo')
+
+        # País procedência (remove código numérico e lixo)
+        pais_raw = _find(r'País de Procedência:\s*\d+\s*(.+?)(?:\n|Local|Incoterms)', page1_text)
+        h['paisProcedencia'] = pais_raw.strip() if pais_raw else 'Alemanha'
+
+        h['localEmbarque']   = _find(r'Local de Embarque:\s*(.+?)(?:\n|Data)', page1_text)
+        h['dataEmbarque']    = _find(r'Data de Embarque:\s*([\d\/]+)', page1_text)
+        h['dataChegada']     = _find(r'Data de Chegada no Brasil:\s*([\d\/]+)', page1_text)
+        h['incoterms']       = _find(r'Incoterms:\s*(\w+)', page1_text, default='FCA')
+        h['recinto']         = _find(r'Recinto:\s*(\d+)\s*(.+?)(?:\n)', page1_text, default='9991101')
+
+        h['idtConhecimento'] = _find(r'IDT\. Conhecimento:\s*([\w]+)', page1_text)
+        h['idtMaster']       = _find(r'IDT\. Master:\s*([\w]+)', page1_text)
+
+        h['transportador']   = _find(r'Transportador:\s*(.+?)(?:\n|Agente)', page1_text)
+        h['agenteCarga']     = _find(r'Agente de Carga:\s*(.+?)(?:\n|CE)', page1_text)
+
+        # Valores financeiros (página 1 e 2)
+        combined = page1_text + "\n" + page2_text
+
+        h['taxaEUR']         = _find(r'Taxa EUR:\s*([\d\.,]+)', combined)
+        h['taxaDolar']       = _find(r'Taxa do Dólar:\s*([\d\.,]+)', combined)
+        h['fobEUR']          = _find(r'FOB:\s*([\d\.,]+)\s*\(EUR\)', combined)
+        h['fobUSD']          = _find(r'FOB:.*?\(EUR\)\s*;\s*([\d\.,]+)\s*\(USD\)', combined)
+        h['fobBRL']          = _find(r'FOB:.*?\(USD\);\s*([\d\.,]+)\s*\(BRL\)', combined)
+        h['freteEUR']        = _find(r'Frete:\s*([\d\.,]+)\s*\(EUR\)', combined)
+        h['freteUSD']        = _find(r'Frete:.*?\(EUR\)\s*;\s*([\d\.,]+)\s*\(USD\)', combined)
+        h['freteBRL']        = _find(r'Frete:.*?\(USD\);\s*([\d\.,]+)\s*\(BRL\)', combined)
+        h['seguroUSD']       = _find(r'Seguro:\s*([\d\.,]+)\s*\(USD\)', combined)
+        h['seguroBRL']       = _find(r'Seguro:.*?;\s*([\d\.,]+)\s*\(BRL\)', combined)
+        h['cifUSD']          = _find(r'CIF:\s*([\d\.,]+)\s*\(USD\)', combined)
+        h['cifBRL']          = _find(r'CIF:.*?;\s*([\d\.,]+)\s*\(BRL\)', combined)
+        h['valorAduaneiroUSD'] = _find(r'Valor Aduaneiro:\s*([\d\.,]+)\s*\(USD\)', combined)
+        h['valorAduaneiroBRL'] = _find(r'Valor Aduaneiro:.*?;\s*([\d\.,]+)\s*\(BRL\)', combined)
+
+        # Tributos totais
+        h['totalII']         = _find(r'II\s+([\d\.,]+)\s+[\d\.,]+\s+[\d\.,]+\s+[\d\.,]+\s+[\d\.,]+\s+Itau', page1_text)
+        # Simplificado: pegar da tabela de cabeçalho
+        trib_m = re.search(
+            r'([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+Itau\s+(\d+)\s+([\d\-]+)',
+            page1_text
+        )
+        if trib_m:
+            h['totalII']     = trib_m.group(1)
+            h['totalIPI']    = trib_m.group(2)
+            h['totalPIS']    = trib_m.group(3)
+            h['totalCOFINS'] = trib_m.group(4)
+            h['totalSiscomex'] = trib_m.group(5)
+            h['banco']       = 'Itau'
+            h['agencia']     = trib_m.group(6)
+            h['conta']       = trib_m.group(7)
+        else:
+            h['totalII'] = h['totalIPI'] = h['totalPIS'] = h['totalCOFINS'] = '0'
+            h['totalSiscomex'] = '0'
+            h['banco']   = _find(r'Banco:\s*(\w+)', page2_text, default='Itau')
+            h['agencia'] = _find(r'Agência:\s*([\d]+)', page2_text, default='3715')
+            h['conta']   = _find(r'Conta Corrente:\s*([\w\-]+)', page2_text, default='')
+
+        # Converter datas para yyyymmdd
+        h['dataEmbarqueISO'] = self._fmt_date_to_yyyymmdd(h['dataEmbarque']) if h['dataEmbarque'] else ''
+        h['dataChegadaISO']  = self._fmt_date_to_yyyymmdd(h['dataChegada']) if h['dataChegada'] else ''
+
+        self.documento['cabecalho'] = h
+
+    def _extract_items(self, full_text: str):
+        """Extrai cada adição com seus dados fiscais."""
+        # Divide o texto completo em blocos por adição
+        chunks = re.split(r'Informações da Adição Nº:\s*(\d+)', full_text)
+        items_found = []
+
+        if len(chunks) <= 1:
+            logger.warning("Nenhuma adição encontrada no PDF Sigraweb.")
+            self.documento['itens'] = ItemTable.from_records([], SIGRAWEB_ITEM_SCHEMA)
+            return
+
+        for i in range(1, len(chunks), 2):
+            num_str = chunks[i].strip()
+            content  = chunks[i + 1] if (i + 1) < len(chunks) else ''
+            item = self._parse_item_block(num_str, content)
+            if item:
+                items_found.append(item)
+
+        self.documento['itens'] = ItemTable.from_records(items_found, SIGRAWEB_ITEM_SCHEMA)
+
+    def _parse_item_block(self, num_str: str, text: str) -> Optional[Dict]:
+        """Extrai todos os campos de uma adição."""
+        try:
+            pv = self._parse_valor
+
+            item = dict(SIGRAWEB_ITEM_SCHEMA, numero_item=int(num_str), numeroAdicao=num_str.zfill(3))
+
+            # --- NCM ---
+            ncm_m = re.search(r'NR NCM:\s*(\d+)', text)
+            if ncm_m:
+                item['ncm'] = ncm_m.group(1)
+
+            # --- Part Number e Descrição ---
+            pn_m = re.search(
+                r'Part Number:\s*([\S]+)\s*\|\s*Descrição:\s*(.+?)(?=\nFabricante:|$)',
+                text, re.DOTALL
+            )
+            if pn_m:
+                item['codigo_interno'] = pn_m.group(1).strip()
+                item['descricao'] = re.sub(r'\s+', ' ', pn_m.group(2).strip())
+            else:
+                # Tenta captura alternativa apenas pela descrição
+                desc_m = re.search(r'Descrição:\s*(.+?)(?=\nFabricante:|$)', text, re.DOTALL)
+                if desc_m:
+                    item['descricao'] = re.sub(r'\s+', ' ', desc_m.group(1).strip())
+
+            # --- Peso Líquido ---
+            peso_m = re.search(r'Peso Líquido:\s*([\d\.,]+)', text)
+            if peso_m:
+                item['pesoLiq'] = pv(peso_m.group(1))
+
+            # --- Quantidade Estatística (Destaque) ---
+            qtd_est_m = re.search(r'Qnt\. Estatística:\s*([\d\.,]+)', text)
+            if qtd_est_m:
+                item['quantidade'] = pv(qtd_est_m.group(1))
+
+            # --- Quantidade Comercial (linha "Quantidade: X Unidade:") ---
+            qtd_com_m = re.search(r'Quantidade:\s*([\d\.,]+)\s+Unidade:', text)
+            if qtd_com_m:
+                item['quantidade_comercial'] = pv(qtd_com_m.group(1))
+            else:
+                item['quantidade_comercial'] = item['quantidade']
+
+            # --- Unidade ---
+            un_m = re.search(r'Unidade:\s*(\S+)', text)
+            if un_m:
+                item['unidade'] = un_m.group(1).upper()
+
+            # --- Valor FOB em EUR (usado como valorTotal para o XML) ---
+            fob_eur_m = re.search(r'Valor FOB:\s*([\d\.,]+)\s+EUR', text)
+            if fob_eur_m:
+                item['valorTotal'] = pv(fob_eur_m.group(1))
+
+            # --- Valor Aduaneiro USD ---
+            vad_usd_m = re.search(r'Valor Aduaneiro USD:\s*([\d\.,]+)', text)
+            if vad_usd_m:
+                item['valorAduaneiroUSD'] = pv(vad_usd_m.group(1))
+
+            # --- Valor Aduaneiro Real (BRL) — base de cálculo do II ---
+            vad_m = re.search(r'Valor Aduaneiro Real:\s*([\d\.,]+)', text)
+            if vad_m:
+                item['valorAduaneiroReal'] = pv(vad_m.group(1))
+                item['ii_base_calculo']    = item['valorAduaneiroReal']   # base II (a tabela de tributos prevalece)
+
+            # --- Valor Unitário ---
+            vunit_m = re.search(r'Valor Unitário:\s*([\d\.,]+)', text)
+            if vunit_m:
+                item['valorUnit'] = pv(vunit_m.group(1))
+
+            # --- Frete ---
+            frete_usd_m = re.search(r'Valor Frete:\s*([\d\.,]+)\s+USD', text)
+            if frete_usd_m:
+                item['freteUSD'] = pv(frete_usd_m.group(1))
+            frete_real_m = re.search(r'Valor Frete Real:\s*([\d\.,]+)', text)
+            if frete_real_m:
+                item['freteReal'] = pv(frete_real_m.group(1))
+
+            # --- Seguro ---
+            seg_usd_m = re.search(r'Valor Seguro:\s*([\d\.,]+)\s+USD', text)
+            if seg_usd_m:
+                item['seguroUSD'] = pv(seg_usd_m.group(1))
+            seg_real_m = re.search(r'Valor Seguro Real:\s*([\d\.,]+)', text)
+            if seg_real_m:
+                item['seguroReal'] = pv(seg_real_m.group(1))
+
+            # --- Moeda ---
+            moeda_m = re.search(r'Moeda LI:\s*(.+?)(?:\n|Valor)', text)
+            if moeda_m:
+                item['moeda'] = moeda_m.group(1).strip()
+
+            # --- País Origem ---
+            pais_m = re.search(r'País Origem:\s*(.+?)(?:\n|Fabricante)', text)
+            if pais_m:
+                item['paisOrigem'] = pais_m.group(1).strip()
+
+            # --- Fornecedor ---
+            forn_m = re.search(r'Fornecedor:\s*(.+?)(?:\n|País)', text)
+            if forn_m:
+                item['fornecedor_raw'] = forn_m.group(1).strip()
+
+            # ==================================================================
+            # TABELA DE TRIBUTOS
+            # Estrutura do Sigraweb:
+            #  II:     Aliq(7cols) grupo(1)=aliq, grupo(6)=base, grupo(7)=valor
+            #  IPI:    6cols       grupo(1)=aliq, grupo(5)=base, grupo(6)=valor
+            #  PIS:    6cols       grupo(1)=aliq, grupo(5)=base, grupo(6)=valor
+            #  COFINS: 6cols       grupo(1)=aliq, grupo(5)=base, grupo(6)=valor
+            # ==================================================================
+
+            # II  — 7 colunas: AliqAdVal | VlAliq | AliqRed | VlRed | %Red | Base | Valor
+            ii_m = re.search(
+                r'^II\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)',
+                text, re.MULTILINE
+            )
+            if ii_m:
+                item['ii_aliquota']     = pv(ii_m.group(1))
+                item['ii_base_calculo'] = pv(ii_m.group(6))
+                item['ii_valor_devido'] = pv(ii_m.group(7))
+
+            # IPI — 6 colunas: AliqAdVal | VlAliq | AliqRed | %Red | Base | Valor
+            ipi_m = re.search(
+                r'^IPI\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)',
+                text, re.MULTILINE
+            )
+            if ipi_m:
+                item['ipi_aliquota']     = pv(ipi_m.group(1))
+                item['ipi_base_calculo'] = pv(ipi_m.group(5))
+                item['ipi_valor_devido'] = pv(ipi_m.group(6))
+
+            # PIS — 6 colunas: AliqAdVal | VlAliq | AliqRed | %Red | Base | Valor
+            pis_m = re.search(
+                r'^PIS\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)',
+                text, re.MULTILINE
+            )
+            if pis_m:
+                item['pis_aliquota']     = pv(pis_m.group(1))
+                item['pis_base_calculo'] = pv(pis_m.group(5))
+                item['pis_valor_devido'] = pv(pis_m.group(6))
+
+            # COFINS — 6 colunas
+            cof_m = re.search(
+                r'^COFINS\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)',
+                text, re.MULTILINE
+            )
+            if cof_m:
+                item['cofins_aliquota']     = pv(cof_m.group(1))
+                item['cofins_base_calculo'] = pv(cof_m.group(5))
+                item['cofins_valor_devido'] = pv(cof_m.group(6))
+
+            # Totais calculados
+            item['total_impostos'] = (
+                item['ii_valor_devido'] + item['ipi_valor_devido'] +
+                item['pis_valor_devido'] + item['cofins_valor_devido']
+            )
+            item['valor_total_com_impostos'] = item['valorTotal'] + item['total_impostos']
+
+            return item
+
+        except Exception as e:
+            logger.error(f"Erro item {num_str}: {e}")
+            return None
+
+    def _calculate_totals(self):
+        if self.documento['itens']:
+            itens = self.documento['itens']
+
+            def soma(campo):
+                return float(itens.column(campo).sum())
+
+            self.documento['totais'] = {
+                'valor_total_fob':         soma('valorTotal'),
+                'peso_liquido_total':       soma('pesoLiq'),
+                'total_valor_aduaneiro':   soma('valorAduaneiroReal'),
+                'total_ii':                soma('ii_valor_devido'),
+                'total_ipi':               soma('ipi_valor_devido'),
+                'total_pis':               soma('pis_valor_devido'),
+                'total_cofins':            soma('cofins_valor_devido'),
+                'total_frete':             soma('freteReal'),
+                'total_seguro':            soma('seguroReal'),
+                'quantidade_adicoes':      len(itens),
+            }
@@ -0,0 +1,345 @@
+"""
+Snapshot do Sistema Integrado DUIMP em disco, para retomar o trabalho depois
+que o servidor reinicia.
+
+Cada sessão grava numa pasta própria em SNAPSHOT_DIR: os itens da DUIMP, os
+itens do Sigraweb e a grade de edição em arquivos Arrow (Feather) e um
+cabecalho.json com o cabeçalho das duas leituras e a lista dos arquivos
+válidos. Os arquivos de dados nunca são reescritos (cada gravação usa um nome
+novo) e o cabecalho.json é trocado por último, com os.replace: uma queda do
+processo no meio da gravação deixa o snapshot anterior inteiro.
+
+A grade é gravada de forma incremental: uma base completa e, a cada edição,
+um arquivo só com as linhas alteradas. Retomar lê esses arquivos e monta de
+novo o parser da DUIMP, o documento do Sigraweb e a grade, sem ler os PDFs.
+
+Cada snapshot tem um dono (token da sessão que o criou): só ele lista e abre
+os seus. Retomar não grava na pasta original: copia() liga os arquivos numa
+pasta nova, para que duas sessões que retomam o mesmo snapshot (aba
+duplicada) não apaguem os arquivos uma da outra. Antes de confirmar, o
+cabecalho.json em disco é relido; se outra sessão gravou na pasta depois da
+última leitura desta, a gravação para com SnapshotConflict.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from .duimp import DUIMP_ITEM_SCHEMA, DuimpPDFParser
+from .items import ItemTable
+from .lazy import LazyModule
+from .sigraweb import SIGRAWEB_ITEM_SCHEMA, SigrawebDocument
+
+logger = logging.getLogger(__name__)
+
+np      = LazyModule("numpy", "np", globals())
+pd      = LazyModule("pandas", "pd", globals())
+pa      = LazyModule("pyarrow", "pa", globals())
+feather = LazyModule("pyarrow.feather", "feather", globals())
+
+
+SNAPSHOT_DIR             = os.path.join(os.path.expanduser("~"), ".duimp", "sessoes")
+SNAPSHOT_TTL             = 7 * 24 * 3600   # segundos sem gravação até o snapshot ser apagado
+SNAPSHOT_MAX_EDICOES     = 50              # arquivos de edição antes de regravar a base da grade
+SNAPSHOT_EDICAO_MAX_FRAC = 0.25            # acima dessa fração de linhas alteradas, regrava a base
+
+SNAPSHOT_VERSAO  = 1
+_CABECALHO       = "cabecalho.json"
+_COLUNA_LINHA    = "__linha__"
+_ID_RE           = re.compile(r"^[\w\-]+$")
+
+_confirmacao_lock = threading.Lock()   # confirmações e cópias das pastas deste servidor
+
+
+class SnapshotConflict(RuntimeError):
+    """Outra sessão gravou na pasta do snapshot depois da última leitura ou gravação desta."""
+
+
+def _valor_json(value):
+    # Números numpy que sobram nos cabeçalhos e totais
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} não serializável")
+
+
+def _tabela_da_grade(df: pd.DataFrame) -> pa.Table:
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Coluna de texto com algum valor de outro tipo (edição na grade): grava como texto
+        df = df.copy()
+        for col in df.columns:
+            if df[col].dtype == object:
+                df[col] = df[col].map(lambda v: v if v is None or isinstance(v, str) else str(v))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _linhas_diferentes(df: pd.DataFrame, anterior: pd.DataFrame) -> np.ndarray:
+    """Posições em que alguma coluna difere (NaN igual a NaN)."""
+    mask = np.zeros(len(df), dtype=bool)
+    for col in df.columns:
+        novo, antigo = df[col], anterior[col]
+        a, b = novo.to_numpy(), antigo.to_numpy()
+        if a.dtype.kind == "f" and b.dtype.kind == "f":
+            mask |= (a != b) & ~(np.isnan(a) & np.isnan(b))
+        else:
+            mask |= (novo.ne(antigo) & ~(novo.isna() & antigo.isna())).to_numpy(dtype=bool)
+    return np.flatnonzero(mask)
+
+
+class SessionSnapshot:
+    """
+    Pasta de snapshot de uma sessão. salvar_duimp(), salvar_sigraweb() e
+    salvar_grade() gravam a parte que mudou e atualizam o cabecalho.json;
+    carregar() devolve as leituras prontas para a sessão.
+
+    salvar_grade() compara a grade com a última gravada e grava só as linhas
+    alteradas; a grade não deve ser alterada no lugar depois de gravada (a
+    grade de edição é sempre um DataFrame novo a cada execução do script).
+    """
+
+    def __init__(self, pasta: str, dono: Optional[str] = None):
+        self.pasta = pasta
+        self.id    = os.path.basename(pasta)
+        self._grade: Optional[pd.DataFrame] = None   # última grade gravada
+        cabecalho = self._ler_cabecalho()
+        if cabecalho is None:
+            cabecalho = {"versao": SNAPSHOT_VERSAO, "criado_em": time.time(), "dono": dono,
+                         "duimp": None, "sigraweb": None, "grade": None}
+        self._cabecalho = cabecalho
+
+    @classmethod
+    def novo(cls, dono: str, raiz: str = SNAPSHOT_DIR) -> "SessionSnapshot":
+        return cls(os.path.join(raiz, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"), dono)
+
+    @classmethod
+    def abrir(cls, snapshot_id: str, dono: str, raiz: str = SNAPSHOT_DIR) -> "SessionSnapshot":
+        """
+        Snapshot existente de `dono`; ValueError se o id não é válido, não
+        existe ou é de outro dono (o id vem da URL).
+        """
+        pasta = os.path.join(raiz, snapshot_id)
+        if not _ID_RE.match(snapshot_id) or not os.path.exists(os.path.join(pasta, _CABECALHO)):
+            raise ValueError(f"Snapshot {snapshot_id!r} não encontrado")
+        snap = cls(pasta)
+        if snap.cabecalho.get("dono") != dono:
+            raise ValueError(f"Snapshot {snapshot_id!r} não encontrado")
+        return snap
+
+    def copia(self, raiz: str = SNAPSHOT_DIR) -> "SessionSnapshot":
+        """
+        Snapshot novo, do mesmo dono, com o conteúdo confirmado deste. Os
+        arquivos de dados nunca são reescritos, então são ligados (hard link)
+        em vez de copiados quando o sistema de arquivos deixa.
+        """
+        destino = SessionSnapshot.novo(self._cabecalho.get("dono"), raiz)
+        os.makedirs(destino.pasta)
+        with _confirmacao_lock:
+            cabecalho = self._ler_cabecalho()
+            if cabecalho is None:
+                raise ValueError(f"Snapshot {self.id!r} não encontrado")
+            for nome in self._arquivos(cabecalho):
+                origem = os.path.join(self.pasta, nome)
+                try:
+                    os.link(origem, os.path.join(destino.pasta, nome))
+                except OSError:
+                    shutil.copy2(origem, os.path.join(destino.pasta, nome))
+        cabecalho["origem"] = self.id
+        destino._confirmar(cabecalho)
+        return destino
+
+    @property
+    def cabecalho(self) -> Dict:
+        return self._cabecalho
+
+    def _ler_cabecalho(self) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.pasta, _CABECALHO), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    # --------------------------------------------------------------------------
+    # Gravação
+    # --------------------------------------------------------------------------
+    def _gravar_tabela(self, parte: str, tabela: pa.Table) -> str:
+        nome = f"{parte}-{uuid.uuid4().hex[:12]}.arrow"
+        tmp  = os.path.join(self.pasta, nome + ".tmp")
+        feather.write_feather(tabela, tmp, compression="uncompressed")
+        os.replace(tmp, os.path.join(self.pasta, nome))
+        return nome
+
+    @staticmethod
+    def _arquivos(cabecalho) -> set:
+        nomes = set()
+        for parte in ("duimp", "sigraweb"):
+            if cabecalho.get(parte):
+                nomes.add(cabecalho[parte]["arquivo"])
+        if cabecalho.get("grade"):
+            nomes.update(cabecalho["grade"]["arquivos"])
+        return nomes
+
+    def _confirmar(self, cabecalho: Dict):
+        """
+        Troca o cabecalho.json (ponto de confirmação) e apaga os arquivos que
+        ele deixou de citar. SnapshotConflict se o cabecalho.json em disco não
+        é mais o que esta sessão leu ou gravou por último.
+        """
+        with _confirmacao_lock:
+            no_disco = self._ler_cabecalho()
+            if no_disco is not None and no_disco.get("salvo_em") != self._cabecalho.get("salvo_em"):
+                raise SnapshotConflict(f"Snapshot {self.id} alterado por outra sessão")
+            cabecalho["salvo_em"] = time.time()
+            tmp = os.path.join(self.pasta, _CABECALHO + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cabecalho, f, ensure_ascii=False, default=_valor_json)
+            os.replace(tmp, os.path.join(self.pasta, _CABECALHO))
+            for nome in self._arquivos(self._cabecalho) - self._arquivos(cabecalho):
+                try:
+                    os.remove(os.path.join(self.pasta, nome))
+                except OSError:
+                    pass
+        self._cabecalho = cabecalho
+
+    def salvar_duimp(self, nome: str, p: Optional[DuimpPDFParser]):
+        os.makedirs(self.pasta, exist_ok=True)
+        cabecalho = dict(self._cabecalho)
+        cabecalho["duimp"] = None if p is None else {
+            "nome":       nome,
+            "header":     p.header,
+            "stats":      p.stats,
+            "slow_items": p.slow_items,
+            "arquivo":    self._gravar_tabela("duimp", p.items.to_arrow()),
+        }
+        self._confirmar(cabecalho)
+
+    def salvar_sigraweb(self, doc: Optional[SigrawebDocument]):
+        os.makedirs(self.pasta, exist_ok=True)
+        cabecalho = dict(self._cabecalho)
+        cabecalho["sigraweb"] = None if doc is None else {
+            "cabecalho": doc["cabecalho"],
+            "totais":    doc.get("totais", {}),
+            "arquivo":   self._gravar_tabela("sigraweb", doc["itens"].to_arrow()),
+        }
+        self._confirmar(cabecalho)
+
+    def salvar_grade(self, df: Optional[pd.DataFrame], completa=False) -> int:
+        """
+        Grava a grade: só as linhas que mudaram desde a última gravação ou,
+        com `completa`, grade nova ou muitas alterações, uma base nova.
+        Devolve o número de linhas gravadas (0 se nada mudou).
+        """
+        anterior = self._grade
+        if df is anterior:
+            return 0
+        os.makedirs(self.pasta, exist_ok=True)
+        cabecalho = dict(self._cabecalho)
+        grade     = cabecalho.get("grade")
+
+        if df is None:
+            cabecalho["grade"] = None
+            gravadas = 0
+        else:
+            pos = None
+            if (not completa and anterior is not None and grade is not None
+                    and len(grade["arquivos"]) <= SNAPSHOT_MAX_EDICOES
+                    and df.columns.equals(anterior.columns) and df.index.equals(anterior.index)):
+                pos = _linhas_diferentes(df, anterior)
+                if not len(pos):
+                    self._grade = df
+                    return 0
+                if len(pos) > SNAPSHOT_EDICAO_MAX_FRAC * len(df):
+                    pos = None
+            if pos is None:
+                arquivos = [self._gravar_tabela("grade", _tabela_da_grade(df.reset_index(drop=True)))]
+                gravadas = len(df)
+            else:
+                linhas = df.iloc[pos].reset_index(drop=True)
+                linhas.insert(0, _COLUNA_LINHA, pos.astype(np.int64))
+                arquivos = grade["arquivos"] + [self._gravar_tabela("grade", _tabela_da_grade(linhas))]
+                gravadas = len(pos)
+            cabecalho["grade"] = {"arquivos": arquivos, "linhas": len(df)}
+
+        self._confirmar(cabecalho)
+        self._grade = df
+        return gravadas
+
+    def descartar(self):
+        self._grade = None
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+    # --------------------------------------------------------------------------
+    # Leitura
+    # --------------------------------------------------------------------------
+    def _ler(self, nome: str) -> pa.Table:
+        return feather.read_table(os.path.join(self.pasta, nome), memory_map=True)
+
+    def _ler_grade(self, arquivos: List[str]) -> pd.DataFrame:
+        df = self._ler(arquivos[0]).to_pandas()
+        for nome in arquivos[1:]:
+            linhas = self._ler(nome).to_pandas()
+            pos    = linhas.pop(_COLUNA_LINHA).to_numpy()
+            for col in linhas.columns:
+                df.iloc[pos, df.columns.get_loc(col)] = linhas[col].to_numpy()
+        return df
+
+    def carregar(self) -> Dict:
+        """
+        Leituras salvas, com as chaves do estado da sessão: parsed_duimp,
+        nome_duimp, parsed_sigraweb e merged_df (None nas partes não salvas).
+        """
+        inicio = time.perf_counter()
+        cab    = self._cabecalho
+        estado = {"parsed_duimp": None, "nome_duimp": "", "parsed_sigraweb": None, "merged_df": None}
+        if cab.get("duimp"):
+            d = cab["duimp"]
+            itens = ItemTable.from_arrow(self._ler(d["arquivo"]), DUIMP_ITEM_SCHEMA)
+            estado["parsed_duimp"] = DuimpPDFParser.restaurar(d["header"], itens, d["stats"], d["slow_items"])
+            estado["nome_duimp"]   = d["nome"]
+        if cab.get("sigraweb"):
+            s = cab["sigraweb"]
+            estado["parsed_sigraweb"] = SigrawebDocument({
+                "cabecalho": s["cabecalho"],
+                "itens":     ItemTable.from_arrow(self._ler(s["arquivo"]), SIGRAWEB_ITEM_SCHEMA),
+                "totais":    s["totais"],
+            })
+        if cab.get("grade"):
+            estado["merged_df"] = self._ler_grade(cab["grade"]["arquivos"])
+        self._grade = estado["merged_df"]
+        logger.info(f"Snapshot {self.id} carregado em {time.perf_counter() - inicio:.2f}s")
+        return estado
+
+
+def listar_snapshots(dono: str, raiz: str = SNAPSHOT_DIR) -> List[Dict]:
+    """
+    Cabeçalhos dos snapshots de `dono` em `raiz` (com a chave "id"), do mais
+    recente para o mais antigo, sem os que já foram retomados numa cópia.
+    Snapshots sem gravação há SNAPSHOT_TTL são apagados (de qualquer dono).
+    """
+    if not os.path.isdir(raiz):
+        return []
+    limite = time.time() - SNAPSHOT_TTL
+    snapshots = []
+    for nome in os.listdir(raiz):
+        pasta = os.path.join(raiz, nome)
+        try:
+            if os.path.getmtime(pasta) < limite:
+                shutil.rmtree(pasta, ignore_errors=True)
+                continue
+            with open(os.path.join(pasta, _CABECALHO), encoding="utf-8") as f:
+                cabecalho = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if cabecalho.get("dono") == dono:
+            snapshots.append({**cabecalho, "id": nome})
+    retomados = {c.get("origem") for c in snapshots}
+    snapshots = [c for c in snapshots if c["id"] not in retomados]
+    snapshots.sort(key=lambda c: c.get("salvo_em", 0), reverse=True)
+    return snapshots
@@ -0,0 +1,50 @@
+"""Filtro de arquivos TXT: remove linhas indesejadas e abrevia termos longos."""
+from typing import Iterable, Tuple
+
+from .lazy import LazyModule
+
+chardet = LazyModule("chardet", "chardet", globals())
+
+PADROES_PADRAO = ["-------", "SPED EFD-ICMS/IPI"]
+
+SUBSTITUICOES = {
+    "IMPOSTO IMPORTACAO": "IMP IMPORT",
+    "TAXA SICOMEX": "TX SISCOMEX",
+    "FRETE INTERNACIONAL": "FRET INTER",
+    "SEGURO INTERNACIONAL": "SEG INTERN"
+}
+
+TXT_PROGRESS_LINES = 10_000   # linhas entre duas chamadas ao reporter
+
+
+def detectar_encoding(conteudo):
+    resultado = chardet.detect(conteudo)
+    return resultado['encoding']
+
+
+def filtrar_txt(conteudo: bytes, padroes: Iterable[str] = PADROES_PADRAO, progress=None) -> Tuple[str, int]:
+    """
+    Decodifica o arquivo (encoding detectado; latin-1 se falhar), descarta as
+    linhas que contêm algum dos `padroes` e aplica SUBSTITUICOES nas demais.
+    Devolve (texto resultante, total de linhas do original).
+    `progress(linhas, total)` é opcional.
+    """
+    padroes = list(padroes)
+    encoding = detectar_encoding(conteudo)
+    try:
+        texto = conteudo.decode(encoding)
+    except UnicodeDecodeError:
+        texto = conteudo.decode('latin-1')
+    linhas = texto.splitlines()
+    linhas_processadas = []
+    for i, linha in enumerate(linhas, start=1):
+        linha = linha.strip()
+        if not any(padrao in linha for padrao in padroes):
+            for original, substituto in SUBSTITUICOES.items():
+                linha = linha.replace(original, substituto)
+            linhas_processadas.append(linha)
+        if progress and i % TXT_PROGRESS_LINES == 0:
+            progress(i, len(linhas))
+    if progress:
+        progress(len(linhas), len(linhas))
+    return "\n".join(linhas_processadas), len(linhas)
@@ -0,0 +1,41 @@
+"""Uploads grandes: cópia para disco em blocos."""
+import contextlib
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+@contextlib.contextmanager
+def spooled_upload(uploaded_file, suffix=".pdf"):
+    """
+    Grava o upload em um arquivo temporário, em blocos, e devolve o caminho.
+    Os parsers abrem o PDF pelo caminho, sem manter mais uma cópia em memória.
+    O arquivo é removido ao sair do bloco, mesmo em caso de erro.
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            uploaded_file.seek(0)
+            shutil.copyfileobj(uploaded_file, tmp, UPLOAD_CHUNK_SIZE)
+        yield path
+    finally:
+        try:
+            os.unlink(path)
+        except OSError as e:
+            logger.warning(f"Não foi possível remover o temporário {path}: {e}")
+
+
+def upload_digest(uploaded_file) -> str:
+    """SHA-256 do conteúdo do upload, lido em blocos; a posição volta ao início."""
+    digest = hashlib.sha256()
+    uploaded_file.seek(0)
+    for chunk in iter(lambda: uploaded_file.read(UPLOAD_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
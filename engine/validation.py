@@ -0,0 +1,174 @@
+"""Validação do XML gerado: campos numéricos de largura fixa e estrutura."""
+from __future__ import annotations
+
+import functools
+from io import BytesIO
+from typing import Any, Dict, List
+
+from .lazy import LazyModule
+from .xml_builder import ADICAO_FIELDS_ORDER, FOOTER_TAGS
+
+etree = LazyModule("lxml.etree", "etree", globals())
+
+
+# Filhos de <pagamento> não têm default em FOOTER_TAGS: larguras explícitas
+PAGAMENTO_FIELD_WIDTHS = {
+    "agenciaPagamento": 4,
+    "bancoPagamento": 3,
+    "codigoReceita": 4,
+    "valorReceita": 15,
+}
+
+
+def _fixed_width(default):
+    return len(default) if default and default.isascii() and default.isdigit() else None
+
+
+@functools.lru_cache(maxsize=None)
+def xml_validation_rules() -> Dict[str, Any]:
+    """
+    Regras do layout, derivadas uma vez por processo de ADICAO_FIELDS_ORDER e
+    FOOTER_TAGS: todo default só com dígitos define um campo numérico de
+    largura fixa, indexado por (tag do pai, tag). Textos livres não têm regra.
+    Guarda também a sequência de filhos de <adicao> e, para ela, a posição de
+    cada campo com regra (conferência por índice, sem percorrer a árvore).
+    """
+    widths    = {}
+    positions = []
+
+    def _add(parent, tag, default, position=None):
+        width = _fixed_width(default)
+        if width:
+            widths[(parent, tag)] = width
+            if position is not None:
+                positions.append(position + (f"{parent}/{tag}", width))
+
+    for i, field in enumerate(ADICAO_FIELDS_ORDER):
+        if field.get("type") == "complex":
+            for j, child in enumerate(field["children"]):
+                _add(field["tag"], child["tag"], child["default"], (i, j))
+        else:
+            _add("adicao", field["tag"], field["default"], (i, None))
+
+    for tag, default in FOOTER_TAGS.items():
+        if isinstance(default, list):
+            for subfield in default:
+                _add(tag, subfield["tag"], subfield["default"])
+        elif isinstance(default, dict):
+            _add(tag, default["tag"], default["default"])
+        else:
+            _add("duimp", tag, default)
+
+    for tag, width in PAGAMENTO_FIELD_WIDTHS.items():
+        widths[("pagamento", tag)] = width
+
+    return {
+        "widths": widths,
+        "adicao_tags": tuple(field["tag"] for field in ADICAO_FIELDS_ORDER),
+        "adicao_positions": tuple(positions),
+        "footer_tags": frozenset(FOOTER_TAGS) - {"pagamento"},
+    }
+
+
+class XmlLayoutValidator:
+    """
+    Confere os filhos de <duimp> um a um: cada <adicao> e cada tag do rodapé.
+    Usado pelo XMLBuilder.build_stream (confere o elemento antes de gravá-lo,
+    sem reler o arquivo) e por validar_xml_duimp (arquivo já gerado).
+    """
+
+    def __init__(self):
+        self.rules      = xml_validation_rules()
+        self.violations = []
+        self.adicoes    = 0
+        self._footer    = set()
+
+    def _violation(self, adicao, path, text, expected):
+        self.violations.append({"adicao": adicao, "tag": path, "valor": text, "esperado": expected})
+
+    def _check_text(self, adicao, path, width, text):
+        text = text or ""
+        if len(text) != width or not (text.isascii() and text.isdigit()):
+            self._violation(adicao, path, text, f"{width} dígitos")
+
+    def check(self, element):
+        widths = self.rules["widths"]
+        if element.tag != "adicao":
+            self._footer.add(element.tag)
+            width = widths.get(("duimp", element.tag))
+            if width is not None:
+                self._check_text("", f"duimp/{element.tag}", width, element.text)
+            for child in element:
+                width = widths.get((element.tag, child.tag))
+                if width is not None:
+                    self._check_text("", f"{element.tag}/{child.tag}", width, child.text)
+            return
+
+        self.adicoes += 1
+        numero = element.findtext("numeroAdicao") or str(self.adicoes).zfill(3)
+        children = list(element)   # element[i] no lxml percorre os irmãos; a lista é indexada direto
+        if tuple(child.tag for child in children) == self.rules["adicao_tags"]:
+            groups = {}
+            for i, j, path, width in self.rules["adicao_positions"]:
+                if j is None:
+                    text = children[i].text
+                else:
+                    if i not in groups:
+                        groups[i] = list(children[i])
+                    text = groups[i][j].text
+                if text is None or len(text) != width or not (text.isascii() and text.isdigit()):
+                    self._violation(numero, path, text or "", f"{width} dígitos")
+            return
+
+        # Estrutura fora do layout: aponta e confere o que houver, tag a tag
+        self._violation(numero, "adicao", f"{len(element)} campos",
+                        f"{len(self.rules['adicao_tags'])} campos na ordem de ADICAO_FIELDS_ORDER")
+        for child in element.iter():
+            parent = child.getparent()
+            width = widths.get((parent.tag, child.tag)) if parent is not None else None
+            if width is not None:
+                self._check_text(numero, f"{parent.tag}/{child.tag}", width, child.text)
+
+    def replay(self, violations):
+        """Registra uma adição já conferida antes (fragmento reaproveitado do cache)."""
+        self.adicoes += 1
+        self.violations.extend(violations)
+
+    def finish(self) -> List[Dict[str, str]]:
+        for tag in sorted(self.rules["footer_tags"] - self._footer):
+            self._violation("", f"duimp/{tag}", "", "tag presente")
+        return self.violations
+
+
+def campos_nao_lidos(slow_items) -> List[Dict[str, str]]:
+    """
+    Campos que a leitura da DUIMP deixou vazios por estourar o tempo do item
+    (DuimpPDFParser.slow_items), no formato das violações: vão vazios para o
+    XML, então entram no mesmo relatório.
+    """
+    return [
+        {"adicao": item[0], "tag": f"item/{campo}", "valor": "", "esperado": "lido do PDF (tempo de leitura excedido)"}
+        for item in slow_items
+        for campo in (item[2] if len(item) > 2 else ())
+    ]
+
+
+def validar_xml_duimp(source) -> List[Dict[str, str]]:
+    """
+    Confere um XML já gerado em uma única passada (iterparse só dos filhos de
+    <duimp>, memória constante). `source` é caminho, arquivo aberto ou bytes.
+    Devolve uma linha por violação: adição ("" no rodapé), tag, valor e esperado.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    validator = XmlLayoutValidator()
+    tags = ("adicao", "pagamento") + tuple(validator.rules["footer_tags"])
+    for _, el in etree.iterparse(source, events=("end",), tag=tags):
+        parent = el.getparent()
+        if parent is None or parent.tag != "duimp":
+            continue   # numeroDUIMP, sequencialRetificacao etc. também existem dentro da adição
+        validator.check(el)
+        el.clear()
+        while el.getprevious() is not None:
+            del parent[0]
+    return validator.finish()
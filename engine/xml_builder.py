@@ -0,0 +1,786 @@
+"""XML da DUIMP no layout 8686: constantes, formatação e montagem."""
+from __future__ import annotations
+
+import copy
+import functools
+import re
+import tempfile
+from typing import Dict, List, Tuple
+
+from .duimp import montar_descricao_final
+from .lazy import LazyModule
+from .numeric import exact_float_sum, is_missing_number, parse_br_number
+
+np    = LazyModule("numpy", "np", globals())
+pd    = LazyModule("pandas", "pd", globals())
+etree = LazyModule("lxml.etree", "etree", globals())
+
+
+ADICAO_FIELDS_ORDER = [
+    {"tag": "acrescimo", "type": "complex", "children": [
+        {"tag": "codigoAcrescimo", "default": "17"},
+        {"tag": "denominacao", "default": "OUTROS ACRESCIMOS AO VALOR ADUANEIRO"},
+        {"tag": "moedaNegociadaCodigo", "default": "978"},
+        {"tag": "moedaNegociadaNome", "default": "EURO/COM.EUROPEIA"},
+        {"tag": "valorMoedaNegociada", "default": "000000000000000"},
+        {"tag": "valorReais", "default": "000000000000000"}
+    ]},
+    {"tag": "cideValorAliquotaEspecifica", "default": "00000000000"},
+    {"tag": "cideValorDevido", "default": "000000000000000"},
+    {"tag": "cideValorRecolher", "default": "000000000000000"},
+    {"tag": "codigoRelacaoCompradorVendedor", "default": "3"},
+    {"tag": "codigoVinculoCompradorVendedor", "default": "1"},
+    {"tag": "cofinsAliquotaAdValorem", "default": "00965"},
+    {"tag": "cofinsAliquotaEspecificaQuantidadeUnidade", "default": "000000000"},
+    {"tag": "cofinsAliquotaEspecificaValor", "default": "0000000000"},
+    {"tag": "cofinsAliquotaReduzida", "default": "00000"},
+    {"tag": "cofinsAliquotaValorDevido", "default": "000000000000000"},
+    {"tag": "cofinsAliquotaValorRecolher", "default": "000000000000000"},
+    {"tag": "condicaoVendaIncoterm", "default": "FCA"},
+    {"tag": "condicaoVendaLocal", "default": ""},
+    {"tag": "condicaoVendaMetodoValoracaoCodigo", "default": "01"},
+    {"tag": "condicaoVendaMetodoValoracaoNome", "default": "METODO 1 - ART. 1 DO ACORDO (DECRETO 92930/86)"},
+    {"tag": "condicaoVendaMoedaCodigo", "default": "978"},
+    {"tag": "condicaoVendaMoedaNome", "default": "EURO/COM.EUROPEIA"},
+    {"tag": "condicaoVendaValorMoeda", "default": "000000000000000"},
+    {"tag": "condicaoVendaValorReais", "default": "000000000000000"},
+    {"tag": "dadosCambiaisCoberturaCambialCodigo", "default": "1"},
+    {"tag": "dadosCambiaisCoberturaCambialNome", "default": "COM COBERTURA CAMBIAL E PAGAMENTO FINAL A PRAZO DE ATE' 180"},
+    {"tag": "dadosCambiaisInstituicaoFinanciadoraCodigo", "default": "00"},
+    {"tag": "dadosCambiaisInstituicaoFinanciadoraNome", "default": "N/I"},
+    {"tag": "dadosCambiaisMotivoSemCoberturaCodigo", "default": "00"},
+    {"tag": "dadosCambiaisMotivoSemCoberturaNome", "default": "N/I"},
+    {"tag": "dadosCambiaisValorRealCambio", "default": "000000000000000"},
+    {"tag": "dadosCargaPaisProcedenciaCodigo", "default": "000"},
+    {"tag": "dadosCargaUrfEntradaCodigo", "default": "0000000"},
+    {"tag": "dadosCargaViaTransporteCodigo", "default": "01"},
+    {"tag": "dadosCargaViaTransporteNome", "default": "MARÍTIMA"},
+    {"tag": "dadosMercadoriaAplicacao", "default": "REVENDA"},
+    {"tag": "dadosMercadoriaCodigoNaladiNCCA", "default": "0000000"},
+    {"tag": "dadosMercadoriaCodigoNaladiSH", "default": "00000000"},
+    {"tag": "dadosMercadoriaCodigoNcm", "default": "00000000"},
+    {"tag": "dadosMercadoriaCondicao", "default": "NOVA"},
+    {"tag": "dadosMercadoriaDescricaoTipoCertificado", "default": "Sem Certificado"},
+    {"tag": "dadosMercadoriaIndicadorTipoCertificado", "default": "1"},
+    {"tag": "dadosMercadoriaMedidaEstatisticaQuantidade", "default": "00000000000000"},
+    {"tag": "dadosMercadoriaMedidaEstatisticaUnidade", "default": "UNIDADE"},
+    {"tag": "dadosMercadoriaNomeNcm", "default": "DESCRIÇÃO PADRÃO NCM"},
+    {"tag": "dadosMercadoriaPesoLiquido", "default": "000000000000000"},
+    {"tag": "dcrCoeficienteReducao", "default": "00000"},
+    {"tag": "dcrIdentificacao", "default": "00000000"},
+    {"tag": "dcrValorDevido", "default": "000000000000000"},
+    {"tag": "dcrValorDolar", "default": "000000000000000"},
+    {"tag": "dcrValorReal", "default": "000000000000000"},
+    {"tag": "dcrValorRecolher", "default": "000000000000000"},
+    {"tag": "fornecedorCidade", "default": ""},
+    {"tag": "fornecedorLogradouro", "default": ""},
+    {"tag": "fornecedorNome", "default": ""},
+    {"tag": "fornecedorNumero", "default": ""},
+    {"tag": "freteMoedaNegociadaCodigo", "default": "978"},
+    {"tag": "freteMoedaNegociadaNome", "default": "EURO/COM.EUROPEIA"},
+    {"tag": "freteValorMoedaNegociada", "default": "000000000000000"},
+    {"tag": "freteValorReais", "default": "000000000000000"},
+    {"tag": "iiAcordoTarifarioTipoCodigo", "default": "0"},
+    {"tag": "iiAliquotaAcordo", "default": "00000"},
+    {"tag": "iiAliquotaAdValorem", "default": "00000"},
+    {"tag": "iiAliquotaPercentualReducao", "default": "00000"},
+    {"tag": "iiAliquotaReduzida", "default": "00000"},
+    {"tag": "iiAliquotaValorCalculado", "default": "000000000000000"},
+    {"tag": "iiAliquotaValorDevido", "default": "000000000000000"},
+    {"tag": "iiAliquotaValorRecolher", "default": "000000000000000"},
+    {"tag": "iiAliquotaValorReduzido", "default": "000000000000000"},
+    {"tag": "iiBaseCalculo", "default": "000000000000000"},
+    {"tag": "iiFundamentoLegalCodigo", "default": "00"},
+    {"tag": "iiMotivoAdmissaoTemporariaCodigo", "default": "00"},
+    {"tag": "iiRegimeTributacaoCodigo", "default": "1"},
+    {"tag": "iiRegimeTributacaoNome", "default": "RECOLHIMENTO INTEGRAL"},
+    {"tag": "ipiAliquotaAdValorem", "default": "00000"},
+    {"tag": "ipiAliquotaEspecificaCapacidadeRecipciente", "default": "00000"},
+    {"tag": "ipiAliquotaEspecificaQuantidadeUnidadeMedida", "default": "000000000"},
+    {"tag": "ipiAliquotaEspecificaTipoRecipienteCodigo", "default": "00"},
+    {"tag": "ipiAliquotaEspecificaValorUnidadeMedida", "default": "0000000000"},
+    {"tag": "ipiAliquotaNotaComplementarTIPI", "default": "00"},
+    {"tag": "ipiAliquotaReduzida", "default": "00000"},
+    {"tag": "ipiAliquotaValorDevido", "default": "000000000000000"},
+    {"tag": "ipiAliquotaValorRecolher", "default": "000000000000000"},
+    {"tag": "ipiRegimeTributacaoCodigo", "default": "4"},
+    {"tag": "ipiRegimeTributacaoNome", "default": "SEM BENEFICIO"},
+    {"tag": "mercadoria", "type": "complex", "children": [
+        {"tag": "descricaoMercadoria", "default": ""},
+        {"tag": "numeroSequencialItem", "default": "01"},
+        {"tag": "quantidade", "default": "00000000000000"},
+        {"tag": "unidadeMedida", "default": "UNIDADE"},
+        {"tag": "valorUnitario", "default": "00000000000000000000"}
+    ]},
+    {"tag": "numeroAdicao", "default": "001"},
+    {"tag": "numeroDUIMP", "default": ""},
+    {"tag": "numeroLI", "default": "0000000000"},
+    {"tag": "paisAquisicaoMercadoriaCodigo", "default": "000"},
+    {"tag": "paisAquisicaoMercadoriaNome", "default": ""},
+    {"tag": "paisOrigemMercadoriaCodigo", "default": "000"},
+    {"tag": "paisOrigemMercadoriaNome", "default": ""},
+    {"tag": "pisCofinsBaseCalculoAliquotaICMS", "default": "00000"},
+    {"tag": "pisCofinsBaseCalculoFundamentoLegalCodigo", "default": "00"},
+    {"tag": "pisCofinsBaseCalculoPercentualReducao", "default": "00000"},
+    {"tag": "pisCofinsBaseCalculoValor", "default": "000000000000000"},
+    {"tag": "pisCofinsFundamentoLegalReducaoCodigo", "default": "00"},
+    {"tag": "pisCofinsRegimeTributacaoCodigo", "default": "1"},
+    {"tag": "pisCofinsRegimeTributacaoNome", "default": "RECOLHIMENTO INTEGRAL"},
+    {"tag": "pisPasepAliquotaAdValorem", "default": "00000"},
+    {"tag": "pisPasepAliquotaEspecificaQuantidadeUnidade", "default": "000000000"},
+    {"tag": "pisPasepAliquotaEspecificaValor", "default": "0000000000"},
+    {"tag": "pisPasepAliquotaReduzida", "default": "00000"},
+    {"tag": "pisPasepAliquotaValorDevido", "default": "000000000000000"},
+    {"tag": "pisPasepAliquotaValorRecolher", "default": "000000000000000"},
+    {"tag": "icmsBaseCalculoValor", "default": "000000000000000"},
+    {"tag": "icmsBaseCalculoAliquota", "default": "00000"},
+    {"tag": "icmsBaseCalculoValorImposto", "default": "00000000000000"},
+    {"tag": "icmsBaseCalculoValorDiferido", "default": "00000000000000"},
+    {"tag": "cbsIbsCst", "default": "000"},
+    {"tag": "cbsIbsClasstrib", "default": "000001"},
+    {"tag": "cbsBaseCalculoValor", "default": "000000000000000"},
+    {"tag": "cbsBaseCalculoAliquota", "default": "00000"},
+    {"tag": "cbsBaseCalculoAliquotaReducao", "default": "00000"},
+    {"tag": "cbsBaseCalculoValorImposto", "default": "00000000000000"},
+    {"tag": "ibsBaseCalculoValor", "default": "000000000000000"},
+    {"tag": "ibsBaseCalculoAliquota", "default": "00000"},
+    {"tag": "ibsBaseCalculoAliquotaReducao", "default": "00000"},
+    {"tag": "ibsBaseCalculoValorImposto", "default": "00000000000000"},
+    {"tag": "relacaoCompradorVendedor", "default": "Fabricante é desconhecido"},
+    {"tag": "seguroMoedaNegociadaCodigo", "default": "220"},
+    {"tag": "seguroMoedaNegociadaNome", "default": "DOLAR DOS EUA"},
+    {"tag": "seguroValorMoedaNegociada", "default": "000000000000000"},
+    {"tag": "seguroValorReais", "default": "000000000000000"},
+    {"tag": "sequencialRetificacao", "default": "00"},
+    {"tag": "valorMultaARecolher", "default": "000000000000000"},
+    {"tag": "valorMultaARecolherAjustado", "default": "000000000000000"},
+    {"tag": "valorReaisFreteInternacional", "default": "000000000000000"},
+    {"tag": "valorReaisSeguroInternacional", "default": "000000000000000"},
+    {"tag": "valorTotalCondicaoVenda", "default": "000000000000000"},
+    {"tag": "vinculoCompradorVendedor", "default": "Não há vinculação entre comprador e vendedor."}
+]
+
+FOOTER_TAGS = {
+    "armazem": {"tag": "nomeArmazem", "default": "TCP"},
+    "armazenamentoRecintoAduaneiroCodigo": "9801303",
+    "armazenamentoRecintoAduaneiroNome": "TCP - TERMINAL",
+    "armazenamentoSetor": "002",
+    "canalSelecaoParametrizada": "001",
+    "caracterizacaoOperacaoCodigoTipo": "1",
+    "caracterizacaoOperacaoDescricaoTipo": "Importação Própria",
+    "cargaDataChegada": "20251120",
+    "cargaNumeroAgente": "N/I",
+    "cargaPaisProcedenciaCodigo": "386",
+    "cargaPaisProcedenciaNome": "",
+    "cargaPesoBruto": "000000000000000",
+    "cargaPesoLiquido": "000000000000000",
+    "cargaUrfEntradaCodigo": "0917800",
+    "cargaUrfEntradaNome": "PORTO DE PARANAGUA",
+    "conhecimentoCargaEmbarqueData": "20251025",
+    "conhecimentoCargaEmbarqueLocal": "EXTERIOR",
+    "conhecimentoCargaId": "CE123456",
+    "conhecimentoCargaIdMaster": "CE123456",
+    "conhecimentoCargaTipoCodigo": "12",
+    "conhecimentoCargaTipoNome": "HBL - House Bill of Lading",
+    "conhecimentoCargaUtilizacao": "1",
+    "conhecimentoCargaUtilizacaoNome": "Total",
+    "dataDesembaraco": "20251124",
+    "dataRegistro": "20251124",
+    "documentoChegadaCargaCodigoTipo": "1",
+    "documentoChegadaCargaNome": "Manifesto da Carga",
+    "documentoChegadaCargaNumero": "1625502058594",
+    "embalagem": [
+        {"tag": "codigoTipoEmbalagem", "default": "60"},
+        {"tag": "nomeEmbalagem", "default": "PALLETS"},
+        {"tag": "quantidadeVolume", "default": "00001"}
+    ],
+    "freteCollect": "000000000000000",
+    "freteEmTerritorioNacional": "000000000000000",
+    "freteMoedaNegociadaCodigo": "978",
+    "freteMoedaNegociadaNome": "EURO/COM.EUROPEIA",
+    "fretePrepaid": "000000000000000",
+    "freteTotalDolares": "000000000000000",
+    "freteTotalMoeda": "000000000000000",
+    "freteTotalReais": "000000000000000",
+    "icms": [
+        {"tag": "agenciaIcms", "default": "00000"},
+        {"tag": "codigoTipoRecolhimentoIcms", "default": "3"},
+        {"tag": "nomeTipoRecolhimentoIcms", "default": "Exoneração do ICMS"},
+        {"tag": "numeroSequencialIcms", "default": "001"},
+        {"tag": "ufIcms", "default": "PR"},
+        {"tag": "valorTotalIcms", "default": "000000000000000"}
+    ],
+    "importadorCodigoTipo": "1",
+    "importadorCpfRepresentanteLegal": "00000000000",
+    "importadorEnderecoBairro": "CENTRO",
+    "importadorEnderecoCep": "00000000",
+    "importadorEnderecoComplemento": "",
+    "importadorEnderecoLogradouro": "RUA PRINCIPAL",
+    "importadorEnderecoMunicipio": "CIDADE",
+    "importadorEnderecoNumero": "00",
+    "importadorEnderecoUf": "PR",
+    "importadorNome": "",
+    "importadorNomeRepresentanteLegal": "REPRESENTANTE",
+    "importadorNumero": "",
+    "importadorNumeroTelefone": "0000000000",
+    "informacaoComplementar": "Informações extraídas do Sigraweb.",
+    "localDescargaTotalDolares": "000000000000000",
+    "localDescargaTotalReais": "000000000000000",
+    "localEmbarqueTotalDolares": "000000000000000",
+    "localEmbarqueTotalReais": "000000000000000",
+    "modalidadeDespachoCodigo": "1",
+    "modalidadeDespachoNome": "Normal",
+    "numeroDUIMP": "",
+    "operacaoFundap": "N",
+    "pagamento": [],
+    "seguroMoedaNegociadaCodigo": "220",
+    "seguroMoedaNegociadaNome": "DOLAR DOS EUA",
+    "seguroTotalDolares": "000000000000000",
+    "seguroTotalMoedaNegociada": "000000000000000",
+    "seguroTotalReais": "000000000000000",
+    "sequencialRetificacao": "00",
+    "situacaoEntregaCarga": "ENTREGA CONDICIONADA",
+    "tipoDeclaracaoCodigo": "01",
+    "tipoDeclaracaoNome": "CONSUMO",
+    "totalAdicoes": "000",
+    "urfDespachoCodigo": "0917800",
+    "urfDespachoNome": "PORTO DE PARANAGUA",
+    "valorTotalMultaARecolherAjustado": "000000000000000",
+    "viaTransporteCodigo": "01",
+    "viaTransporteMultimodal": "N",
+    "viaTransporteNome": "MARÍTIMA",
+    "viaTransporteNomeTransportador": "MAERSK A/S",
+    "viaTransporteNomeVeiculo": "MAERSK",
+    "viaTransportePaisTransportadorCodigo": "741",
+    "viaTransportePaisTransportadorNome": "CINGAPURA"
+}
+
+# Tags de <adicao> preenchidas item a item pelo XMLBuilder; as demais ficam
+# sempre com o default de ADICAO_FIELDS_ORDER
+ADICAO_SLOT_TAGS = (
+    "numeroAdicao", "numeroDUIMP", "dadosMercadoriaCodigoNcm",
+    "dadosMercadoriaMedidaEstatisticaQuantidade", "dadosMercadoriaMedidaEstatisticaUnidade",
+    "dadosMercadoriaPesoLiquido", "condicaoVendaMoedaNome", "valorTotalCondicaoVenda",
+    "valorUnitario", "condicaoVendaValorMoeda", "condicaoVendaValorReais",
+    "paisOrigemMercadoriaNome", "paisAquisicaoMercadoriaNome", "descricaoMercadoria",
+    "quantidade", "unidadeMedida", "dadosCargaUrfEntradaCodigo",
+    "fornecedorNome", "fornecedorLogradouro", "fornecedorNumero", "fornecedorCidade",
+    "freteValorReais", "seguroValorReais",
+    "iiBaseCalculo", "iiAliquotaAdValorem", "iiAliquotaValorCalculado",
+    "iiAliquotaValorDevido", "iiAliquotaValorRecolher",
+    "ipiAliquotaAdValorem", "ipiAliquotaValorDevido", "ipiAliquotaValorRecolher",
+    "pisCofinsBaseCalculoValor", "pisPasepAliquotaAdValorem",
+    "pisPasepAliquotaValorDevido", "pisPasepAliquotaValorRecolher",
+    "cofinsAliquotaAdValorem", "cofinsAliquotaValorDevido", "cofinsAliquotaValorRecolher",
+    "icmsBaseCalculoValor", "icmsBaseCalculoAliquota", "cbsIbsClasstrib",
+    "cbsBaseCalculoValor", "cbsBaseCalculoAliquota", "cbsBaseCalculoValorImposto",
+    "ibsBaseCalculoValor", "ibsBaseCalculoAliquota", "ibsBaseCalculoValorImposto",
+)
+
+
+def _compile_adicao_template(fields_order, slot_tags):
+    """
+    Monta uma única vez o <adicao> com todos os defaults e devolve também a
+    posição de cada slot variável: (tag, índice do filho, índice do neto ou
+    None), na ordem do documento.
+    """
+    template = etree.Element("adicao")
+    slots = []
+    for i, field in enumerate(fields_order):
+        tag_name = field["tag"]
+        if field.get("type") == "complex":
+            parent = etree.SubElement(template, tag_name)
+            for j, child in enumerate(field["children"]):
+                etree.SubElement(parent, child["tag"]).text = child["default"]
+                if child["tag"] in slot_tags:
+                    slots.append((child["tag"], i, j))
+        else:
+            etree.SubElement(template, tag_name).text = field["default"]
+            if tag_name in slot_tags:
+                slots.append((tag_name, i, None))
+    return template, slots
+
+
+@functools.lru_cache(maxsize=None)
+def adicao_template():
+    """(modelo de <adicao>, slots), montado no primeiro uso (lxml é importado sob demanda)."""
+    return _compile_adicao_template(ADICAO_FIELDS_ORDER, ADICAO_SLOT_TAGS)
+
+
+def new_adicao(values):
+    """
+    Cópia do modelo de <adicao> com o texto dos slots vindo de `values`
+    (tag → texto; tag ausente mantém o default).
+    """
+    template, slots = adicao_template()
+    adicao = copy.deepcopy(template)
+    for tag, i, j in slots:
+        if tag in values:
+            (adicao[i] if j is None else adicao[i][j]).text = values[tag]
+    return adicao
+
+
+def append_adicao(parent, values):
+    adicao = new_adicao(values)
+    parent.append(adicao)
+    return adicao
+
+
+def _text_element(tag, text):
+    element = etree.Element(tag)
+    element.text = text
+    return element
+
+
+XML_DECLARATION = b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+# Acima disso o XML em streaming deixa a memória e vai para um temporário em disco
+XML_SPOOL_MAX_MEMORY = 32 * 1024 * 1024
+
+# Totais do rodapé → coluna da grade somada
+XML_TOTAL_COLUMNS = {
+    "frete": "Frete (R$)", "seguro": "Seguro (R$)",
+    "ii": "II (R$)", "ipi": "IPI (R$)", "pis": "PIS (R$)", "cofins": "COFINS (R$)",
+}
+
+
+def serialize_duimp_child(element, validator=None) -> bytes:
+    """
+    Filho de <duimp> já com a indentação do pretty_print (nível 2), pronto
+    para ser gravado depois de "\n    ". Com `validator`, é conferido antes.
+    """
+    if validator is not None:
+        validator.check(element)
+    etree.indent(element, space="  ", level=2)
+    return etree.tostring(element, encoding="UTF-8")
+
+class DataFormatter:
+    @staticmethod
+    def clean_text(text):
+        if not text:
+            return ""
+        text = text.replace('\n', ' ').replace('\r', '')
+        return re.sub(r'\s+', ' ', text).strip()
+
+    @staticmethod
+    def format_number(value, length=15):
+        if not value:
+            return "0" * length
+        clean = re.sub(r'\D', '', str(value))
+        if not clean:
+            return "0" * length
+        return clean.zfill(length)
+
+    @staticmethod
+    def format_ncm(value):
+        if not value:
+            return "00000000"
+        return re.sub(r'\D', '', value)[:8]
+
+    @staticmethod
+    def _fixed_point(value, scale, length):
+        """
+        Valor × escala, arredondado, com zeros à esquerda. Espera float (os
+        itens já vêm convertidos dos parsers); texto "1.234,56" ainda é aceito
+        para as entradas digitadas. Ausente ou inválido → só zeros.
+        """
+        try:
+            return str(int(round(parse_br_number(value, None) * scale))).zfill(length)
+        except (TypeError, ValueError, OverflowError):
+            return "0" * length
+
+    @staticmethod
+    def format_input_fiscal(value, length=15, is_percent=False):
+        return DataFormatter._fixed_point(value, 100, length)
+
+    @staticmethod
+    def format_high_precision(value, length=15):
+        return DataFormatter._fixed_point(value, 10000000, length)
+
+    @staticmethod
+    def format_quantity(value, length=14):
+        return DataFormatter._fixed_point(value, 100000, length)
+
+    @staticmethod
+    def calculate_cbs_ibs(base_xml_string):
+        try:
+            base_int = int(base_xml_string)
+            base_float = base_int / 100.0
+            cbs_val = base_float * 0.009
+            cbs_str = str(int(round(cbs_val * 100))).zfill(14)
+            ibs_val = base_float * 0.001
+            ibs_str = str(int(round(ibs_val * 100))).zfill(14)
+            return cbs_str, ibs_str
+        except:
+            return "0".zfill(14), "0".zfill(14)
+
+    @staticmethod
+    def parse_supplier_info(raw_name, raw_addr):
+        data = {
+            "fornecedorNome": "",
+            "fornecedorLogradouro": "",
+            "fornecedorNumero": "S/N",
+            "fornecedorCidade": ""
+        }
+        if raw_name:
+            parts = raw_name.split('-', 1)
+            data["fornecedorNome"] = parts[-1].strip() if len(parts) > 1 else raw_name.strip()
+        if raw_addr:
+            clean_addr = DataFormatter.clean_text(raw_addr)
+            parts_dash = clean_addr.rsplit('-', 1)
+            if len(parts_dash) > 1:
+                data["fornecedorCidade"] = parts_dash[1].strip()
+                street_part = parts_dash[0].strip()
+            else:
+                data["fornecedorCidade"] = "EXTERIOR"
+                street_part = clean_addr
+            comma_split = street_part.rsplit(',', 1)
+            if len(comma_split) > 1:
+                data["fornecedorLogradouro"] = comma_split[0].strip()
+                num_match = re.search(r'\d+', comma_split[1])
+                if num_match:
+                    data["fornecedorNumero"] = num_match.group(0)
+            else:
+                data["fornecedorLogradouro"] = street_part
+        return data
+
+
+class BatchFormatter:
+    """
+    Versões em lote do DataFormatter: recebem a coluna inteira (Series, lista
+    ou array) e devolvem a lista de strings de largura fixa, na mesma ordem.
+    Escala e arredondamento são feitos pelo NumPy em uma passada por campo
+    (np.rint arredonda metade para par, como round()); só a montagem final
+    da string fica em Python. A saída é idêntica à das funções escalares,
+    conferida em tests/test_formatter.py.
+    """
+    # Acima disso o int64 não comporta: o elemento vai pelo caminho escalar
+    _INT_LIMIT = 2.0 ** 62
+
+    @staticmethod
+    def _as_float_array(values) -> np.ndarray:
+        if isinstance(values, pd.Series) and values.dtype.kind in "fiub":
+            return values.to_numpy(dtype=np.float64)
+        seq = list(values)
+        if not any(isinstance(v, str) for v in seq):
+            try:
+                return np.array(seq, dtype=np.float64)   # None → NaN
+            except (TypeError, ValueError):
+                pass
+        return np.array([parse_br_number(v, np.nan) for v in seq], dtype=np.float64)
+
+    @staticmethod
+    def fixed_point(values, scale, length) -> List[str]:
+        scaled = BatchFormatter._as_float_array(values) * scale
+        finite = np.isfinite(scaled)
+        safe   = finite & (np.abs(scaled) < BatchFormatter._INT_LIMIT)
+        ints   = np.rint(np.where(safe, scaled, 0.0)).astype(np.int64).tolist()
+        out    = [str(i).zfill(length) for i in ints]
+        if not safe.all():
+            for idx in np.flatnonzero(~safe):
+                out[idx] = str(int(round(float(scaled[idx])))).zfill(length) if finite[idx] else "0" * length
+        return out
+
+    @staticmethod
+    def input_fiscal(values, length=15) -> List[str]:
+        return BatchFormatter.fixed_point(values, 100, length)
+
+    @staticmethod
+    def high_precision(values, length=15) -> List[str]:
+        return BatchFormatter.fixed_point(values, 10000000, length)
+
+    @staticmethod
+    def quantity(values, length=14) -> List[str]:
+        return BatchFormatter.fixed_point(values, 100000, length)
+
+    @staticmethod
+    def ncm(values) -> List[str]:
+        col = pd.Series(list(values), dtype=object)
+        digits = col.str.replace(r"\D", "", regex=True).str[:8]
+        return digits.where(col.astype(bool), "00000000").fillna("00000000").tolist()
+
+    @staticmethod
+    def cbs_ibs(base_values) -> Tuple[List[str], List[str]]:
+        """Recebe as bases já formatadas (centavos, como em calculate_cbs_ibs)."""
+        base_values = list(base_values)
+        try:
+            bases = np.array(base_values, dtype=str).astype(np.int64)
+        except (ValueError, OverflowError):
+            pares = [DataFormatter.calculate_cbs_ibs(b) for b in base_values]
+            return [c for c, _ in pares], [i for _, i in pares]
+        base_float = bases / 100.0
+        cbs = np.rint(base_float * 0.009 * 100).astype(np.int64).tolist()
+        ibs = np.rint(base_float * 0.001 * 100).astype(np.int64).tolist()
+        return [str(v).zfill(14) for v in cbs], [str(v).zfill(14) for v in ibs]
+
+
+class XMLBuilder:
+    def __init__(self, parser, edited_items=None):
+        self.p = parser
+        self.items_to_use = edited_items if edited_items else self.p.items
+        self.root = etree.Element("ListaDeclaracoes")
+        self.duimp = etree.SubElement(self.root, "duimp")
+
+    def build(self, user_inputs=None):
+        for element in self.iter_elements(user_inputs):
+            self.duimp.append(element)
+        xml_content = etree.tostring(self.root, pretty_print=True, encoding="UTF-8", xml_declaration=False)
+        return XML_DECLARATION + xml_content
+
+    def build_stream(self, user_inputs=None, out=None, validator=None, cache=None, progress=None):
+        """
+        Mesmo XML de build(), byte a byte, escrito de forma incremental: cada
+        <adicao> é montada, indentada, serializada, gravada e descartada, sem
+        a árvore inteira nem o texto inteiro em memória.
+        Sem `out`, grava num SpooledTemporaryFile (vai para disco acima de
+        XML_SPOOL_MAX_MEMORY) e o devolve posicionado no início. Com
+        `validator` (XmlLayoutValidator), cada elemento é conferido antes
+        de ser gravado. Com `cache` (AdicaoFragmentCache já atualizado para
+        estes itens), as adições e os totais vêm dele e só o rodapé é montado.
+        `progress(adicoes_gravadas, total)` é opcional.
+        """
+        spool = out is None
+        if spool:
+            out = tempfile.SpooledTemporaryFile(max_size=XML_SPOOL_MAX_MEMORY)
+        if cache is not None:
+            adicoes = cache.iter_fragments(validator)
+            totals  = cache.totals()
+            total   = len(cache.fragments)
+        else:
+            adicoes = (b"\n    " + serialize_duimp_child(element, validator) for element in self.iter_adicoes())
+            totals  = self.column_totals()
+            total   = len(self.items_to_use)
+
+        # Mesma saída de etree.tostring(pretty_print=True): <duimp> no nível 1
+        out.write(XML_DECLARATION + b"<ListaDeclaracoes>\n  <duimp>")
+        for n, fragment in enumerate(adicoes, start=1):
+            out.write(fragment)
+            if progress:
+                progress(n, total)
+        for element in self.iter_footer(totals, user_inputs):
+            out.write(b"\n    " + serialize_duimp_child(element, validator))
+        out.write(b"\n  </duimp>\n</ListaDeclaracoes>\n")
+        if spool:
+            out.seek(0)
+        return out
+
+    def iter_elements(self, user_inputs=None):
+        """Gera, em ordem e soltos da árvore, os filhos de <duimp>: as adições e o rodapé."""
+        yield from self.iter_adicoes()
+        yield from self.iter_footer(self.column_totals(), user_inputs)
+
+    def column_totals(self, items=None) -> Dict[str, float]:
+        """Totais do rodapé (frete, seguro e tributos), somados sem erro de arredondamento."""
+        items = self.items_to_use if items is None else items
+        return {
+            name: exact_float_sum(parse_br_number(it.get(column)) for it in items)
+            for name, column in XML_TOTAL_COLUMNS.items()
+        }
+
+    def iter_adicoes(self, items=None):
+        """Gera uma <adicao> solta por item (por padrão, todos os itens do builder)."""
+        h = self.p.header
+        duimp_fmt = self.duimp_number()
+        items     = list(self.items_to_use if items is None else items)   # ItemTable: um dict por item, uma vez
+
+        def coluna(key, default=None):
+            return [it.get(key, default) for it in items]
+
+        # Campos de largura fixa: formatados em lote, uma passada por coluna.
+        # Quantidade comercial ausente no item → usa a estatística.
+        qtd_comercial = [
+            it.get("quantidade") if is_missing_number(it.get("quantidade_comercial")) else it.get("quantidade_comercial")
+            for it in items
+        ]
+        col_val_total_venda  = BatchFormatter.high_precision(coluna("valorTotal"), 15)
+        col_val_unit         = BatchFormatter.high_precision(coluna("valorUnit"), 20)
+        col_qtd_comercial    = BatchFormatter.quantity(qtd_comercial, 14)
+        col_qtd_estatistica  = BatchFormatter.quantity(coluna("quantidade"), 14)
+        col_peso_liq         = BatchFormatter.quantity(coluna("pesoLiq"), 15)
+        col_base_total_reais = BatchFormatter.input_fiscal(coluna("valorTotal"), 15)
+        col_ncm              = BatchFormatter.ncm(coluna("ncm"))
+
+        col_frete     = BatchFormatter.input_fiscal(coluna("Frete (R$)", 0))
+        col_seguro    = BatchFormatter.input_fiscal(coluna("Seguro (R$)", 0))
+        col_aduaneiro = BatchFormatter.input_fiscal(coluna("Aduaneiro (R$)", 0))
+
+        col_ii_base     = BatchFormatter.input_fiscal(coluna("II Base (R$)", 0))
+        col_ii_aliq     = BatchFormatter.input_fiscal(coluna("II Alíq. (%)", 0), 5)
+        col_ii_val      = BatchFormatter.input_fiscal(coluna("II (R$)", 0))
+        col_ipi_aliq    = BatchFormatter.input_fiscal(coluna("IPI Alíq. (%)", 0), 5)
+        col_ipi_val     = BatchFormatter.input_fiscal(coluna("IPI (R$)", 0))
+        col_pis_base    = BatchFormatter.input_fiscal(coluna("PIS Base (R$)", 0))
+        col_pis_aliq    = BatchFormatter.input_fiscal(coluna("PIS Alíq. (%)", 0), 5)
+        col_pis_val     = BatchFormatter.input_fiscal(coluna("PIS (R$)", 0))
+        col_cofins_aliq = BatchFormatter.input_fiscal(coluna("COFINS Alíq. (%)", 0), 5)
+        col_cofins_val  = BatchFormatter.input_fiscal(coluna("COFINS (R$)", 0))
+
+        col_icms_base = [
+            ii_base if int(ii_base) > 0 else base_total
+            for ii_base, base_total in zip(col_ii_base, col_base_total_reais)
+        ]
+        col_cbs, col_ibs = BatchFormatter.cbs_ibs(col_icms_base)
+
+        for i, it in enumerate(items):
+            input_number  = str(it.get("NUMBER", "")).strip()
+            original_desc = DataFormatter.clean_text(it.get("descricao", ""))
+            desc_compl    = DataFormatter.clean_text(it.get("desc_complementar", ""))
+            final_desc    = montar_descricao_final(desc_compl, input_number, original_desc)
+
+            base_total_reais_fmt = col_base_total_reais[i]
+            aduaneiro_fmt        = col_aduaneiro[i]
+            ii_val_fmt           = col_ii_val[i]
+            ipi_val_fmt          = col_ipi_val[i]
+            pis_val_fmt          = col_pis_val[i]
+            cofins_val_fmt       = col_cofins_val[i]
+            icms_base_valor      = col_icms_base[i]
+
+            supplier_data = DataFormatter.parse_supplier_info(
+                it.get("fornecedor_raw"), it.get("endereco_raw")
+            )
+
+            # As chaves devem constar de ADICAO_SLOT_TAGS (as demais tags ficam no default)
+            extracted_map = {
+                "numeroAdicao": str(it["numeroAdicao"])[-3:],
+                "numeroDUIMP": duimp_fmt,
+                "dadosMercadoriaCodigoNcm": col_ncm[i],
+                "dadosMercadoriaMedidaEstatisticaQuantidade": col_qtd_estatistica[i],
+                "dadosMercadoriaMedidaEstatisticaUnidade": it.get("unidade", "").upper(),
+                "dadosMercadoriaPesoLiquido": col_peso_liq[i],
+                "condicaoVendaMoedaNome": it.get("moeda", "").upper(),
+                "valorTotalCondicaoVenda": col_val_total_venda[i],
+                "valorUnitario": col_val_unit[i],
+                "condicaoVendaValorMoeda": base_total_reais_fmt,
+                "condicaoVendaValorReais": aduaneiro_fmt if int(aduaneiro_fmt) > 0 else base_total_reais_fmt,
+                "paisOrigemMercadoriaNome": it.get("paisOrigem", "").upper(),
+                "paisAquisicaoMercadoriaNome": it.get("paisOrigem", "").upper(),
+                "descricaoMercadoria": final_desc,
+                "quantidade": col_qtd_comercial[i],
+                "unidadeMedida": it.get("unidade", "").upper(),
+                "dadosCargaUrfEntradaCodigo": h.get("urf", "0917800"),
+                "fornecedorNome": supplier_data["fornecedorNome"][:60],
+                "fornecedorLogradouro": supplier_data["fornecedorLogradouro"][:60],
+                "fornecedorNumero": supplier_data["fornecedorNumero"][:10],
+                "fornecedorCidade": supplier_data["fornecedorCidade"][:30],
+                "freteValorReais": col_frete[i],
+                "seguroValorReais": col_seguro[i],
+                "iiBaseCalculo": col_ii_base[i],
+                "iiAliquotaAdValorem": col_ii_aliq[i],
+                "iiAliquotaValorCalculado": ii_val_fmt,
+                "iiAliquotaValorDevido": ii_val_fmt,
+                "iiAliquotaValorRecolher": ii_val_fmt,
+                "ipiAliquotaAdValorem": col_ipi_aliq[i],
+                "ipiAliquotaValorDevido": ipi_val_fmt,
+                "ipiAliquotaValorRecolher": ipi_val_fmt,
+                "pisCofinsBaseCalculoValor": col_pis_base[i],
+                "pisPasepAliquotaAdValorem": col_pis_aliq[i],
+                "pisPasepAliquotaValorDevido": pis_val_fmt,
+                "pisPasepAliquotaValorRecolher": pis_val_fmt,
+                "cofinsAliquotaAdValorem": col_cofins_aliq[i],
+                "cofinsAliquotaValorDevido": cofins_val_fmt,
+                "cofinsAliquotaValorRecolher": cofins_val_fmt,
+                "icmsBaseCalculoValor": icms_base_valor,
+                "icmsBaseCalculoAliquota": "01800",
+                "cbsIbsClasstrib": "000001",
+                "cbsBaseCalculoValor": icms_base_valor,
+                "cbsBaseCalculoAliquota": "00090",
+                "cbsBaseCalculoValorImposto": col_cbs[i],
+                "ibsBaseCalculoValor": icms_base_valor,
+                "ibsBaseCalculoAliquota": "00010",
+                "ibsBaseCalculoValorImposto": col_ibs[i]
+            }
+
+            yield new_adicao(extracted_map)
+
+    def duimp_number(self) -> str:
+        return self.p.header.get("numeroDUIMP", "").split("/")[0].replace("-", "").replace(".", "")
+
+    def iter_footer(self, totals, user_inputs=None):
+        """Gera, em ordem, as tags do rodapé de <duimp> a partir dos totais das adições."""
+        h = self.p.header
+        duimp_fmt = self.duimp_number()
+
+        peso_bruto_fmt     = DataFormatter.format_quantity(h.get("pesoBruto"), 15)
+        peso_liq_total_fmt = DataFormatter.format_quantity(h.get("pesoLiquido"), 15)
+
+        footer_map = {
+            "numeroDUIMP": duimp_fmt,
+            "importadorNome": h.get("nomeImportador", ""),
+            "importadorNumero": DataFormatter.format_number(h.get("cnpj"), 14),
+            "cargaPesoBruto": peso_bruto_fmt,
+            "cargaPesoLiquido": peso_liq_total_fmt,
+            "cargaPaisProcedenciaNome": h.get("paisProcedencia", "").upper(),
+            "totalAdicoes": str(len(self.items_to_use)).zfill(3),
+            "freteTotalReais": DataFormatter.format_input_fiscal(totals["frete"]),
+            "seguroTotalReais": DataFormatter.format_input_fiscal(totals["seguro"]),
+        }
+
+        if user_inputs:
+            footer_map["cargaDataChegada"]               = user_inputs.get("cargaDataChegada", "20251120")
+            footer_map["dataDesembaraco"]                = user_inputs.get("dataDesembaraco", "20251124")
+            footer_map["dataRegistro"]                   = user_inputs.get("dataRegistro", "20251124")
+            footer_map["conhecimentoCargaEmbarqueData"]  = user_inputs.get("conhecimentoCargaEmbarqueData", "20251025")
+            footer_map["cargaPesoBruto"]                 = user_inputs.get("cargaPesoBruto", peso_bruto_fmt)
+            footer_map["cargaPesoLiquido"]               = user_inputs.get("cargaPesoLiquido", peso_liq_total_fmt)
+            footer_map["localDescargaTotalDolares"]      = user_inputs.get("localDescargaTotalDolares", "000000000000000")
+            footer_map["localDescargaTotalReais"]        = user_inputs.get("localDescargaTotalReais", "000000000000000")
+            footer_map["localEmbarqueTotalDolares"]      = user_inputs.get("localEmbarqueTotalDolares", "000000000000000")
+            footer_map["localEmbarqueTotalReais"]        = user_inputs.get("localEmbarqueTotalReais", "000000000000000")
+
+        receita_codes = [
+            {"code": "0086", "val": totals["ii"]},
+            {"code": "1038", "val": totals["ipi"]},
+            {"code": "5602", "val": totals["pis"]},
+            {"code": "5629", "val": totals["cofins"]}
+        ]
+        if user_inputs and user_inputs.get("valorReceita7811", "0") != "0":
+            receita_codes.append({"code": "7811", "val": float(user_inputs.get("valorReceita7811"))})
+
+        for tag, default_val in FOOTER_TAGS.items():
+            if tag == "embalagem" and user_inputs:
+                parent = etree.Element(tag)
+                for subfield in default_val:
+                    val_to_use = subfield["default"]
+                    if subfield["tag"] == "quantidadeVolume":
+                        val_to_use = user_inputs.get("quantidadeVolume", val_to_use)
+                    etree.SubElement(parent, subfield["tag"]).text = val_to_use
+                yield parent
+                continue
+
+            if tag == "pagamento":
+                agencia = "3715"
+                banco   = "341"
+                if user_inputs:
+                    agencia = user_inputs.get("agenciaPagamento", "3715")
+                    banco   = user_inputs.get("bancoPagamento", "341")
+                for rec in receita_codes:
+                    if rec["val"] > 0:
+                        pag = etree.Element("pagamento")
+                        etree.SubElement(pag, "agenciaPagamento").text = agencia
+                        etree.SubElement(pag, "bancoPagamento").text = banco
+                        etree.SubElement(pag, "codigoReceita").text = rec["code"]
+                        if rec["code"] == "7811" and user_inputs:
+                            etree.SubElement(pag, "valorReceita").text = user_inputs.get("valorReceita7811").zfill(15)
+                        else:
+                            etree.SubElement(pag, "valorReceita").text = DataFormatter.format_input_fiscal(rec["val"])
+                        yield pag
+                continue
+
+            if tag in footer_map:
+                yield _text_element(tag, footer_map[tag])
+                continue
+
+            if user_inputs and tag in user_inputs:
+                yield _text_element(tag, user_inputs[tag])
+                continue
+
+            if isinstance(default_val, list):
+                parent = etree.Element(tag)
+                for subfield in default_val:
+                    etree.SubElement(parent, subfield["tag"]).text = subfield["default"]
+                yield parent
+            elif isinstance(default_val, dict):
+                parent = etree.Element(tag)
+                etree.SubElement(parent, default_val["tag"]).text = default_val["default"]
+                yield parent
+            else:
+                yield _text_element(tag, footer_map.get(tag, default_val))
@@ -1,31 +1,36 @@
+from __future__ import annotations
+
 import streamlit as st
-import sqlite3
-from datetime import datetime, timedelta, date
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import random
-from typing import List, Tuple, Optional, Dict, Any
-import io
-import contextlib
-import chardet
+from datetime import datetime
+from typing import Tuple, Dict, Any
 from io import BytesIO
-import base64
-import time
-import xml.etree.ElementTree as ET
 import os
-import hashlib
-import xml.dom.minidom
 import traceback
-from pathlib import Path
-import numpy as np
-import fitz  # PyMuPDF
-import pdfplumber
-import re
-from lxml import etree
-import tempfile
 import logging
-import gc
+import uuid
+
+# Leitura dos PDFs, vinculação e geração do XML ficam no pacote engine,
+# que não depende do Streamlit (ver também `python -m engine --help`).
+from engine.batch import processar_lote
+from engine.cte import CTeProcessorDirect
+from engine.grid import GradeConferencia, montar_grade_duimp, vincular_dados
+from engine.instrumentation import RunProfile, record_run
+from engine.integrated import AdicaoFragmentCache, gerar_xml_integrado, nome_arquivo_xml, xml_config_padrao
+from engine.items import itens_para_dataframe
+from engine.jobs import PARSE_JOB_KINDS, ParseJobQueue
+from engine.lazy import LazyModule
+from engine.memory import MemoryBudget, SpillableState
+from engine.pool import WorkerPool
+from engine.progress import ProgressReporter
+from engine.snapshot import SessionSnapshot, SnapshotConflict, listar_snapshots
+from engine.txt import PADROES_PADRAO, filtrar_txt
+from engine.uploads import upload_digest
+from engine.validation import XmlLayoutValidator, campos_nao_lidos
+
+np = LazyModule("numpy", "np", globals())
+pd = LazyModule("pandas", "pd", globals())
+px = LazyModule("plotly.express", "px", globals())
+go = LazyModule("plotly.graph_objects", "go", globals())
 
 # ==============================================================================
 # CONFIGURAÇÃO AUTOMÁTICA DO SERVIDOR STREAMLIT (Para PDFs gigantes)
@@ -43,72 +48,54 @@ def setup_streamlit_config():
     except Exception as e:
         pass
 
-setup_streamlit_config()
-
 # ==============================================================================
 # CONFIGURAÇÃO INICIAL
 # ==============================================================================
-st.set_page_config(
-    page_title="Sistema de Processamento Unificado 2026",
-    page_icon="📊",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Namespaces para CT-e
-CTE_NAMESPACES = {
-    'cte': 'http://www.portalfiscal.inf.br/cte'
-}
+# Os processos de leitura (forkserver/spawn, engine.parallel) importam este
+# script de novo como __mp_main__; lá só as definições interessam, sem
+# configurar a página nem o config.toml.
+if __name__ != "__mp_main__":
+    setup_streamlit_config()
+
+    st.set_page_config(
+        page_title="Sistema de Processamento Unificado 2026",
+        page_icon="📊",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
 
-# Inicialização do estado da sessão
-if 'selected_xml' not in st.session_state:
-    st.session_state.selected_xml = None
-if 'cte_data' not in st.session_state:
-    st.session_state.cte_data = None
-if "parsed_duimp" not in st.session_state:
-    st.session_state["parsed_duimp"] = None
-if "parsed_sigraweb" not in st.session_state:
-    st.session_state["parsed_sigraweb"] = None
-if "merged_df" not in st.session_state:
-    st.session_state["merged_df"] = None
+    # Inicialização do estado da sessão
+    if 'selected_xml' not in st.session_state:
+        st.session_state.selected_xml = None
+    if 'cte_data' not in st.session_state:
+        st.session_state.cte_data = None
+    if "parse_jobs" not in st.session_state:
+        st.session_state["parse_jobs"] = {}   # tipo ("duimp"/"sigraweb") → id do job na fila do servidor
+    if "leituras_interrompidas" not in st.session_state:
+        st.session_state["leituras_interrompidas"] = {}   # tipo → (arquivo, SHA-256) da leitura cancelada ou com erro
+    if "diagnostico" not in st.session_state:
+        st.session_state["diagnostico"] = {}   # nome da execução → RunProfile da última vez que rodou
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # ==============================================================================
-# ANIMAÇÕES DE CARREGAMENTO
+# ANDAMENTO DO PROCESSAMENTO
 # ==============================================================================
-def show_loading_animation(message="Processando..."):
-    with st.spinner(message):
-        progress_bar = st.progress(0)
-        for i in range(100):
-            time.sleep(0.01)
-            progress_bar.progress(i + 1)
-        progress_bar.empty()
-
-def show_processing_animation(message="Analisando dados..."):
-    placeholder = st.empty()
-    with placeholder.container():
-        col1, col2, col3 = st.columns([1, 2, 1])
-        with col2:
-            st.info(f"⏳ {message}")
-            spinner_placeholder = st.empty()
-            spinner_chars = ["⣾", "⣽", "⣻", "⢿", "⡿", "⣟", "⣯", "⣷"]
-            for i in range(20):
-                spinner_placeholder.markdown(
-                    f"<div style='text-align: center; font-size: 24px;'>{spinner_chars[i % 8]}</div>",
-                    unsafe_allow_html=True
-                )
-                time.sleep(0.1)
-    placeholder.empty()
+class StreamlitProgress(ProgressReporter):
+    """Barra st.progress com o texto do andamento; some ao terminar."""
+
+    def __init__(self, label="", unit="", min_interval=None):
+        super().__init__(label, unit, min_interval)
+        self._bar = st.progress(0.0, text=label)
+
+    def _emit(self):
+        self._bar.progress(self.fraction, text=self.text)
+
+    def finish(self):
+        self._bar.empty()
 
-def show_success_animation(message="Concluído!"):
-    success_placeholder = st.empty()
-    with success_placeholder.container():
-        st.success(f"✅ {message}")
-        time.sleep(1.5)
-    success_placeholder.empty()
 
 # ==============================================================================
 # CSS E CONFIGURAÇÃO DE ESTILO
@@ -234,37 +221,6 @@ def processador_txt():
     </div>
     """, unsafe_allow_html=True)
 
-    def detectar_encoding(conteudo):
-        resultado = chardet.detect(conteudo)
-        return resultado['encoding']
-
-    def processar_arquivo(conteudo, padroes):
-        try:
-            substituicoes = {
-                "IMPOSTO IMPORTACAO": "IMP IMPORT",
-                "TAXA SICOMEX": "TX SISCOMEX",
-                "FRETE INTERNACIONAL": "FRET INTER",
-                "SEGURO INTERNACIONAL": "SEG INTERN"
-            }
-            encoding = detectar_encoding(conteudo)
-            try:
-                texto = conteudo.decode(encoding)
-            except UnicodeDecodeError:
-                texto = conteudo.decode('latin-1')
-            linhas = texto.splitlines()
-            linhas_processadas = []
-            for linha in linhas:
-                linha = linha.strip()
-                if not any(padrao in linha for padrao in padroes):
-                    for original, substituto in substituicoes.items():
-                        linha = linha.replace(original, substituto)
-                    linhas_processadas.append(linha)
-            return "\n".join(linhas_processadas), len(linhas)
-        except Exception as e:
-            st.error(f"Erro ao processar o arquivo: {str(e)}")
-            return None, 0
-
-    padroes_default = ["-------", "SPED EFD-ICMS/IPI"]
     arquivo = st.file_uploader("Selecione o arquivo TXT", type=['txt'])
 
     with st.expander("⚙️ Configurações avançadas", expanded=False):
@@ -272,19 +228,21 @@ def processador_txt():
             "Padrões adicionais para remoção (separados por vírgula)",
             help="Exemplo: padrão1, padrão2, padrão3"
         )
-        padroes = padroes_default + [
+        padroes = PADROES_PADRAO + [
             p.strip() for p in padroes_adicionais.split(",") if p.strip()
-        ] if padroes_adicionais else padroes_default
+        ] if padroes_adicionais else PADROES_PADRAO
 
     if arquivo is not None:
         if st.button("🔄 Processar Arquivo TXT"):
             try:
-                show_loading_animation("Analisando arquivo TXT...")
                 conteudo = arquivo.read()
-                show_processing_animation("Processando linhas...")
-                resultado, total_linhas = processar_arquivo(conteudo, padroes)
+                try:
+                    with StreamlitProgress("Processando linhas", "linhas") as andamento:
+                        resultado, total_linhas = filtrar_txt(conteudo, padroes, andamento)
+                except Exception as e:
+                    st.error(f"Erro ao processar o arquivo: {str(e)}")
+                    resultado, total_linhas = None, 0
                 if resultado is not None:
-                    show_success_animation("Arquivo processado com sucesso!")
                     linhas_processadas = len(resultado.splitlines())
                     st.success(f"""
                     **Processamento concluído!** ✔️ Linhas originais: {total_linhas}
@@ -309,191 +267,6 @@ def processador_txt():
 # ==============================================================================
 # PARTE 2: PROCESSADOR CT-E COM EXTRAÇÃO DO PESO BRUTO E PESO BASE DE CÁLCULO
 # ==============================================================================
-class CTeProcessorDirect:
-    def __init__(self):
-        self.processed_data = []
-
-    def extract_nfe_number_from_key(self, chave_acesso):
-        if not chave_acesso or len(chave_acesso) != 44:
-            return None
-        try:
-            numero_nfe = chave_acesso[25:34]
-            return numero_nfe
-        except Exception:
-            return None
-
-    def extract_peso_bruto(self, root):
-        try:
-            tipos_peso = ['PESO BRUTO', 'PESO BASE DE CALCULO', 'PESO BASE CÁLCULO', 'PESO']
-            for prefix, uri in CTE_NAMESPACES.items():
-                infQ_elements = root.findall(f'.//{{{uri}}}infQ')
-                for infQ in infQ_elements:
-                    tpMed = infQ.find(f'{{{uri}}}tpMed')
-                    qCarga = infQ.find(f'{{{uri}}}qCarga')
-                    if tpMed is not None and tpMed.text and qCarga is not None and qCarga.text:
-                        for tipo_peso in tipos_peso:
-                            if tipo_peso in tpMed.text.upper():
-                                peso = float(qCarga.text)
-                                return peso, tipo_peso
-            infQ_elements = root.findall('.//infQ')
-            for infQ in infQ_elements:
-                tpMed = infQ.find('tpMed')
-                qCarga = infQ.find('qCarga')
-                if tpMed is not None and tpMed.text and qCarga is not None and qCarga.text:
-                    for tipo_peso in tipos_peso:
-                        if tipo_peso in tpMed.text.upper():
-                            peso = float(qCarga.text)
-                            return peso, tipo_peso
-            return 0.0, "Não encontrado"
-        except Exception as e:
-            st.warning(f"Não foi possível extrair o peso: {str(e)}")
-            return 0.0, "Erro na extração"
-
-    def extract_cte_data(self, xml_content, filename):
-        try:
-            root = ET.fromstring(xml_content)
-            for prefix, uri in CTE_NAMESPACES.items():
-                ET.register_namespace(prefix, uri)
-
-            def find_text(element, xpath):
-                try:
-                    for prefix, uri in CTE_NAMESPACES.items():
-                        full_xpath = xpath.replace('cte:', f'{{{uri}}}')
-                        found = element.find(full_xpath)
-                        if found is not None and found.text:
-                            return found.text
-                    found = element.find(xpath.replace('cte:', ''))
-                    if found is not None and found.text:
-                        return found.text
-                    return None
-                except Exception:
-                    return None
-
-            nCT = find_text(root, './/cte:nCT')
-            dhEmi = find_text(root, './/cte:dhEmi')
-            cMunIni = find_text(root, './/cte:cMunIni')
-            UFIni = find_text(root, './/cte:UFIni')
-            cMunFim = find_text(root, './/cte:cMunFim')
-            UFFim = find_text(root, './/cte:UFFim')
-            emit_xNome = find_text(root, './/cte:emit/cte:xNome')
-            vTPrest = find_text(root, './/cte:vTPrest')
-            rem_xNome = find_text(root, './/cte:rem/cte:xNome')
-            dest_xNome = find_text(root, './/cte:dest/cte:xNome')
-            dest_CNPJ = find_text(root, './/cte:dest/cte:CNPJ')
-            dest_CPF = find_text(root, './/cte:dest/cte:CPF')
-            documento_destinatario = dest_CNPJ or dest_CPF or 'N/A'
-            dest_xLgr = find_text(root, './/cte:dest/cte:enderDest/cte:xLgr')
-            dest_nro = find_text(root, './/cte:dest/cte:enderDest/cte:nro')
-            dest_xBairro = find_text(root, './/cte:dest/cte:enderDest/cte:xBairro')
-            dest_cMun = find_text(root, './/cte:dest/cte:enderDest/cte:cMun')
-            dest_xMun = find_text(root, './/cte:dest/cte:enderDest/cte:xMun')
-            dest_CEP = find_text(root, './/cte:dest/cte:enderDest/cte:CEP')
-            dest_UF = find_text(root, './/cte:dest/cte:enderDest/cte:UF')
-            endereco_destinatario = ""
-            if dest_xLgr:
-                endereco_destinatario += f"{dest_xLgr}"
-                if dest_nro:
-                    endereco_destinatario += f", {dest_nro}"
-                if dest_xBairro:
-                    endereco_destinatario += f" - {dest_xBairro}"
-                if dest_xMun:
-                    endereco_destinatario += f", {dest_xMun}"
-                if dest_UF:
-                    endereco_destinatario += f"/{dest_UF}"
-                if dest_CEP:
-                    endereco_destinatario += f" - CEP: {dest_CEP}"
-            if not endereco_destinatario:
-                endereco_destinatario = "N/A"
-            infNFe_chave = find_text(root, './/cte:infNFe/cte:chave')
-            numero_nfe = self.extract_nfe_number_from_key(infNFe_chave) if infNFe_chave else None
-            peso_bruto, tipo_peso_encontrado = self.extract_peso_bruto(root)
-            data_formatada = None
-            if dhEmi:
-                try:
-                    try:
-                        data_obj = datetime.strptime(dhEmi[:10], '%Y-%m-%d')
-                    except:
-                        try:
-                            data_obj = datetime.strptime(dhEmi[:10], '%d/%m/%Y')
-                        except:
-                            data_obj = datetime.strptime(dhEmi[:10], '%d/%m/%y')
-                    data_formatada = data_obj.strftime('%d/%m/%y')
-                except:
-                    data_formatada = dhEmi[:10]
-            try:
-                vTPrest = float(vTPrest) if vTPrest else 0.0
-            except (ValueError, TypeError):
-                vTPrest = 0.0
-            return {
-                'Arquivo': filename,
-                'nCT': nCT or 'N/A',
-                'Data Emissão': data_formatada or dhEmi or 'N/A',
-                'Código Município Início': cMunIni or 'N/A',
-                'UF Início': UFIni or 'N/A',
-                'Código Município Fim': cMunFim or 'N/A',
-                'UF Fim': UFFim or 'N/A',
-                'Emitente': emit_xNome or 'N/A',
-                'Valor Prestação': vTPrest,
-                'Peso Bruto (kg)': peso_bruto,
-                'Tipo de Peso Encontrado': tipo_peso_encontrado,
-                'Remetente': rem_xNome or 'N/A',
-                'Destinatário': dest_xNome or 'N/A',
-                'Documento Destinatário': documento_destinatario,
-                'Endereço Destinatário': endereco_destinatario,
-                'Município Destino': dest_xMun or 'N/A',
-                'UF Destino': dest_UF or 'N/A',
-                'Chave NFe': infNFe_chave or 'N/A',
-                'Número NFe': numero_nfe or 'N/A',
-                'Data Processamento': datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-            }
-        except Exception as e:
-            st.error(f"Erro ao extrair dados do CT-e {filename}: {str(e)}")
-            return None
-
-    def process_single_file(self, uploaded_file):
-        try:
-            file_content = uploaded_file.getvalue()
-            filename = uploaded_file.name
-            if not filename.lower().endswith('.xml'):
-                return False, "Arquivo não é XML"
-            content_str = file_content.decode('utf-8', errors='ignore')
-            if 'CTe' not in content_str and 'conhecimento' not in content_str.lower():
-                return False, "Arquivo não parece ser um CT-e"
-            cte_data = self.extract_cte_data(content_str, filename)
-            if cte_data:
-                self.processed_data.append(cte_data)
-                return True, f"CT-e {filename} processado com sucesso!"
-            else:
-                return False, f"Erro ao processar CT-e {filename}"
-        except Exception as e:
-            return False, f"Erro ao processar arquivo {filename}: {str(e)}"
-
-    def process_multiple_files(self, uploaded_files):
-        results = {'success': 0, 'errors': 0, 'messages': []}
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        for i, uploaded_file in enumerate(uploaded_files):
-            status_text.text(f"Processando {i+1}/{len(uploaded_files)}: {uploaded_file.name}")
-            progress_bar.progress((i + 1) / len(uploaded_files))
-            success, message = self.process_single_file(uploaded_file)
-            if success:
-                results['success'] += 1
-            else:
-                results['errors'] += 1
-            results['messages'].append(message)
-        progress_bar.empty()
-        status_text.empty()
-        return results
-
-    def get_dataframe(self):
-        if self.processed_data:
-            return pd.DataFrame(self.processed_data)
-        return pd.DataFrame()
-
-    def clear_data(self):
-        self.processed_data = []
-
-
 def processador_cte():
     processor = CTeProcessorDirect()
     st.title("🚚 Processador de CT-e para Power BI")
@@ -519,11 +292,9 @@ def processador_cte():
         if upload_option == "Upload Individual":
             uploaded_file = st.file_uploader("Selecione um arquivo XML de CT-e", type=['xml'], key="single_cte")
             if uploaded_file and st.button("📊 Processar CT-e", key="process_single"):
-                show_loading_animation("Analisando estrutura do XML...")
-                show_processing_animation("Extraindo dados do CT-e...")
-                success, message = processor.process_single_file(uploaded_file)
+                with st.spinner("Extraindo dados do CT-e..."):
+                    success, message = processor.process_single_file(uploaded_file)
                 if success:
-                    show_success_animation("CT-e processado com sucesso!")
                     df = processor.get_dataframe()
                     if not df.empty:
                         ultimo_cte = df.iloc[-1]
@@ -540,9 +311,10 @@ def processador_cte():
                 type=['xml'], accept_multiple_files=True, key="multiple_cte"
             )
             if uploaded_files and st.button("📊 Processar Todos", key="process_multiple"):
-                show_loading_animation(f"Iniciando processamento de {len(uploaded_files)} arquivos...")
-                results = processor.process_multiple_files(uploaded_files)
-                show_success_animation("Processamento em lote concluído!")
+                with StreamlitProgress("Processando CT-es", "arquivos") as andamento:
+                    results = processor.process_multiple_files(
+                        uploaded_files, andamento, pool=get_worker_pool(), session=sessao_id()
+                    )
                 st.success(f"""
                 **Processamento concluído!** ✅ Sucessos: {results['success']}
                 ❌ Erros: {results['errors']}
@@ -565,8 +337,7 @@ def processador_cte():
 
         if st.button("🗑️ Limpar Dados Processados", type="secondary"):
             processor.clear_data()
-            st.success("Dados limpos com sucesso!")
-            time.sleep(1)
+            st.toast("Dados limpos com sucesso!")
             st.rerun()
 
     with tab2:
@@ -663,19 +434,19 @@ def processador_cte():
             )
             df_export = df[colunas_selecionadas] if colunas_selecionadas else df
             if export_option == "Excel (.xlsx)":
-                show_processing_animation("Gerando arquivo Excel...")
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    df_export.to_excel(writer, sheet_name='Dados_CTe', index=False)
-                output.seek(0)
+                with st.spinner("Gerando arquivo Excel..."):
+                    output = BytesIO()
+                    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+                        df_export.to_excel(writer, sheet_name='Dados_CTe', index=False)
+                    output.seek(0)
                 st.download_button(
                     label="📥 Baixar Planilha Excel", data=output,
                     file_name="dados_cte.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                 )
             else:
-                show_processing_animation("Gerando arquivo CSV...")
-                csv = df_export.to_csv(index=False).encode('utf-8')
+                with st.spinner("Gerando arquivo CSV..."):
+                    csv = df_export.to_csv(index=False).encode('utf-8')
                 st.download_button(
                     label="📥 Baixar Arquivo CSV", data=csv,
                     file_name="dados_cte.csv", mime="text/csv"
@@ -687,1111 +458,373 @@ def processador_cte():
 
 
 # ==============================================================================
-# PARTE 3: PARSER SIGRAWEB (SUBSTITUI HAFELE/EXTRATO DUIMP APP2)
+# PARTE 6: SISTEMA INTEGRADO DUIMP (COM SIGRAWEB NO LUGAR DO APP2)
 # ==============================================================================
-class SigrawebPDFParser:
-    """
-    Parser dedicado para o layout de exportação do Sigraweb
-    (Conferência do Processo Detalhado).
-    Extrai cabeçalho global e todas as adições com tributos por item.
-    """
+# ------------------------------------------------------------------------------
+# Vinculação DUIMP x Sigraweb
+# ------------------------------------------------------------------------------
+# Tabela "Adições Extraídas do Sigraweb": rótulo → campo do item
+SIGRAWEB_TABELA_COLUNAS = {
+    'Adição':          'numeroAdicao',
+    'Part Number':     'codigo_interno',
+    'NCM':             'ncm',
+    'Descrição':       'descricao',
+    'País Origem':     'paisOrigem',
+    'Qtd Estat.':      'quantidade',
+    'Qtd Comerc.':     'quantidade_comercial',
+    'Unidade':         'unidade',
+    'Peso Líq.(kg)':   'pesoLiq',
+    'FOB EUR':         'valorTotal',
+    'Vlr Adu. USD':    'valorAduaneiroUSD',
+    'Vlr Adu. BRL':    'valorAduaneiroReal',
+    'Frete USD':       'freteUSD',
+    'Frete BRL':       'freteReal',
+    'Seguro USD':      'seguroUSD',
+    'Seguro BRL':      'seguroReal',
+    'II %':            'ii_aliquota',
+    'II Base R$':      'ii_base_calculo',
+    'II R$':           'ii_valor_devido',
+    'IPI %':           'ipi_aliquota',
+    'IPI Base R$':     'ipi_base_calculo',
+    'IPI R$':          'ipi_valor_devido',
+    'PIS %':           'pis_aliquota',
+    'PIS Base R$':     'pis_base_calculo',
+    'PIS R$':          'pis_valor_devido',
+    'COFINS %':        'cofins_aliquota',
+    'COFINS Base R$':  'cofins_base_calculo',
+    'COFINS R$':       'cofins_valor_devido',
+    'Total Impostos':  'total_impostos',
+}
 
-    def __init__(self):
-        self.documento = {
-            'cabecalho': {},
-            'itens': [],
-            'totais': {}
-        }
+# ------------------------------------------------------------------------------
+# Fila de leituras em segundo plano (uma por servidor, compartilhada pelas sessões)
+# ------------------------------------------------------------------------------
+@st.cache_resource
+def get_worker_pool() -> WorkerPool:
+    """Processos de leitura do servidor, já com PyMuPDF, pdfplumber e lxml carregados."""
+    return WorkerPool()
 
-    @staticmethod
-    def _parse_valor(valor_str: str) -> float:
-        try:
-            if not valor_str:
-                return 0.0
-            limpo = valor_str.strip().replace('.', '').replace(',', '.')
-            return float(limpo)
-        except:
-            return 0.0
-
-    @staticmethod
-    def _fmt_date_to_yyyymmdd(date_str: str) -> str:
-        """Converte datas como 17/04/2026 → 20260417"""
-        try:
-            d = datetime.strptime(date_str.strip(), '%d/%m/%Y')
-            return d.strftime('%Y%m%d')
-        except:
-            return date_str.replace('/', '').replace('-', '')[:8]
 
-    def parse_pdf(self, pdf_path: str) -> Dict:
-        try:
-            logger.info(f"Iniciando parsing Sigraweb: {pdf_path}")
+@st.cache_resource
+def get_parse_job_queue() -> ParseJobQueue:
+    return ParseJobQueue(pool=get_worker_pool())
 
-            text_chunks = []
-            progress_text = st.empty()
-            progress_bar = st.progress(0)
 
-            with pdfplumber.open(pdf_path) as pdf:
-                total_pages = len(pdf.pages)
-                for i, page in enumerate(pdf.pages):
-                    progress_text.text(f"Lendo página {i+1} de {total_pages} do Sigraweb...")
-                    progress_bar.progress((i + 1) / total_pages)
-                    text = page.extract_text(layout=False)
-                    if text:
-                        text_chunks.append(text)
+def sessao_id() -> str:
+    """Identifica a sessão na fila do pool de processos (vez de cada sessão)."""
+    if "sessao_id" not in st.session_state:
+        st.session_state["sessao_id"] = uuid.uuid4().hex
+    return st.session_state["sessao_id"]
 
-            progress_text.empty()
-            progress_bar.empty()
 
-            full_text = "\n".join(text_chunks)
-            self._extract_header(text_chunks[0] if text_chunks else "", text_chunks[1] if len(text_chunks) > 1 else "")
-            self._extract_items(full_text)
-            self._calculate_totals()
+@st.cache_resource
+def get_memory_budget() -> MemoryBudget:
+    return MemoryBudget(shared=get_parse_job_queue())
 
-            del text_chunks
-            del full_text
-            gc.collect()
 
-            return self.documento
-
-        except Exception as e:
-            logger.error(f"Erro CRÍTICO no parsing Sigraweb: {str(e)}")
-            st.error(f"Erro ao ler o arquivo PDF Sigraweb: {str(e)}")
-            return self.documento
-
-    def _extract_header(self, page1_text: str, page2_text: str):
-        """Extrai todos os dados do cabeçalho do processo da página 1 e 2."""
-        h = {}
-
-        def _find(pattern, text, group=1, default=''):
-            m = re.search(pattern, text)
-            return m.group(group).strip() if m else default
-
-        # --- Página 1 ---
-        h['numeroDI']        = _find(r'Número DI:\s*([\w]+)', page1_text)
-        h['sigraweb']        = _find(r'SIGRAWEB:\s*([\w]+)', page1_text)
-        h['identificacao']   = _find(r'Identificação:\s*([\w]+)', page1_text)
-        h['cnpj']            = _find(r'CNPJ:\s*([\d\.\/\-]+)', page1_text)
-        h['nomeImportador']  = _find(r'Nome da Empresa:\s*(.+?)(?:\n|CNPJ)', page1_text)
-        h['dataRegistro']    = _find(r'Data Registro:([\d\-T:\.+]+)', page1_text)
-        if h['dataRegistro']:
-            h['dataRegistro'] = h['dataRegistro'][:10].replace('-', '')
-
-        h['pesoBruto']       = _find(r'Peso Bruto:([\d\.,]+)', page1_text)
-        h['pesoLiquido']     = _find(r'Peso Líquido:([\d\.,]+)', page1_text)
-        h['volumes']         = _find(r'Volumes:([\d]+)', page1_text)
-        h['embalagem']       = _find(r'Embalagem:(\w+)', page1_text)
-
-        h['urf']             = _find(r'URF de Entrada:\s*(\d+)', page1_text, default='0917900')
-        h['urfDespacho']     = _find(r'URF de Despacho:\s*(\d+)', page1_text, default='0917900')
-        h['urfNome']         = _find(r'URF de Entrada:\s*\d+\s*(.+?)(?:\n|URF)', page1_text, default='ALF - CURITIBA')
-        h['modalidade']      = _find(r'Modalidade de Despacho:\s*(.+?)(?:\n)', page1_text, default='Normal')
-        h['viaTransporte']   = _find(r'Via Transporte:\s*(.+?)(?:\n)', page1_text, default='Aéreo')
-
-        # País procedência (remove código numérico e lixo)
-        pais_raw = _find(r'País de Procedência:\s*\d+\s*(.+?)(?:\n|Local|Incoterms)', page1_text)
-        h['paisProcedencia'] = pais_raw.strip() if pais_raw else 'Alemanha'
-
-        h['localEmbarque']   = _find(r'Local de Embarque:\s*(.+?)(?:\n|Data)', page1_text)
-        h['dataEmbarque']    = _find(r'Data de Embarque:\s*([\d\/]+)', page1_text)
-        h['dataChegada']     = _find(r'Data de Chegada no Brasil:\s*([\d\/]+)', page1_text)
-        h['incoterms']       = _find(r'Incoterms:\s*(\w+)', page1_text, default='FCA')
-        h['recinto']         = _find(r'Recinto:\s*(\d+)\s*(.+?)(?:\n)', page1_text, default='9991101')
-
-        h['idtConhecimento'] = _find(r'IDT\. Conhecimento:\s*([\w]+)', page1_text)
-        h['idtMaster']       = _find(r'IDT\. Master:\s*([\w]+)', page1_text)
-
-        h['transportador']   = _find(r'Transportador:\s*(.+?)(?:\n|Agente)', page1_text)
-        h['agenteCarga']     = _find(r'Agente de Carga:\s*(.+?)(?:\n|CE)', page1_text)
-
-        # Valores financeiros (página 1 e 2)
-        combined = page1_text + "\n" + page2_text
-
-        h['taxaEUR']         = _find(r'Taxa EUR:\s*([\d\.,]+)', combined)
-        h['taxaDolar']       = _find(r'Taxa do Dólar:\s*([\d\.,]+)', combined)
-        h['fobEUR']          = _find(r'FOB:\s*([\d\.,]+)\s*\(EUR\)', combined)
-        h['fobUSD']          = _find(r'FOB:.*?\(EUR\)\s*;\s*([\d\.,]+)\s*\(USD\)', combined)
-        h['fobBRL']          = _find(r'FOB:.*?\(USD\);\s*([\d\.,]+)\s*\(BRL\)', combined)
-        h['freteEUR']        = _find(r'Frete:\s*([\d\.,]+)\s*\(EUR\)', combined)
-        h['freteUSD']        = _find(r'Frete:.*?\(EUR\)\s*;\s*([\d\.,]+)\s*\(USD\)', combined)
-        h['freteBRL']        = _find(r'Frete:.*?\(USD\);\s*([\d\.,]+)\s*\(BRL\)', combined)
-        h['seguroUSD']       = _find(r'Seguro:\s*([\d\.,]+)\s*\(USD\)', combined)
-        h['seguroBRL']       = _find(r'Seguro:.*?;\s*([\d\.,]+)\s*\(BRL\)', combined)
-        h['cifUSD']          = _find(r'CIF:\s*([\d\.,]+)\s*\(USD\)', combined)
-        h['cifBRL']          = _find(r'CIF:.*?;\s*([\d\.,]+)\s*\(BRL\)', combined)
-        h['valorAduaneiroUSD'] = _find(r'Valor Aduaneiro:\s*([\d\.,]+)\s*\(USD\)', combined)
-        h['valorAduaneiroBRL'] = _find(r'Valor Aduaneiro:.*?;\s*([\d\.,]+)\s*\(BRL\)', combined)
-
-        # Tributos totais
-        h['totalII']         = _find(r'II\s+([\d\.,]+)\s+[\d\.,]+\s+[\d\.,]+\s+[\d\.,]+\s+[\d\.,]+\s+Itau', page1_text)
-        # Simplificado: pegar da tabela de cabeçalho
-        trib_m = re.search(
-            r'([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+Itau\s+(\d+)\s+([\d\-]+)',
-            page1_text
+def leituras_da_sessao() -> SpillableState:
+    """
+    Leituras do Sistema Integrado DUIMP na sessão. O orçamento de memória do
+    servidor grava esse estado em disco quando a sessão fica ociosa (ou o
+    servidor passa do orçamento) e o primeiro acesso seguinte o relê.
+    """
+    if "leituras" not in st.session_state:
+        st.session_state["leituras"] = get_memory_budget().new_state(
+            descartaveis=("xml_cache",),
+            parsed_duimp=None,        # DuimpPDFParser lido (sem o texto extraído)
+            nome_duimp="",            # arquivo de onde veio parsed_duimp
+            parsed_sigraweb=None,
+            merged_df=None,
+            grade_conferencia=None,   # GradeConferencia da grade de edição
+            xml_cache=None,           # AdicaoFragmentCache da última geração do XML
+            snapshot=None,            # SessionSnapshot em disco (criado na primeira leitura)
         )
-        if trib_m:
-            h['totalII']     = trib_m.group(1)
-            h['totalIPI']    = trib_m.group(2)
-            h['totalPIS']    = trib_m.group(3)
-            h['totalCOFINS'] = trib_m.group(4)
-            h['totalSiscomex'] = trib_m.group(5)
-            h['banco']       = 'Itau'
-            h['agencia']     = trib_m.group(6)
-            h['conta']       = trib_m.group(7)
-        else:
-            h['totalII'] = h['totalIPI'] = h['totalPIS'] = h['totalCOFINS'] = '0'
-            h['totalSiscomex'] = '0'
-            h['banco']   = _find(r'Banco:\s*(\w+)', page2_text, default='Itau')
-            h['agencia'] = _find(r'Agência:\s*([\d]+)', page2_text, default='3715')
-            h['conta']   = _find(r'Conta Corrente:\s*([\w\-]+)', page2_text, default='')
-
-        # Converter datas para yyyymmdd
-        h['dataEmbarqueISO'] = self._fmt_date_to_yyyymmdd(h['dataEmbarque']) if h['dataEmbarque'] else ''
-        h['dataChegadaISO']  = self._fmt_date_to_yyyymmdd(h['dataChegada']) if h['dataChegada'] else ''
-
-        self.documento['cabecalho'] = h
-
-    def _extract_items(self, full_text: str):
-        """Extrai cada adição com seus dados fiscais."""
-        # Divide o texto completo em blocos por adição
-        chunks = re.split(r'Informações da Adição Nº:\s*(\d+)', full_text)
-        items_found = []
-
-        if len(chunks) <= 1:
-            st.warning("⚠️ Nenhuma adição encontrada no PDF Sigraweb. Verifique o formato do arquivo.")
-            self.documento['itens'] = []
-            return
-
-        for i in range(1, len(chunks), 2):
-            num_str = chunks[i].strip()
-            content  = chunks[i + 1] if (i + 1) < len(chunks) else ''
-            item = self._parse_item_block(num_str, content)
-            if item:
-                items_found.append(item)
-
-        self.documento['itens'] = items_found
-
-    def _parse_item_block(self, num_str: str, text: str) -> Optional[Dict]:
-        """Extrai todos os campos de uma adição."""
-        try:
-            pv = self._parse_valor
-
-            item = {
-                'numero_item': int(num_str),
-                'numeroAdicao': num_str.zfill(3),
-
-                # Identificação
-                'ncm':             '',
-                'codigo_interno':  '',
-                'descricao':       '',
-                'paisOrigem':      '',
-                'fornecedor_raw':  'HAFELE SE & CO KG',
-                'endereco_raw':    '',
-
-                # Quantidades
-                'quantidade':            0.0,   # Qnt. Estatística
-                'quantidade_comercial':  0.0,   # Quantidade na linha do item
-                'unidade':               'PECA',
-
-                # Valores
-                'pesoLiq':      '0',
-                'valorTotal':   '0',   # FOB em EUR (string para formatar no XML)
-                'valorUnit':    '0',
-                'valorAduaneiroReal': 0.0,   # Valor Aduaneiro em BRL (float)
-                'valorAduaneiroUSD':  0.0,   # Valor Aduaneiro em USD (float)
-                'moeda':        'EURO/COM.EUROPEIA',
-
-                # Frete e Seguro (em USD e BRL)
-                'freteUSD':     0.0,
-                'freteReal':    0.0,
-                'seguroUSD':    0.0,
-                'seguroReal':   0.0,
-                'frete_internacional': 0.0,
-                'seguro_internacional': 0.0,
-                'aduaneiro_reais': 0.0,   # Alias direto para o merge
-
-                # Tributos
-                'ii_aliquota':      0.0,
-                'ii_base_calculo':  0.0,
-                'ii_valor_devido':  0.0,
-
-                'ipi_aliquota':     0.0,
-                'ipi_base_calculo': 0.0,
-                'ipi_valor_devido': 0.0,
-
-                'pis_aliquota':     0.0,
-                'pis_base_calculo': 0.0,
-                'pis_valor_devido': 0.0,
-
-                'cofins_aliquota':     0.0,
-                'cofins_base_calculo': 0.0,
-                'cofins_valor_devido': 0.0,
-            }
-
-            # --- NCM ---
-            ncm_m = re.search(r'NR NCM:\s*(\d+)', text)
-            if ncm_m:
-                item['ncm'] = ncm_m.group(1)
-
-            # --- Part Number e Descrição ---
-            pn_m = re.search(
-                r'Part Number:\s*([\S]+)\s*\|\s*Descrição:\s*(.+?)(?=\nFabricante:|$)',
-                text, re.DOTALL
-            )
-            if pn_m:
-                item['codigo_interno'] = pn_m.group(1).strip()
-                item['descricao'] = re.sub(r'\s+', ' ', pn_m.group(2).strip())
-            else:
-                # Tenta captura alternativa apenas pela descrição
-                desc_m = re.search(r'Descrição:\s*(.+?)(?=\nFabricante:|$)', text, re.DOTALL)
-                if desc_m:
-                    item['descricao'] = re.sub(r'\s+', ' ', desc_m.group(1).strip())
-
-            # --- Peso Líquido ---
-            peso_m = re.search(r'Peso Líquido:\s*([\d\.,]+)', text)
-            if peso_m:
-                item['pesoLiq'] = peso_m.group(1)
-
-            # --- Quantidade Estatística (Destaque) ---
-            qtd_est_m = re.search(r'Qnt\. Estatística:\s*([\d\.,]+)', text)
-            if qtd_est_m:
-                item['quantidade'] = qtd_est_m.group(1)
-
-            # --- Quantidade Comercial (linha "Quantidade: X Unidade:") ---
-            qtd_com_m = re.search(r'Quantidade:\s*([\d\.,]+)\s+Unidade:', text)
-            if qtd_com_m:
-                item['quantidade_comercial'] = qtd_com_m.group(1)
-            else:
-                item['quantidade_comercial'] = item['quantidade']
-
-            # --- Unidade ---
-            un_m = re.search(r'Unidade:\s*(\S+)', text)
-            if un_m:
-                item['unidade'] = un_m.group(1).upper()
-
-            # --- Valor FOB em EUR (usado como valorTotal para o XML) ---
-            fob_eur_m = re.search(r'Valor FOB:\s*([\d\.,]+)\s+EUR', text)
-            if fob_eur_m:
-                item['valorTotal'] = fob_eur_m.group(1)
-
-            # --- Valor Aduaneiro USD ---
-            vad_usd_m = re.search(r'Valor Aduaneiro USD:\s*([\d\.,]+)', text)
-            if vad_usd_m:
-                item['valorAduaneiroUSD'] = pv(vad_usd_m.group(1))
-
-            # --- Valor Aduaneiro Real (BRL) — base de cálculo do II ---
-            vad_m = re.search(r'Valor Aduaneiro Real:\s*([\d\.,]+)', text)
-            if vad_m:
-                item['valorAduaneiroReal'] = pv(vad_m.group(1))   # float
-                item['aduaneiro_reais']    = pv(vad_m.group(1))   # alias p/ merge
-                item['ii_base_calculo']    = pv(vad_m.group(1))   # base II
-
-            # --- Valor Unitário ---
-            vunit_m = re.search(r'Valor Unitário:\s*([\d\.,]+)', text)
-            if vunit_m:
-                item['valorUnit'] = vunit_m.group(1)
-
-            # --- Frete ---
-            frete_usd_m = re.search(r'Valor Frete:\s*([\d\.,]+)\s+USD', text)
-            if frete_usd_m:
-                item['freteUSD'] = pv(frete_usd_m.group(1))
-            frete_real_m = re.search(r'Valor Frete Real:\s*([\d\.,]+)', text)
-            if frete_real_m:
-                item['freteReal']          = pv(frete_real_m.group(1))
-                item['frete_internacional'] = item['freteReal']
-
-            # --- Seguro ---
-            seg_usd_m = re.search(r'Valor Seguro:\s*([\d\.,]+)\s+USD', text)
-            if seg_usd_m:
-                item['seguroUSD'] = pv(seg_usd_m.group(1))
-            seg_real_m = re.search(r'Valor Seguro Real:\s*([\d\.,]+)', text)
-            if seg_real_m:
-                item['seguroReal']          = pv(seg_real_m.group(1))
-                item['seguro_internacional'] = item['seguroReal']
-
-            # --- Moeda ---
-            moeda_m = re.search(r'Moeda LI:\s*(.+?)(?:\n|Valor)', text)
-            if moeda_m:
-                item['moeda'] = moeda_m.group(1).strip()
-
-            # --- País Origem ---
-            pais_m = re.search(r'País Origem:\s*(.+?)(?:\n|Fabricante)', text)
-            if pais_m:
-                item['paisOrigem'] = pais_m.group(1).strip()
-
-            # --- Fornecedor ---
-            forn_m = re.search(r'Fornecedor:\s*(.+?)(?:\n|País)', text)
-            if forn_m:
-                item['fornecedor_raw'] = forn_m.group(1).strip()
-
-            # ==================================================================
-            # TABELA DE TRIBUTOS
-            # Estrutura do Sigraweb:
-            #  II:     Aliq(7cols) grupo(1)=aliq, grupo(6)=base, grupo(7)=valor
-            #  IPI:    6cols       grupo(1)=aliq, grupo(5)=base, grupo(6)=valor
-            #  PIS:    6cols       grupo(1)=aliq, grupo(5)=base, grupo(6)=valor
-            #  COFINS: 6cols       grupo(1)=aliq, grupo(5)=base, grupo(6)=valor
-            # ==================================================================
-
-            # II  — 7 colunas: AliqAdVal | VlAliq | AliqRed | VlRed | %Red | Base | Valor
-            ii_m = re.search(
-                r'^II\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)',
-                text, re.MULTILINE
-            )
-            if ii_m:
-                item['ii_aliquota']     = pv(ii_m.group(1))
-                item['ii_base_calculo'] = pv(ii_m.group(6))
-                item['ii_valor_devido'] = pv(ii_m.group(7))
-
-            # IPI — 6 colunas: AliqAdVal | VlAliq | AliqRed | %Red | Base | Valor
-            ipi_m = re.search(
-                r'^IPI\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)',
-                text, re.MULTILINE
-            )
-            if ipi_m:
-                item['ipi_aliquota']     = pv(ipi_m.group(1))
-                item['ipi_base_calculo'] = pv(ipi_m.group(5))
-                item['ipi_valor_devido'] = pv(ipi_m.group(6))
-
-            # PIS — 6 colunas: AliqAdVal | VlAliq | AliqRed | %Red | Base | Valor
-            pis_m = re.search(
-                r'^PIS\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)',
-                text, re.MULTILINE
-            )
-            if pis_m:
-                item['pis_aliquota']     = pv(pis_m.group(1))
-                item['pis_base_calculo'] = pv(pis_m.group(5))
-                item['pis_valor_devido'] = pv(pis_m.group(6))
-
-            # COFINS — 6 colunas
-            cof_m = re.search(
-                r'^COFINS\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)',
-                text, re.MULTILINE
-            )
-            if cof_m:
-                item['cofins_aliquota']     = pv(cof_m.group(1))
-                item['cofins_base_calculo'] = pv(cof_m.group(5))
-                item['cofins_valor_devido'] = pv(cof_m.group(6))
-
-            # Totais calculados
-            item['total_impostos'] = (
-                item['ii_valor_devido'] + item['ipi_valor_devido'] +
-                item['pis_valor_devido'] + item['cofins_valor_devido']
-            )
-            item['valor_total_com_impostos'] = pv(str(item['valorTotal'])) + item['total_impostos']
+    return st.session_state["leituras"]
 
-            return item
 
-        except Exception as e:
-            logger.error(f"Erro item {num_str}: {e}")
-            return None
-
-    def _calculate_totals(self):
-        if self.documento['itens']:
-            itens = self.documento['itens']
-            pv = self._parse_valor
-            self.documento['totais'] = {
-                'valor_total_fob':         sum(pv(str(i.get('valorTotal', 0))) for i in itens),
-                'peso_liquido_total':       sum(pv(str(i.get('pesoLiq', 0))) for i in itens),
-                'total_valor_aduaneiro':   sum(i.get('aduaneiro_reais', i.get('valorAduaneiroReal', 0)) for i in itens),
-                'total_ii':                sum(i.get('ii_valor_devido', 0) for i in itens),
-                'total_ipi':               sum(i.get('ipi_valor_devido', 0) for i in itens),
-                'total_pis':               sum(i.get('pis_valor_devido', 0) for i in itens),
-                'total_cofins':            sum(i.get('cofins_valor_devido', 0) for i in itens),
-                'total_frete':             sum(i.get('frete_internacional', 0) for i in itens),
-                'total_seguro':            sum(i.get('seguro_internacional', 0) for i in itens),
-                'quantidade_adicoes':      len(itens),
-            }
+def dono_snapshots() -> str:
+    """
+    Token do dono dos snapshots desta sessão. Fica na URL (?dono=), junto do
+    ?retomar=, para que a página recarregada depois de um reinício ache os
+    snapshots de novo; sessões sem o token não os listam nem os abrem.
+    """
+    dono = st.session_state.get("dono_snapshots") or st.query_params.get("dono", "")
+    if len(dono) != 32 or not dono.isalnum():
+        dono = uuid.uuid4().hex
+    st.session_state["dono_snapshots"] = dono
+    if st.query_params.get("dono") != dono:
+        st.query_params["dono"] = dono
+    return dono
 
 
-# ==============================================================================
-# PARTE 4: PARSER APP 1 (DUIMP) E FUNÇÕES AUXILIARES
-# ==============================================================================
-def montar_descricao_final(desc_complementar, codigo_extra, detalhamento):
+def salvar_snapshot(leituras: SpillableState, duimp=False, sigraweb=False, grade=False):
     """
-    Concatena: Descrição Complementar - Código - Detalhamento
+    Grava no snapshot da sessão as partes indicadas, para retomar o trabalho
+    se o servidor reiniciar. O id do snapshot vai para a URL (?retomar=),
+    então recarregar a página depois do reinício retoma sozinho. Se outra
+    sessão gravou na mesma pasta, esta passa a gravar tudo numa pasta nova.
+    Falha de disco vira aviso: o trabalho em memória continua.
     """
-    parte1 = str(desc_complementar).strip()
-    parte2 = str(codigo_extra).strip()
-    parte3 = str(detalhamento).strip()
-    return f"{parte1} - {parte2} - {parte3}"
-
-
-class DuimpPDFParser:
-    """Parser do App 1 (Mantido original + Correção Leitura Qtd Comercial e Memória)"""
-
-    def __init__(self, file_stream):
-        self.doc = fitz.open(stream=file_stream, filetype="pdf")
-        self.full_text = ""
-        self.header = {}
-        self.items = []
-
-    def preprocess(self):
-        clean_lines = []
-        for page in self.doc:
-            text = page.get_text("text")
-            lines = text.split('\n')
-            for line in lines:
-                l_strip = line.strip()
-                if "Extrato da DUIMP" in l_strip:
-                    continue
-                if "Data, hora e responsável" in l_strip:
-                    continue
-                if re.match(r'^\d+\s*/\s*\d+$', l_strip):
-                    continue
-                clean_lines.append(line)
-        self.full_text = "\n".join(clean_lines)
-        self.doc.close()
-        gc.collect()
-
-    def extract_header(self):
-        txt = self.full_text
-        self.header["numeroDUIMP"]    = self._regex(r"Extrato da Duimp\s+([\w\-\/]+)", txt)
-        self.header["cnpj"]           = self._regex(r"CNPJ do importador:\s*([\d\.\/\-]+)", txt)
-        self.header["nomeImportador"] = self._regex(r"Nome do importador:\s*\n?(.+)", txt)
-        self.header["pesoBruto"]      = self._regex(r"Peso Bruto \(kg\):\s*([\d\.,]+)", txt)
-        self.header["pesoLiquido"]    = self._regex(r"Peso Liquido \(kg\):\s*([\d\.,]+)", txt)
-        self.header["urf"]            = self._regex(r"Unidade de despacho:\s*([\d]+)", txt)
-        self.header["paisProcedencia"] = self._regex(r"País de Procedência:\s*\n?(.+)", txt)
-
-    def extract_items(self):
-        chunks = re.split(r"Item\s+(\d+)", self.full_text)
-        if len(chunks) > 1:
-            for i in range(1, len(chunks), 2):
-                num     = chunks[i]
-                content = chunks[i + 1]
-                item    = {"numeroAdicao": num}
-
-                item["ncm"]        = self._regex(r"NCM:\s*([\d\.]+)", content)
-                item["paisOrigem"] = self._regex(r"País de origem:\s*\n?(.+)", content)
-
-                item["quantidade"]           = self._regex(r"Quantidade na unidade estatística:\s*([\d\.,]+)", content)
-                item["quantidade_comercial"] = self._regex(r"Quantidade na unidade comercializada:\s*([\d\.,]+)", content)
-
-                item["unidade"]    = self._regex(r"Unidade estatística:\s*(.+)", content)
-                item["pesoLiq"]    = self._regex(r"Peso líquido \(kg\):\s*([\d\.,]+)", content)
-                item["valorUnit"]  = self._regex(r"Valor unitário na condição de venda:\s*([\d\.,]+)", content)
-                item["valorTotal"] = self._regex(r"Valor total na condição de venda:\s*([\d\.,]+)", content)
-                item["moeda"]      = self._regex(r"Moeda negociada:\s*(.+)", content)
-
-                exp_match = re.search(
-                    r"Código do Exportador Estrangeiro:\s*(.+?)(?=\n\s*(?:Endereço|Dados))", content, re.DOTALL
-                )
-                item["fornecedor_raw"] = exp_match.group(1).strip() if exp_match else ""
-
-                addr_match = re.search(
-                    r"Endereço:\s*(.+?)(?=\n\s*(?:Dados da Mercadoria|Aplicação))", content, re.DOTALL
-                )
-                item["endereco_raw"] = addr_match.group(1).strip() if addr_match else ""
+    snap = leituras["snapshot"]
+    if snap is None:
+        if leituras["parsed_duimp"] is None and leituras["parsed_sigraweb"] is None:
+            return
+        snap = leituras["snapshot"] = SessionSnapshot.novo(dono_snapshots())
+    st.query_params["retomar"] = snap.id
+    try:
+        if duimp:
+            snap.salvar_duimp(leituras["nome_duimp"], leituras["parsed_duimp"])
+        if sigraweb:
+            snap.salvar_sigraweb(leituras["parsed_sigraweb"])
+        if grade:
+            snap.salvar_grade(leituras["merged_df"])
+    except SnapshotConflict as e:
+        logger.warning(f"{e}; gravando o trabalho desta sessão num snapshot novo")
+        leituras["snapshot"] = None
+        salvar_snapshot(leituras, duimp=True, sigraweb=True, grade=True)
+    except Exception as e:
+        logger.error(f"Erro ao salvar o snapshot {snap.id}: {e}")
+        st.warning(f"⚠️ Não foi possível salvar o andamento em disco: {e}")
 
-                desc_match = re.search(
-                    r"Detalhamento do Produto:\s*(.+?)(?=\n\s*(?:Número de Identificação|Versão|Código de Class|Descrição complementar))",
-                    content, re.DOTALL
-                )
-                item["descricao"] = desc_match.group(1).strip() if desc_match else ""
 
-                compl_match = re.search(
-                    r"Descrição complementar da mercadoria:\s*(.+?)(?=\n|$)", content, re.DOTALL
-                )
-                item["desc_complementar"] = compl_match.group(1).strip() if compl_match else ""
+def retomar_snapshot(leituras: SpillableState, snapshot_id: str) -> bool:
+    """
+    Carrega um snapshot salvo nas leituras da sessão (sem ler os PDFs de
+    novo). A sessão segue gravando numa cópia, não na pasta retomada.
+    """
+    try:
+        snap   = SessionSnapshot.abrir(snapshot_id, dono_snapshots()).copia()
+        estado = snap.carregar()
+    except Exception as e:
+        logger.error(f"Erro ao retomar o snapshot {snapshot_id}: {e}")
+        st.warning(f"⚠️ Não foi possível retomar o trabalho salvo: {e}")
+        return False
+    for key, value in estado.items():
+        leituras[key] = value
+    leituras["grade_conferencia"] = None
+    leituras["xml_cache"] = None
+    leituras["snapshot"] = snap
+    st.query_params["retomar"] = snap.id
+    return True
+
+
+def _retomar_panel(leituras: SpillableState):
+    """Sessão sem leituras: retoma o snapshot da URL ou oferece os salvos recentemente."""
+    retomar = st.query_params.get("retomar")
+    if retomar and not st.session_state.get("retomada_tentada"):
+        st.session_state["retomada_tentada"] = True
+        if retomar_snapshot(leituras, retomar):
+            st.rerun()
 
-                self.items.append(item)
+    salvos = listar_snapshots(dono_snapshots())
+    if not salvos:
+        return
+    with st.expander("♻️ Retomar trabalho salvo", expanded=False):
+        def rotulo(cab):
+            duimp = (cab.get("duimp") or {}).get("nome") or "sem DUIMP"
+            sgw   = "com Sigraweb" if cab.get("sigraweb") else "sem Sigraweb"
+            linhas = (cab.get("grade") or {}).get("linhas", 0)
+            salvo = datetime.fromtimestamp(cab.get("salvo_em", 0)).strftime("%d/%m %H:%M")
+            return f"{duimp} · {sgw} · {linhas} linha(s) · salvo em {salvo}"
+
+        escolhido = st.selectbox("Trabalho salvo", salvos, format_func=rotulo, key="snapshot_escolhido")
+        if st.button("Retomar", key="retomar_snapshot") and retomar_snapshot(leituras, escolhido["id"]):
+            st.rerun()
 
-    def _regex(self, pattern, text):
-        match = re.search(pattern, text)
-        return match.group(1).strip() if match else ""
 
+def collect_parse_jobs(job_ids: Dict[str, str]) -> Dict[str, Tuple[bool, Any, str]]:
+    """
+    Recolhe os jobs da sessão que terminaram: devolve
+    {tipo: (ok, resultado_ou_erro, nome_do_arquivo)} e tira esses jobs da fila
+    e da sessão. O nome vem do job, não do uploader: o job pode terminar
+    depois que o uploader foi esvaziado (troca de módulo). Jobs cancelados
+    são só descartados. O arquivo de uma leitura cancelada ou com erro fica
+    registrado para não ser lido de novo a cada execução do script (ver
+    leitura_interrompida).
+    """
+    queue = get_parse_job_queue()
+    finished = {}
+    for kind, job_id in list(job_ids.items()):
+        job = queue.get(job_id)
+        if job is None:
+            del job_ids[kind]
+            continue
+        if job.running:
+            continue
+        if job.profile is not None:
+            guardar_diagnostico(job.profile)
+        if job.status == "concluido":
+            finished[kind] = (True, job.result, job.filename)
+        elif job.status == "erro":
+            finished[kind] = (False, job.error, job.filename)
+        else:
+            st.info(f"Leitura do {job.label} ({job.filename}) cancelada.")
+        if job.status != "concluido":
+            st.session_state["leituras_interrompidas"][kind] = (job.filename, job.key[1])
+        queue.discard(job_id)
+        del job_ids[kind]
+    return finished
 
-# ==============================================================================
-# PARTE 5: XML BUILDER E CONSTANTES
-# ==============================================================================
 
-ADICAO_FIELDS_ORDER = [
-    {"tag": "acrescimo", "type": "complex", "children": [
-        {"tag": "codigoAcrescimo", "default": "17"},
-        {"tag": "denominacao", "default": "OUTROS ACRESCIMOS AO VALOR ADUANEIRO"},
-        {"tag": "moedaNegociadaCodigo", "default": "978"},
-        {"tag": "moedaNegociadaNome", "default": "EURO/COM.EUROPEIA"},
-        {"tag": "valorMoedaNegociada", "default": "000000000000000"},
-        {"tag": "valorReais", "default": "000000000000000"}
-    ]},
-    {"tag": "cideValorAliquotaEspecifica", "default": "00000000000"},
-    {"tag": "cideValorDevido", "default": "000000000000000"},
-    {"tag": "cideValorRecolher", "default": "000000000000000"},
-    {"tag": "codigoRelacaoCompradorVendedor", "default": "3"},
-    {"tag": "codigoVinculoCompradorVendedor", "default": "1"},
-    {"tag": "cofinsAliquotaAdValorem", "default": "00965"},
-    {"tag": "cofinsAliquotaEspecificaQuantidadeUnidade", "default": "000000000"},
-    {"tag": "cofinsAliquotaEspecificaValor", "default": "0000000000"},
-    {"tag": "cofinsAliquotaReduzida", "default": "00000"},
-    {"tag": "cofinsAliquotaValorDevido", "default": "000000000000000"},
-    {"tag": "cofinsAliquotaValorRecolher", "default": "000000000000000"},
-    {"tag": "condicaoVendaIncoterm", "default": "FCA"},
-    {"tag": "condicaoVendaLocal", "default": ""},
-    {"tag": "condicaoVendaMetodoValoracaoCodigo", "default": "01"},
-    {"tag": "condicaoVendaMetodoValoracaoNome", "default": "METODO 1 - ART. 1 DO ACORDO (DECRETO 92930/86)"},
-    {"tag": "condicaoVendaMoedaCodigo", "default": "978"},
-    {"tag": "condicaoVendaMoedaNome", "default": "EURO/COM.EUROPEIA"},
-    {"tag": "condicaoVendaValorMoeda", "default": "000000000000000"},
-    {"tag": "condicaoVendaValorReais", "default": "000000000000000"},
-    {"tag": "dadosCambiaisCoberturaCambialCodigo", "default": "1"},
-    {"tag": "dadosCambiaisCoberturaCambialNome", "default": "COM COBERTURA CAMBIAL E PAGAMENTO FINAL A PRAZO DE ATE' 180"},
-    {"tag": "dadosCambiaisInstituicaoFinanciadoraCodigo", "default": "00"},
-    {"tag": "dadosCambiaisInstituicaoFinanciadoraNome", "default": "N/I"},
-    {"tag": "dadosCambiaisMotivoSemCoberturaCodigo", "default": "00"},
-    {"tag": "dadosCambiaisMotivoSemCoberturaNome", "default": "N/I"},
-    {"tag": "dadosCambiaisValorRealCambio", "default": "000000000000000"},
-    {"tag": "dadosCargaPaisProcedenciaCodigo", "default": "000"},
-    {"tag": "dadosCargaUrfEntradaCodigo", "default": "0000000"},
-    {"tag": "dadosCargaViaTransporteCodigo", "default": "01"},
-    {"tag": "dadosCargaViaTransporteNome", "default": "MARÍTIMA"},
-    {"tag": "dadosMercadoriaAplicacao", "default": "REVENDA"},
-    {"tag": "dadosMercadoriaCodigoNaladiNCCA", "default": "0000000"},
-    {"tag": "dadosMercadoriaCodigoNaladiSH", "default": "00000000"},
-    {"tag": "dadosMercadoriaCodigoNcm", "default": "00000000"},
-    {"tag": "dadosMercadoriaCondicao", "default": "NOVA"},
-    {"tag": "dadosMercadoriaDescricaoTipoCertificado", "default": "Sem Certificado"},
-    {"tag": "dadosMercadoriaIndicadorTipoCertificado", "default": "1"},
-    {"tag": "dadosMercadoriaMedidaEstatisticaQuantidade", "default": "00000000000000"},
-    {"tag": "dadosMercadoriaMedidaEstatisticaUnidade", "default": "UNIDADE"},
-    {"tag": "dadosMercadoriaNomeNcm", "default": "DESCRIÇÃO PADRÃO NCM"},
-    {"tag": "dadosMercadoriaPesoLiquido", "default": "000000000000000"},
-    {"tag": "dcrCoeficienteReducao", "default": "00000"},
-    {"tag": "dcrIdentificacao", "default": "00000000"},
-    {"tag": "dcrValorDevido", "default": "000000000000000"},
-    {"tag": "dcrValorDolar", "default": "000000000000000"},
-    {"tag": "dcrValorReal", "default": "000000000000000"},
-    {"tag": "dcrValorRecolher", "default": "000000000000000"},
-    {"tag": "fornecedorCidade", "default": ""},
-    {"tag": "fornecedorLogradouro", "default": ""},
-    {"tag": "fornecedorNome", "default": ""},
-    {"tag": "fornecedorNumero", "default": ""},
-    {"tag": "freteMoedaNegociadaCodigo", "default": "978"},
-    {"tag": "freteMoedaNegociadaNome", "default": "EURO/COM.EUROPEIA"},
-    {"tag": "freteValorMoedaNegociada", "default": "000000000000000"},
-    {"tag": "freteValorReais", "default": "000000000000000"},
-    {"tag": "iiAcordoTarifarioTipoCodigo", "default": "0"},
-    {"tag": "iiAliquotaAcordo", "default": "00000"},
-    {"tag": "iiAliquotaAdValorem", "default": "00000"},
-    {"tag": "iiAliquotaPercentualReducao", "default": "00000"},
-    {"tag": "iiAliquotaReduzida", "default": "00000"},
-    {"tag": "iiAliquotaValorCalculado", "default": "000000000000000"},
-    {"tag": "iiAliquotaValorDevido", "default": "000000000000000"},
-    {"tag": "iiAliquotaValorRecolher", "default": "000000000000000"},
-    {"tag": "iiAliquotaValorReduzido", "default": "000000000000000"},
-    {"tag": "iiBaseCalculo", "default": "000000000000000"},
-    {"tag": "iiFundamentoLegalCodigo", "default": "00"},
-    {"tag": "iiMotivoAdmissaoTemporariaCodigo", "default": "00"},
-    {"tag": "iiRegimeTributacaoCodigo", "default": "1"},
-    {"tag": "iiRegimeTributacaoNome", "default": "RECOLHIMENTO INTEGRAL"},
-    {"tag": "ipiAliquotaAdValorem", "default": "00000"},
-    {"tag": "ipiAliquotaEspecificaCapacidadeRecipciente", "default": "00000"},
-    {"tag": "ipiAliquotaEspecificaQuantidadeUnidadeMedida", "default": "000000000"},
-    {"tag": "ipiAliquotaEspecificaTipoRecipienteCodigo", "default": "00"},
-    {"tag": "ipiAliquotaEspecificaValorUnidadeMedida", "default": "0000000000"},
-    {"tag": "ipiAliquotaNotaComplementarTIPI", "default": "00"},
-    {"tag": "ipiAliquotaReduzida", "default": "00000"},
-    {"tag": "ipiAliquotaValorDevido", "default": "000000000000000"},
-    {"tag": "ipiAliquotaValorRecolher", "default": "000000000000000"},
-    {"tag": "ipiRegimeTributacaoCodigo", "default": "4"},
-    {"tag": "ipiRegimeTributacaoNome", "default": "SEM BENEFICIO"},
-    {"tag": "mercadoria", "type": "complex", "children": [
-        {"tag": "descricaoMercadoria", "default": ""},
-        {"tag": "numeroSequencialItem", "default": "01"},
-        {"tag": "quantidade", "default": "00000000000000"},
-        {"tag": "unidadeMedida", "default": "UNIDADE"},
-        {"tag": "valorUnitario", "default": "00000000000000000000"}
-    ]},
-    {"tag": "numeroAdicao", "default": "001"},
-    {"tag": "numeroDUIMP", "default": ""},
-    {"tag": "numeroLI", "default": "0000000000"},
-    {"tag": "paisAquisicaoMercadoriaCodigo", "default": "000"},
-    {"tag": "paisAquisicaoMercadoriaNome", "default": ""},
-    {"tag": "paisOrigemMercadoriaCodigo", "default": "000"},
-    {"tag": "paisOrigemMercadoriaNome", "default": ""},
-    {"tag": "pisCofinsBaseCalculoAliquotaICMS", "default": "00000"},
-    {"tag": "pisCofinsBaseCalculoFundamentoLegalCodigo", "default": "00"},
-    {"tag": "pisCofinsBaseCalculoPercentualReducao", "default": "00000"},
-    {"tag": "pisCofinsBaseCalculoValor", "default": "000000000000000"},
-    {"tag": "pisCofinsFundamentoLegalReducaoCodigo", "default": "00"},
-    {"tag": "pisCofinsRegimeTributacaoCodigo", "default": "1"},
-    {"tag": "pisCofinsRegimeTributacaoNome", "default": "RECOLHIMENTO INTEGRAL"},
-    {"tag": "pisPasepAliquotaAdValorem", "default": "00000"},
-    {"tag": "pisPasepAliquotaEspecificaQuantidadeUnidade", "default": "000000000"},
-    {"tag": "pisPasepAliquotaEspecificaValor", "default": "0000000000"},
-    {"tag": "pisPasepAliquotaReduzida", "default": "00000"},
-    {"tag": "pisPasepAliquotaValorDevido", "default": "000000000000000"},
-    {"tag": "pisPasepAliquotaValorRecolher", "default": "000000000000000"},
-    {"tag": "icmsBaseCalculoValor", "default": "000000000000000"},
-    {"tag": "icmsBaseCalculoAliquota", "default": "00000"},
-    {"tag": "icmsBaseCalculoValorImposto", "default": "00000000000000"},
-    {"tag": "icmsBaseCalculoValorDiferido", "default": "00000000000000"},
-    {"tag": "cbsIbsCst", "default": "000"},
-    {"tag": "cbsIbsClasstrib", "default": "000001"},
-    {"tag": "cbsBaseCalculoValor", "default": "000000000000000"},
-    {"tag": "cbsBaseCalculoAliquota", "default": "00000"},
-    {"tag": "cbsBaseCalculoAliquotaReducao", "default": "00000"},
-    {"tag": "cbsBaseCalculoValorImposto", "default": "00000000000000"},
-    {"tag": "ibsBaseCalculoValor", "default": "000000000000000"},
-    {"tag": "ibsBaseCalculoAliquota", "default": "00000"},
-    {"tag": "ibsBaseCalculoAliquotaReducao", "default": "00000"},
-    {"tag": "ibsBaseCalculoValorImposto", "default": "00000000000000"},
-    {"tag": "relacaoCompradorVendedor", "default": "Fabricante é desconhecido"},
-    {"tag": "seguroMoedaNegociadaCodigo", "default": "220"},
-    {"tag": "seguroMoedaNegociadaNome", "default": "DOLAR DOS EUA"},
-    {"tag": "seguroValorMoedaNegociada", "default": "000000000000000"},
-    {"tag": "seguroValorReais", "default": "000000000000000"},
-    {"tag": "sequencialRetificacao", "default": "00"},
-    {"tag": "valorMultaARecolher", "default": "000000000000000"},
-    {"tag": "valorMultaARecolherAjustado", "default": "000000000000000"},
-    {"tag": "valorReaisFreteInternacional", "default": "000000000000000"},
-    {"tag": "valorReaisSeguroInternacional", "default": "000000000000000"},
-    {"tag": "valorTotalCondicaoVenda", "default": "00000000000"},
-    {"tag": "vinculoCompradorVendedor", "default": "Não há vinculação entre comprador e vendedor."}
-]
-
-FOOTER_TAGS = {
-    "armazem": {"tag": "nomeArmazem", "default": "TCP"},
-    "armazenamentoRecintoAduaneiroCodigo": "9801303",
-    "armazenamentoRecintoAduaneiroNome": "TCP - TERMINAL",
-    "armazenamentoSetor": "002",
-    "canalSelecaoParametrizada": "001",
-    "caracterizacaoOperacaoCodigoTipo": "1",
-    "caracterizacaoOperacaoDescricaoTipo": "Importação Própria",
-    "cargaDataChegada": "20251120",
-    "cargaNumeroAgente": "N/I",
-    "cargaPaisProcedenciaCodigo": "386",
-    "cargaPaisProcedenciaNome": "",
-    "cargaPesoBruto": "000000000000000",
-    "cargaPesoLiquido": "000000000000000",
-    "cargaUrfEntradaCodigo": "0917800",
-    "cargaUrfEntradaNome": "PORTO DE PARANAGUA",
-    "conhecimentoCargaEmbarqueData": "20251025",
-    "conhecimentoCargaEmbarqueLocal": "EXTERIOR",
-    "conhecimentoCargaId": "CE123456",
-    "conhecimentoCargaIdMaster": "CE123456",
-    "conhecimentoCargaTipoCodigo": "12",
-    "conhecimentoCargaTipoNome": "HBL - House Bill of Lading",
-    "conhecimentoCargaUtilizacao": "1",
-    "conhecimentoCargaUtilizacaoNome": "Total",
-    "dataDesembaraco": "20251124",
-    "dataRegistro": "20251124",
-    "documentoChegadaCargaCodigoTipo": "1",
-    "documentoChegadaCargaNome": "Manifesto da Carga",
-    "documentoChegadaCargaNumero": "1625502058594",
-    "embalagem": [
-        {"tag": "codigoTipoEmbalagem", "default": "60"},
-        {"tag": "nomeEmbalagem", "default": "PALLETS"},
-        {"tag": "quantidadeVolume", "default": "00001"}
-    ],
-    "freteCollect": "000000000000000",
-    "freteEmTerritorioNacional": "000000000000000",
-    "freteMoedaNegociadaCodigo": "978",
-    "freteMoedaNegociadaNome": "EURO/COM.EUROPEIA",
-    "fretePrepaid": "000000000000000",
-    "freteTotalDolares": "000000000000000",
-    "freteTotalMoeda": "000000000000000",
-    "freteTotalReais": "000000000000000",
-    "icms": [
-        {"tag": "agenciaIcms", "default": "00000"},
-        {"tag": "codigoTipoRecolhimentoIcms", "default": "3"},
-        {"tag": "nomeTipoRecolhimentoIcms", "default": "Exoneração do ICMS"},
-        {"tag": "numeroSequencialIcms", "default": "001"},
-        {"tag": "ufIcms", "default": "PR"},
-        {"tag": "valorTotalIcms", "default": "000000000000000"}
-    ],
-    "importadorCodigoTipo": "1",
-    "importadorCpfRepresentanteLegal": "00000000000",
-    "importadorEnderecoBairro": "CENTRO",
-    "importadorEnderecoCep": "00000000",
-    "importadorEnderecoComplemento": "",
-    "importadorEnderecoLogradouro": "RUA PRINCIPAL",
-    "importadorEnderecoMunicipio": "CIDADE",
-    "importadorEnderecoNumero": "00",
-    "importadorEnderecoUf": "PR",
-    "importadorNome": "",
-    "importadorNomeRepresentanteLegal": "REPRESENTANTE",
-    "importadorNumero": "",
-    "importadorNumeroTelefone": "0000000000",
-    "informacaoComplementar": "Informações extraídas do Sigraweb.",
-    "localDescargaTotalDolares": "000000000000000",
-    "localDescargaTotalReais": "000000000000000",
-    "localEmbarqueTotalDolares": "000000000000000",
-    "localEmbarqueTotalReais": "000000000000000",
-    "modalidadeDespachoCodigo": "1",
-    "modalidadeDespachoNome": "Normal",
-    "numeroDUIMP": "",
-    "operacaoFundap": "N",
-    "pagamento": [],
-    "seguroMoedaNegociadaCodigo": "220",
-    "seguroMoedaNegociadaNome": "DOLAR DOS EUA",
-    "seguroTotalDolares": "000000000000000",
-    "seguroTotalMoedaNegociada": "000000000000000",
-    "seguroTotalReais": "000000000000000",
-    "sequencialRetificacao": "00",
-    "situacaoEntregaCarga": "ENTREGA CONDICIONADA",
-    "tipoDeclaracaoCodigo": "01",
-    "tipoDeclaracaoNome": "CONSUMO",
-    "totalAdicoes": "000",
-    "urfDespachoCodigo": "0917800",
-    "urfDespachoNome": "PORTO DE PARANAGUA",
-    "valorTotalMultaARecolherAjustado": "000000000000000",
-    "viaTransporteCodigo": "01",
-    "viaTransporteMultimodal": "N",
-    "viaTransporteNome": "MARÍTIMA",
-    "viaTransporteNomeTransportador": "MAERSK A/S",
-    "viaTransporteNomeVeiculo": "MAERSK",
-    "viaTransportePaisTransportadorCodigo": "741",
-    "viaTransportePaisTransportadorNome": "CINGAPURA"
-}
+def leitura_interrompida(kind, uploaded) -> bool:
+    """
+    True se `uploaded` é o mesmo arquivo (nome e conteúdo) da última leitura
+    cancelada ou com erro deste tipo: ele só é lido de novo pelo botão "Ler
+    novamente". Outro arquivo no uploader apaga o registro.
+    """
+    interrompidas = st.session_state["leituras_interrompidas"]
+    if kind not in interrompidas:
+        return False
+    nome, digest = interrompidas[kind]
+    if uploaded.name == nome and upload_digest(uploaded) == digest:
+        return True
+    del interrompidas[kind]
+    return False
+
+
+def _leituras_interrompidas_panel():
+    interrompidas = st.session_state["leituras_interrompidas"]
+    for kind, (nome, _) in list(interrompidas.items()):
+        col_msg, col_btn = st.columns([4, 1])
+        col_msg.caption(f"A leitura do {PARSE_JOB_KINDS[kind][0]} ({nome}) foi interrompida e não será "
+                        f"refeita sozinha. Envie outro arquivo ou leia novamente.")
+        if col_btn.button("🔁 Ler novamente", key=f"retry_{kind}"):
+            del interrompidas[kind]
+            st.rerun()
 
 
-class DataFormatter:
-    @staticmethod
-    def clean_text(text):
-        if not text:
-            return ""
-        text = text.replace('\n', ' ').replace('\r', '')
-        return re.sub(r'\s+', ' ', text).strip()
-
-    @staticmethod
-    def format_number(value, length=15):
-        if not value:
-            return "0" * length
-        clean = re.sub(r'\D', '', str(value))
-        if not clean:
-            return "0" * length
-        return clean.zfill(length)
-
-    @staticmethod
-    def format_ncm(value):
-        if not value:
-            return "00000000"
-        return re.sub(r'\D', '', value)[:8]
-
-    @staticmethod
-    def format_input_fiscal(value, length=15, is_percent=False):
-        try:
-            if isinstance(value, str):
-                value = value.replace('.', '')
-                value = value.replace(',', '.')
-            val_float = float(value)
-            val_int = int(round(val_float * 100))
-            return str(val_int).zfill(length)
-        except:
-            return "0" * length
-
-    @staticmethod
-    def format_high_precision(value, length=15):
-        try:
-            if isinstance(value, str):
-                value = value.replace('.', '')
-                value = value.replace(',', '.')
-            val_float = float(value)
-            val_int = int(round(val_float * 10000000))
-            return str(val_int).zfill(length)
-        except:
-            return "0" * length
-
-    @staticmethod
-    def format_quantity(value, length=14):
-        try:
-            if isinstance(value, str):
-                value = value.replace('.', '')
-                value = value.replace(',', '.')
-            val_float = float(value)
-            val_int = int(round(val_float * 100000))
-            return str(val_int).zfill(length)
-        except:
-            return "0" * length
-
-    @staticmethod
-    def calculate_cbs_ibs(base_xml_string):
-        try:
-            base_int = int(base_xml_string)
-            base_float = base_int / 100.0
-            cbs_val = base_float * 0.009
-            cbs_str = str(int(round(cbs_val * 100))).zfill(14)
-            ibs_val = base_float * 0.001
-            ibs_str = str(int(round(ibs_val * 100))).zfill(14)
-            return cbs_str, ibs_str
-        except:
-            return "0".zfill(14), "0".zfill(14)
-
-    @staticmethod
-    def parse_supplier_info(raw_name, raw_addr):
-        data = {
-            "fornecedorNome": "",
-            "fornecedorLogradouro": "",
-            "fornecedorNumero": "S/N",
-            "fornecedorCidade": ""
-        }
-        if raw_name:
-            parts = raw_name.split('-', 1)
-            data["fornecedorNome"] = parts[-1].strip() if len(parts) > 1 else raw_name.strip()
-        if raw_addr:
-            clean_addr = DataFormatter.clean_text(raw_addr)
-            parts_dash = clean_addr.rsplit('-', 1)
-            if len(parts_dash) > 1:
-                data["fornecedorCidade"] = parts_dash[1].strip()
-                street_part = parts_dash[0].strip()
-            else:
-                data["fornecedorCidade"] = "EXTERIOR"
-                street_part = clean_addr
-            comma_split = street_part.rsplit(',', 1)
-            if len(comma_split) > 1:
-                data["fornecedorLogradouro"] = comma_split[0].strip()
-                num_match = re.search(r'\d+', comma_split[1])
-                if num_match:
-                    data["fornecedorNumero"] = num_match.group(0)
+def _parse_jobs_panel(job_ids: Dict[str, str]):
+    """Barras de andamento dos jobs em execução, com botão de cancelar."""
+    queue = get_parse_job_queue()
+    jobs  = [job for job in (queue.get(job_id) for job_id in job_ids.values()) if job is not None]
+    if not any(job.running for job in jobs):
+        st.rerun()
+    for col, job in zip(st.columns(len(jobs)), jobs):
+        with col:
+            if not job.running:
+                st.progress(1.0, text=f"{job.label}: leitura concluída.")
+                continue
+            if job.total:
+                texto = f"{job.label}: página {job.done} de {job.total} ({job.filename})"
             else:
-                data["fornecedorLogradouro"] = street_part
-        return data
-
+                texto = f"{job.label}: aguardando {job.filename}..."
+            st.progress(job.fraction, text=texto)
+            if job.shared:
+                st.caption("O mesmo arquivo já estava em leitura em outra sessão; o resultado é compartilhado.")
+            if st.button("✖️ Cancelar leitura", key=f"cancel_{job.id}"):
+                queue.cancel(job.id)
+
+
+# ------------------------------------------------------------------------------
+# Diagnóstico: tempo, CPU e memória por etapa da última execução
+# ------------------------------------------------------------------------------
+DIAGNOSTICO_COLUNAS = {
+    "etapa":        "Etapa",
+    "segundos":     "Tempo (s)",
+    "cpu_segundos": "CPU (s)",
+    "rss_mb":       "RSS (MB)",
+    "rss_delta_mb": "Δ RSS (MB)",
+}
 
-class XMLBuilder:
-    def __init__(self, parser, edited_items=None):
-        self.p = parser
-        self.items_to_use = edited_items if edited_items else self.p.items
-        self.root = etree.Element("ListaDeclaracoes")
-        self.duimp = etree.SubElement(self.root, "duimp")
 
-    def build(self, user_inputs=None):
-        h = self.p.header
-        duimp_fmt = h.get("numeroDUIMP", "").split("/")[0].replace("-", "").replace(".", "")
+def guardar_diagnostico(execucao: RunProfile):
+    st.session_state["diagnostico"][execucao.nome] = execucao
 
-        totals = {"frete": 0.0, "seguro": 0.0, "ii": 0.0, "ipi": 0.0, "pis": 0.0, "cofins": 0.0}
 
-        def get_float(val):
-            try:
-                if isinstance(val, str):
-                    val = val.replace('.', '').replace(',', '.')
-                return float(val)
-            except:
-                return 0.0
-
-        for it in self.items_to_use:
-            totals["frete"]  += get_float(it.get("Frete (R$)"))
-            totals["seguro"] += get_float(it.get("Seguro (R$)"))
-            totals["ii"]     += get_float(it.get("II (R$)"))
-            totals["ipi"]    += get_float(it.get("IPI (R$)"))
-            totals["pis"]    += get_float(it.get("PIS (R$)"))
-            totals["cofins"] += get_float(it.get("COFINS (R$)"))
-
-        for it in self.items_to_use:
-            adicao = etree.SubElement(self.duimp, "adicao")
-
-            input_number  = str(it.get("NUMBER", "")).strip()
-            original_desc = DataFormatter.clean_text(it.get("descricao", ""))
-            desc_compl    = DataFormatter.clean_text(it.get("desc_complementar", ""))
-            final_desc    = montar_descricao_final(desc_compl, input_number, original_desc)
-
-            val_total_venda_fmt = DataFormatter.format_high_precision(it.get("valorTotal", "0"), 11)
-            val_unit_fmt        = DataFormatter.format_high_precision(it.get("valorUnit", "0"), 20)
-
-            qtd_comercial_raw = it.get("quantidade_comercial")
-            if not qtd_comercial_raw:
-                qtd_comercial_raw = it.get("quantidade")
-            qtd_comercial_fmt  = DataFormatter.format_quantity(qtd_comercial_raw, 14)
-            qtd_estatistica_fmt = DataFormatter.format_quantity(it.get("quantidade"), 14)
-
-            peso_liq_fmt          = DataFormatter.format_quantity(it.get("pesoLiq"), 15)
-            base_total_reais_fmt  = DataFormatter.format_input_fiscal(it.get("valorTotal", "0"), 15)
-
-            raw_frete     = get_float(it.get("Frete (R$)", 0))
-            raw_seguro    = get_float(it.get("Seguro (R$)", 0))
-            raw_aduaneiro = get_float(it.get("Aduaneiro (R$)", 0))
-
-            frete_fmt     = DataFormatter.format_input_fiscal(raw_frete)
-            seguro_fmt    = DataFormatter.format_input_fiscal(raw_seguro)
-            aduaneiro_fmt = DataFormatter.format_input_fiscal(raw_aduaneiro)
-
-            ii_base_fmt = DataFormatter.format_input_fiscal(it.get("II Base (R$)", 0))
-            ii_aliq_fmt = DataFormatter.format_input_fiscal(it.get("II Alíq. (%)", 0), 5, True)
-            ii_val_fmt  = DataFormatter.format_input_fiscal(get_float(it.get("II (R$)", 0)))
-
-            ipi_aliq_fmt = DataFormatter.format_input_fiscal(it.get("IPI Alíq. (%)", 0), 5, True)
-            ipi_val_fmt  = DataFormatter.format_input_fiscal(get_float(it.get("IPI (R$)", 0)))
-
-            pis_base_fmt = DataFormatter.format_input_fiscal(it.get("PIS Base (R$)", 0))
-            pis_aliq_fmt = DataFormatter.format_input_fiscal(it.get("PIS Alíq. (%)", 0), 5, True)
-            pis_val_fmt  = DataFormatter.format_input_fiscal(get_float(it.get("PIS (R$)", 0)))
-
-            cofins_aliq_fmt = DataFormatter.format_input_fiscal(it.get("COFINS Alíq. (%)", 0), 5, True)
-            cofins_val_fmt  = DataFormatter.format_input_fiscal(get_float(it.get("COFINS (R$)", 0)))
-
-            icms_base_valor = ii_base_fmt if int(ii_base_fmt) > 0 else base_total_reais_fmt
-            cbs_imposto, ibs_imposto = DataFormatter.calculate_cbs_ibs(icms_base_valor)
-
-            supplier_data = DataFormatter.parse_supplier_info(
-                it.get("fornecedor_raw"), it.get("endereco_raw")
+def _diagnostico_panel():
+    """Etapas da última leitura, vinculação e geração do XML (engine.instrumentation)."""
+    execucoes = st.session_state["diagnostico"]
+    if not execucoes:
+        return
+    with st.expander("🩺 Diagnóstico", expanded=False):
+        memoria = get_memory_budget().summary()
+        st.caption(
+            f"Servidor: {memoria['rss_mb']:,.0f} MB de {memoria['orcamento_mb']:,} MB · "
+            f"{memoria['sessoes']} sessão(ões), {memoria['sessoes_disco']} em disco · "
+            f"estado em memória: {memoria['estado_mb']:,.1f} MB, "
+            f"leituras compartilhadas: {memoria['compartilhado_mb']:,.1f} MB"
+        )
+        for execucao in execucoes.values():
+            total = execucao.total
+            st.markdown(
+                f"**{execucao.nome}** — {datetime.fromtimestamp(execucao.inicio):%H:%M:%S}, "
+                f"{total.get('segundos', 0):.2f} s" + (f" (erro: {total['erro']})" if "erro" in total else "")
             )
+            df = pd.DataFrame(execucao.etapas)
+            outras = [c for c in df.columns if c not in DIAGNOSTICO_COLUNAS]
+            df = df[list(DIAGNOSTICO_COLUNAS) + outras].rename(columns=DIAGNOSTICO_COLUNAS)
+            st.dataframe(df, hide_index=True, use_container_width=True)
+
+
+def _lote_duimp_tab():
+    """Aba de processamento em lote (várias declarações → um ZIP)."""
+    st.subheader("Processamento em Lote (várias DUIMPs)")
+    st.caption(
+        "Carregue os Extratos DUIMP e os relatórios Sigraweb do período. Os arquivos são "
+        "pareados pelo número da DUIMP/DI e cada declaração gera seu XML com os valores "
+        "padrão do Sigraweb (os mesmos da aba Exportar XML, sem edição manual)."
+    )
+    c1, c2 = st.columns(2)
+    with c1:
+        arquivos_duimp = st.file_uploader("Extratos DUIMP (.pdf)", type="pdf",
+                                          accept_multiple_files=True, key="lote_duimp")
+    with c2:
+        arquivos_sgw = st.file_uploader("Relatórios Sigraweb (.pdf)", type="pdf",
+                                        accept_multiple_files=True, key="lote_sgw")
+
+    if st.button("📦 Processar lote", type="primary", disabled=not (arquivos_duimp and arquivos_sgw)):
+        try:
+            with st.spinner("Processando lote..."), \
+                 StreamlitProgress("Declarações processadas", "declarações") as andamento:
+                zip_file, relatorio = processar_lote(
+                    arquivos_duimp, arquivos_sgw, andamento, pool=get_worker_pool(), session=sessao_id()
+                )
+            with zip_file:
+                st.session_state["lote_zip"] = zip_file.read()
+            st.session_state["lote_relatorio"] = relatorio
+        except Exception as e:
+            st.error(f"Erro no processamento do lote: {e}")
+            st.code(traceback.format_exc())
+
+    relatorio = st.session_state.get("lote_relatorio")
+    if relatorio:
+        df_rel = pd.DataFrame(relatorio)
+        ok = int((df_rel["status"] == "ok").sum())
+        st.metric("XMLs gerados", f"{ok} de {len(df_rel)} linhas do relatório")
+        st.dataframe(df_rel, use_container_width=True, hide_index=True)
+        st.download_button(
+            label="⬇️ Baixar ZIP",
+            data=st.session_state["lote_zip"],
+            file_name=f"DUIMPs_INTEGRADO_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+            mime="application/zip",
+        )
 
-            extracted_map = {
-                "numeroAdicao": str(it["numeroAdicao"])[-3:],
-                "numeroDUIMP": duimp_fmt,
-                "dadosMercadoriaCodigoNcm": DataFormatter.format_ncm(it.get("ncm")),
-                "dadosMercadoriaMedidaEstatisticaQuantidade": qtd_estatistica_fmt,
-                "dadosMercadoriaMedidaEstatisticaUnidade": it.get("unidade", "").upper(),
-                "dadosMercadoriaPesoLiquido": peso_liq_fmt,
-                "condicaoVendaMoedaNome": it.get("moeda", "").upper(),
-                "valorTotalCondicaoVenda": val_total_venda_fmt,
-                "valorUnitario": val_unit_fmt,
-                "condicaoVendaValorMoeda": base_total_reais_fmt,
-                "condicaoVendaValorReais": aduaneiro_fmt if int(aduaneiro_fmt) > 0 else base_total_reais_fmt,
-                "paisOrigemMercadoriaNome": it.get("paisOrigem", "").upper(),
-                "paisAquisicaoMercadoriaNome": it.get("paisOrigem", "").upper(),
-                "descricaoMercadoria": final_desc,
-                "quantidade": qtd_comercial_fmt,
-                "unidadeMedida": it.get("unidade", "").upper(),
-                "dadosCargaUrfEntradaCodigo": h.get("urf", "0917800"),
-                "fornecedorNome": supplier_data["fornecedorNome"][:60],
-                "fornecedorLogradouro": supplier_data["fornecedorLogradouro"][:60],
-                "fornecedorNumero": supplier_data["fornecedorNumero"][:10],
-                "fornecedorCidade": supplier_data["fornecedorCidade"][:30],
-                "freteValorReais": frete_fmt,
-                "seguroValorReais": seguro_fmt,
-                "iiBaseCalculo": ii_base_fmt,
-                "iiAliquotaAdValorem": ii_aliq_fmt,
-                "iiAliquotaValorCalculado": ii_val_fmt,
-                "iiAliquotaValorDevido": ii_val_fmt,
-                "iiAliquotaValorRecolher": ii_val_fmt,
-                "ipiAliquotaAdValorem": ipi_aliq_fmt,
-                "ipiAliquotaValorDevido": ipi_val_fmt,
-                "ipiAliquotaValorRecolher": ipi_val_fmt,
-                "pisCofinsBaseCalculoValor": pis_base_fmt,
-                "pisPasepAliquotaAdValorem": pis_aliq_fmt,
-                "pisPasepAliquotaValorDevido": pis_val_fmt,
-                "pisPasepAliquotaValorRecolher": pis_val_fmt,
-                "cofinsAliquotaAdValorem": cofins_aliq_fmt,
-                "cofinsAliquotaValorDevido": cofins_val_fmt,
-                "cofinsAliquotaValorRecolher": cofins_val_fmt,
-                "icmsBaseCalculoValor": icms_base_valor,
-                "icmsBaseCalculoAliquota": "01800",
-                "cbsIbsClasstrib": "000001",
-                "cbsBaseCalculoValor": icms_base_valor,
-                "cbsBaseCalculoAliquota": "00090",
-                "cbsBaseCalculoValorImposto": cbs_imposto,
-                "ibsBaseCalculoValor": icms_base_valor,
-                "ibsBaseCalculoAliquota": "00010",
-                "ibsBaseCalculoValorImposto": ibs_imposto
-            }
-
-            for field in ADICAO_FIELDS_ORDER:
-                tag_name = field["tag"]
-                if field.get("type") == "complex":
-                    parent = etree.SubElement(adicao, tag_name)
-                    for child in field["children"]:
-                        c_tag = child["tag"]
-                        val = extracted_map.get(c_tag, child["default"])
-                        etree.SubElement(parent, c_tag).text = val
-                else:
-                    val = extracted_map.get(tag_name, field["default"])
-                    etree.SubElement(adicao, tag_name).text = val
-
-        peso_bruto_fmt     = DataFormatter.format_quantity(h.get("pesoBruto"), 15)
-        peso_liq_total_fmt = DataFormatter.format_quantity(h.get("pesoLiquido"), 15)
-
-        footer_map = {
-            "numeroDUIMP": duimp_fmt,
-            "importadorNome": h.get("nomeImportador", ""),
-            "importadorNumero": DataFormatter.format_number(h.get("cnpj"), 14),
-            "cargaPesoBruto": peso_bruto_fmt,
-            "cargaPesoLiquido": peso_liq_total_fmt,
-            "cargaPaisProcedenciaNome": h.get("paisProcedencia", "").upper(),
-            "totalAdicoes": str(len(self.items_to_use)).zfill(3),
-            "freteTotalReais": DataFormatter.format_input_fiscal(totals["frete"]),
-            "seguroTotalReais": DataFormatter.format_input_fiscal(totals["seguro"]),
-        }
-
-        if user_inputs:
-            footer_map["cargaDataChegada"]               = user_inputs.get("cargaDataChegada", "20251120")
-            footer_map["dataDesembaraco"]                = user_inputs.get("dataDesembaraco", "20251124")
-            footer_map["dataRegistro"]                   = user_inputs.get("dataRegistro", "20251124")
-            footer_map["conhecimentoCargaEmbarqueData"]  = user_inputs.get("conhecimentoCargaEmbarqueData", "20251025")
-            footer_map["cargaPesoBruto"]                 = user_inputs.get("cargaPesoBruto", peso_bruto_fmt)
-            footer_map["cargaPesoLiquido"]               = user_inputs.get("cargaPesoLiquido", peso_liq_total_fmt)
-            footer_map["localDescargaTotalDolares"]      = user_inputs.get("localDescargaTotalDolares", "000000000000000")
-            footer_map["localDescargaTotalReais"]        = user_inputs.get("localDescargaTotalReais", "000000000000000")
-            footer_map["localEmbarqueTotalDolares"]      = user_inputs.get("localEmbarqueTotalDolares", "000000000000000")
-            footer_map["localEmbarqueTotalReais"]        = user_inputs.get("localEmbarqueTotalReais", "000000000000000")
-
-        receita_codes = [
-            {"code": "0086", "val": totals["ii"]},
-            {"code": "1038", "val": totals["ipi"]},
-            {"code": "5602", "val": totals["pis"]},
-            {"code": "5629", "val": totals["cofins"]}
-        ]
-        if user_inputs and user_inputs.get("valorReceita7811", "0") != "0":
-            receita_codes.append({"code": "7811", "val": float(user_inputs.get("valorReceita7811"))})
-
-        for tag, default_val in FOOTER_TAGS.items():
-            if tag == "embalagem" and user_inputs:
-                parent = etree.SubElement(self.duimp, tag)
-                for subfield in default_val:
-                    val_to_use = subfield["default"]
-                    if subfield["tag"] == "quantidadeVolume":
-                        val_to_use = user_inputs.get("quantidadeVolume", val_to_use)
-                    etree.SubElement(parent, subfield["tag"]).text = val_to_use
-                continue
-
-            if tag == "pagamento":
-                agencia = "3715"
-                banco   = "341"
-                if user_inputs:
-                    agencia = user_inputs.get("agenciaPagamento", "3715")
-                    banco   = user_inputs.get("bancoPagamento", "341")
-                for rec in receita_codes:
-                    if rec["val"] > 0:
-                        pag = etree.SubElement(self.duimp, "pagamento")
-                        etree.SubElement(pag, "agenciaPagamento").text = agencia
-                        etree.SubElement(pag, "bancoPagamento").text = banco
-                        etree.SubElement(pag, "codigoReceita").text = rec["code"]
-                        if rec["code"] == "7811" and user_inputs:
-                            etree.SubElement(pag, "valorReceita").text = user_inputs.get("valorReceita7811").zfill(15)
-                        else:
-                            etree.SubElement(pag, "valorReceita").text = DataFormatter.format_input_fiscal(rec["val"])
-                continue
-
-            if tag in footer_map:
-                val = footer_map[tag]
-                etree.SubElement(self.duimp, tag).text = val
-                continue
-
-            if user_inputs and tag in user_inputs:
-                etree.SubElement(self.duimp, tag).text = user_inputs[tag]
-                continue
-
-            if isinstance(default_val, list):
-                parent = etree.SubElement(self.duimp, tag)
-                for subfield in default_val:
-                    etree.SubElement(parent, subfield["tag"]).text = subfield["default"]
-            elif isinstance(default_val, dict):
-                parent = etree.SubElement(self.duimp, tag)
-                etree.SubElement(parent, default_val["tag"]).text = default_val["default"]
-            else:
-                val = footer_map.get(tag, default_val)
-                etree.SubElement(self.duimp, tag).text = val
 
-        xml_content = etree.tostring(self.root, pretty_print=True, encoding="UTF-8", xml_declaration=False)
-        header_bytes = b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
-        return header_bytes + xml_content
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+if _fragment is not None:
+    _parse_jobs_panel_live = _fragment(run_every=1.0)(_parse_jobs_panel)
+else:
+    _parse_jobs_panel_live = None
 
 
-# ==============================================================================
-# PARTE 6: SISTEMA INTEGRADO DUIMP (COM SIGRAWEB NO LUGAR DO APP2)
-# ==============================================================================
 def sistema_integrado_duimp():
+    leituras = leituras_da_sessao()
     st.markdown(
         '<div class="main-header">Sistema Integrado DUIMP 2026 (Versão Final Restaurada)</div>',
         unsafe_allow_html=True
     )
 
-    tab1, tab2, tab3 = st.tabs(["📂 Upload e Vinculação", "📋 Conferência Detalhada", "💾 Exportar XML"])
+    tab1, tab2, tab3, tab4 = st.tabs([
+        "📂 Upload e Vinculação", "📋 Conferência Detalhada", "💾 Exportar XML", "📦 Lote (ZIP)"
+    ])
 
     # ==========================================================================
     # TAB 1 — UPLOAD
     # ==========================================================================
     with tab1:
+        if leituras["parsed_duimp"] is None and leituras["parsed_sigraweb"] is None:
+            _retomar_panel(leituras)
+
         col1, col2 = st.columns(2)
 
         with col1:
@@ -1806,53 +839,82 @@ def sistema_integrado_duimp():
             file_sigraweb = st.file_uploader("Arquivo Sigraweb (.pdf)", type="pdf", key="u2")
             st.markdown('</div>', unsafe_allow_html=True)
 
+        # ------------------------------------------------------------------
+        # Leitura dos PDFs — jobs em segundo plano (DUIMP e Sigraweb em paralelo)
+        # ------------------------------------------------------------------
+        job_queue = get_parse_job_queue()
+        job_ids   = st.session_state["parse_jobs"]
+
+        for kind, uploaded, needed in (
+            ("duimp", file_duimp, file_duimp is not None and (
+                leituras["parsed_duimp"] is None or
+                file_duimp.name != leituras["nome_duimp"]
+            )),
+            ("sigraweb", file_sigraweb,
+             file_sigraweb is not None and leituras["parsed_sigraweb"] is None),
+        ):
+            job = job_queue.get(job_ids[kind]) if kind in job_ids else None
+            if job is not None and uploaded is not None and (not needed or job.filename != uploaded.name):
+                # Arquivo trocado durante a leitura. Uploader vazio não descarta o job:
+                # ao voltar de outro módulo ele aparece vazio (para parar, "Cancelar leitura")
+                job_queue.discard(job.id)
+                del job_ids[kind]
+                job = None
+            if needed and kind not in job_ids and not leitura_interrompida(kind, uploaded):
+                job_ids[kind] = job_queue.submit(kind, uploaded, sessao_id())
+
+        parsed = collect_parse_jobs(job_ids)
+
+        if job_ids:
+            if _parse_jobs_panel_live is not None:
+                _parse_jobs_panel_live(job_ids)
+            else:
+                _parse_jobs_panel(job_ids)
+                st.button("🔄 Atualizar andamento", key="refresh_parse_jobs")
+        _leituras_interrompidas_panel()
+
         # ------------------------------------------------------------------
         # Processamento DUIMP (APP 1)
         # ------------------------------------------------------------------
-        if file_duimp:
-            if st.session_state["parsed_duimp"] is None or \
-               file_duimp.name != getattr(st.session_state.get("last_duimp"), "name", ""):
+        if "duimp" in parsed:
+            ok, result, nome = parsed["duimp"]
+            if ok:
                 try:
-                    p = DuimpPDFParser(file_duimp.read())
-                    p.preprocess()
-                    p.extract_header()
-                    p.extract_items()
-                    st.session_state["parsed_duimp"] = p
-                    st.session_state["last_duimp"] = file_duimp
-
-                    df = pd.DataFrame(p.items)
-                    cols_fiscais = [
-                        "NUMBER", "Frete (R$)", "Seguro (R$)",
-                        "II (R$)", "II Base (R$)", "II Alíq. (%)",
-                        "IPI (R$)", "IPI Base (R$)", "IPI Alíq. (%)",
-                        "PIS (R$)", "PIS Base (R$)", "PIS Alíq. (%)",
-                        "COFINS (R$)", "COFINS Base (R$)", "COFINS Alíq. (%)",
-                        "Aduaneiro (R$)"
-                    ]
-                    for col in cols_fiscais:
-                        df[col] = 0.00 if col != "NUMBER" else ""
-                    st.session_state["merged_df"] = df
+                    p = result
+                    leituras["parsed_duimp"] = p
+                    leituras["nome_duimp"] = nome
+
+                    leituras["merged_df"] = montar_grade_duimp(p)
+                    salvar_snapshot(leituras, duimp=True, grade=True)
 
                     st.markdown(
                         f'<div class="success-box">✅ DUIMP Lida com Sucesso! '
                         f'{len(p.items)} adições encontradas.</div>',
                         unsafe_allow_html=True
                     )
+                    if p.slow_items:
+                        st.warning(
+                            f"⚠️ {len(p.slow_items)} item(ns) excederam o tempo de leitura (layout "
+                            f"inesperado); campos não lidos, que vão vazios para o XML: "
+                            + "; ".join(f"item {num}: {', '.join(campos) or 'nenhum'}"
+                                        for num, _, campos in p.slow_items)
+                        )
                 except Exception as e:
                     st.error(f"Erro ao ler DUIMP: {e}")
+            else:
+                st.error(f"Erro ao ler DUIMP: {result}")
 
         # ------------------------------------------------------------------
         # Processamento Sigraweb (APP 2 — NOVO)
         # ------------------------------------------------------------------
-        if file_sigraweb and st.session_state["parsed_sigraweb"] is None:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-                tmp.write(file_sigraweb.getvalue())
-                tmp_path = tmp.name
-
+        if "sigraweb" in parsed:
+            ok, result, _ = parsed["sigraweb"]
             try:
-                parser_sgw = SigrawebPDFParser()
-                doc_sgw = parser_sgw.parse_pdf(tmp_path)
-                st.session_state["parsed_sigraweb"] = doc_sgw
+                if not ok:
+                    raise result
+                doc_sgw = result
+                leituras["parsed_sigraweb"] = doc_sgw
+                salvar_snapshot(leituras, sigraweb=True)
 
                 qtd_itens = len(doc_sgw['itens'])
                 cab = doc_sgw['cabecalho']
@@ -1909,24 +971,27 @@ def sistema_integrado_duimp():
 
             except Exception as e:
                 st.error(f"Erro ao ler Sigraweb: {e}")
-                st.code(traceback.format_exc())
-            finally:
-                if os.path.exists(tmp_path):
-                    try:
-                        os.unlink(tmp_path)
-                    except:
-                        pass
+                st.code("".join(traceback.format_exception(e)))
 
         # Botão para limpar os parsers se necessário
         col_reset1, col_reset2 = st.columns(2)
         with col_reset1:
             if st.button("🔄 Recarregar DUIMP", type="secondary"):
-                st.session_state["parsed_duimp"] = None
-                st.session_state["merged_df"] = None
+                if "duimp" in job_ids:
+                    job_queue.discard(job_ids.pop("duimp"))
+                st.session_state["leituras_interrompidas"].pop("duimp", None)
+                leituras["parsed_duimp"] = None
+                leituras["merged_df"] = None
+                leituras["xml_cache"] = None
+                salvar_snapshot(leituras, duimp=True, grade=True)
                 st.rerun()
         with col_reset2:
             if st.button("🔄 Recarregar Sigraweb", type="secondary"):
-                st.session_state["parsed_sigraweb"] = None
+                if "sigraweb" in job_ids:
+                    job_queue.discard(job_ids.pop("sigraweb"))
+                st.session_state["leituras_interrompidas"].pop("sigraweb", None)
+                leituras["parsed_sigraweb"] = None
+                salvar_snapshot(leituras, sigraweb=True)
                 st.rerun()
 
         st.divider()
@@ -1934,69 +999,23 @@ def sistema_integrado_duimp():
         # ------------------------------------------------------------------
         # Vinculação automática DUIMP x Sigraweb
         # ------------------------------------------------------------------
-        if st.button("🔗 VINCULAR DADOS (Cruzamento Automático)", type="primary", use_container_width=True):
-            if st.session_state["merged_df"] is not None and st.session_state["parsed_sigraweb"] is not None:
+        leituras_prontas = (
+            leituras["merged_df"] is not None and leituras["parsed_sigraweb"] is not None
+        )
+        if not leituras_prontas:
+            st.caption("O botão de vinculação é liberado quando a leitura dos dois arquivos terminar.")
+        if st.button("🔗 VINCULAR DADOS (Cruzamento Automático)", type="primary",
+                     use_container_width=True, disabled=not leituras_prontas):
+            if leituras_prontas:
                 try:
-                    df_dest = st.session_state["merged_df"].copy()
-                    doc_sgw = st.session_state["parsed_sigraweb"]
-
-                    # Monta mapa: numero_item → dados do Sigraweb
-                    src_map: Dict[int, Dict] = {}
-                    for item in doc_sgw['itens']:
-                        try:
-                            idx = int(item['numero_item'])
-                            src_map[idx] = item
-                        except:
-                            pass
-
-                    count = 0
-                    not_found = []
-                    for idx, row in df_dest.iterrows():
-                        try:
-                            raw_num  = str(row['numeroAdicao']).strip()
-                            item_num = int(raw_num)
-
-                            if item_num in src_map:
-                                src = src_map[item_num]
-
-                                # Código interno (Part Number do Sigraweb)
-                                df_dest.at[idx, 'NUMBER']          = src.get('codigo_interno', '')
-
-                                # Frete, Seguro e Valor Aduaneiro em BRL
-                                df_dest.at[idx, 'Frete (R$)']      = src.get('frete_internacional', 0.0)
-                                df_dest.at[idx, 'Seguro (R$)']     = src.get('seguro_internacional', 0.0)
-                                # CORREÇÃO PRINCIPAL: Valor Aduaneiro Real (BRL) do Sigraweb
-                                df_dest.at[idx, 'Aduaneiro (R$)']  = src.get('aduaneiro_reais', src.get('valorAduaneiroReal', 0.0))
-
-                                # II — base = Valor Aduaneiro Real
-                                df_dest.at[idx, 'II (R$)']         = src.get('ii_valor_devido', 0.0)
-                                df_dest.at[idx, 'II Base (R$)']    = src.get('ii_base_calculo',
-                                                                              src.get('aduaneiro_reais',
-                                                                              src.get('valorAduaneiroReal', 0.0)))
-                                df_dest.at[idx, 'II Alíq. (%)']    = src.get('ii_aliquota', 0.0)
-
-                                # IPI
-                                df_dest.at[idx, 'IPI (R$)']        = src.get('ipi_valor_devido', 0.0)
-                                df_dest.at[idx, 'IPI Base (R$)']   = src.get('ipi_base_calculo', 0.0)
-                                df_dest.at[idx, 'IPI Alíq. (%)']   = src.get('ipi_aliquota', 0.0)
-
-                                # PIS
-                                df_dest.at[idx, 'PIS (R$)']        = src.get('pis_valor_devido', 0.0)
-                                df_dest.at[idx, 'PIS Base (R$)']   = src.get('pis_base_calculo', 0.0)
-                                df_dest.at[idx, 'PIS Alíq. (%)']   = src.get('pis_aliquota', 0.0)
-
-                                # COFINS
-                                df_dest.at[idx, 'COFINS (R$)']     = src.get('cofins_valor_devido', 0.0)
-                                df_dest.at[idx, 'COFINS Base (R$)'] = src.get('cofins_base_calculo', 0.0)
-                                df_dest.at[idx, 'COFINS Alíq. (%)'] = src.get('cofins_aliquota', 0.0)
-
-                                count += 1
-                            else:
-                                not_found.append(item_num)
-                        except Exception as e_row:
-                            continue
-
-                    st.session_state["merged_df"] = df_dest
+                    with record_run("Vinculação") as execucao:
+                        df_dest, count, not_found = vincular_dados(
+                            leituras["merged_df"], leituras["parsed_sigraweb"]['itens']
+                        )
+                    guardar_diagnostico(execucao)
+
+                    leituras["merged_df"] = df_dest
+                    salvar_snapshot(leituras, grade=True)
                     st.success(f"✅ Sucesso! **{count}** adições vinculadas.")
 
                     if not_found:
@@ -2030,8 +1049,8 @@ def sistema_integrado_duimp():
     with tab2:
         st.subheader("Conferência e Edição dos Dados Vinculados")
 
-        if st.session_state["parsed_sigraweb"] is not None:
-            doc_sgw = st.session_state["parsed_sigraweb"]
+        if leituras["parsed_sigraweb"] is not None:
+            doc_sgw = leituras["parsed_sigraweb"]
             cab     = doc_sgw['cabecalho']
 
             # Resumo do cabeçalho
@@ -2073,37 +1092,11 @@ def sistema_integrado_duimp():
             with st.expander("📑 Adições Extraídas do Sigraweb", expanded=False):
                 itens_sgw = doc_sgw['itens']
                 if itens_sgw:
-                    df_sgw = pd.DataFrame([{
-                        'Adição':          it['numeroAdicao'],
-                        'Part Number':     it.get('codigo_interno', ''),
-                        'NCM':             it.get('ncm', ''),
-                        'Descrição':       it.get('descricao', '')[:60],
-                        'País Origem':     it.get('paisOrigem', ''),
-                        'Qtd Estat.':      it.get('quantidade', 0),
-                        'Qtd Comerc.':     it.get('quantidade_comercial', 0),
-                        'Unidade':         it.get('unidade', ''),
-                        'Peso Líq.(kg)':   it.get('pesoLiq', 0),
-                        'FOB EUR':         it.get('valorTotal', 0),
-                        'Vlr Adu. USD':    it.get('valorAduaneiroUSD', 0),
-                        'Vlr Adu. BRL':    it.get('aduaneiro_reais', it.get('valorAduaneiroReal', 0)),
-                        'Frete USD':       it.get('freteUSD', 0),
-                        'Frete BRL':       it.get('freteReal', 0),
-                        'Seguro USD':      it.get('seguroUSD', 0),
-                        'Seguro BRL':      it.get('seguroReal', 0),
-                        'II %':            it.get('ii_aliquota', 0),
-                        'II Base R$':      it.get('ii_base_calculo', 0),
-                        'II R$':           it.get('ii_valor_devido', 0),
-                        'IPI %':           it.get('ipi_aliquota', 0),
-                        'IPI Base R$':     it.get('ipi_base_calculo', 0),
-                        'IPI R$':          it.get('ipi_valor_devido', 0),
-                        'PIS %':           it.get('pis_aliquota', 0),
-                        'PIS Base R$':     it.get('pis_base_calculo', 0),
-                        'PIS R$':          it.get('pis_valor_devido', 0),
-                        'COFINS %':        it.get('cofins_aliquota', 0),
-                        'COFINS Base R$':  it.get('cofins_base_calculo', 0),
-                        'COFINS R$':       it.get('cofins_valor_devido', 0),
-                        'Total Impostos':  it.get('total_impostos', 0),
-                    } for it in itens_sgw])
+                    df_sgw = itens_para_dataframe(
+                        itens_sgw, columns=SIGRAWEB_TABELA_COLUNAS.values(),
+                        rename={campo: rotulo for rotulo, campo in SIGRAWEB_TABELA_COLUNAS.items()},
+                    )
+                    df_sgw['Descrição'] = df_sgw['Descrição'].str[:60]
                     st.dataframe(df_sgw, use_container_width=True, height=400)
 
                     # Totais da tabela de adições
@@ -2118,7 +1111,7 @@ def sistema_integrado_duimp():
                 else:
                     st.info("Nenhum item extraído do Sigraweb.")
 
-        if st.session_state["merged_df"] is not None:
+        if leituras["merged_df"] is not None:
             st.subheader("Grade de Edição — Dados DUIMP + Sigraweb Vinculados")
 
             col_config = {
@@ -2126,11 +1119,11 @@ def sistema_integrado_duimp():
                 "NUMBER": st.column_config.TextColumn("Part Number (Sigraweb)", width="medium"),
                 "ncm": st.column_config.TextColumn("NCM", width="small", disabled=True),
                 "descricao": st.column_config.TextColumn("Descrição", width="large", disabled=True),
-                "quantidade": st.column_config.TextColumn("Qtd Estat.", disabled=True),
-                "quantidade_comercial": st.column_config.TextColumn("Qtd Comerc.", disabled=True),
+                "quantidade": st.column_config.NumberColumn("Qtd Estat.", format="%.5f", disabled=True),
+                "quantidade_comercial": st.column_config.NumberColumn("Qtd Comerc.", format="%.5f", disabled=True),
                 "unidade": st.column_config.TextColumn("Unidade", disabled=True),
-                "pesoLiq": st.column_config.TextColumn("Peso Líq.", disabled=True),
-                "valorTotal": st.column_config.TextColumn("FOB EUR", disabled=True),
+                "pesoLiq": st.column_config.NumberColumn("Peso Líq.", format="%.5f", disabled=True),
+                "valorTotal": st.column_config.NumberColumn("FOB EUR", format="%.2f", disabled=True),
                 "Frete (R$)":  st.column_config.NumberColumn(format="R$ %.2f"),
                 "Seguro (R$)": st.column_config.NumberColumn(format="R$ %.2f"),
                 "Aduaneiro (R$)": st.column_config.NumberColumn(format="R$ %.2f"),
@@ -2149,35 +1142,31 @@ def sistema_integrado_duimp():
             }
 
             edited_df = st.data_editor(
-                st.session_state["merged_df"],
+                leituras["merged_df"],
                 hide_index=True,
                 column_config=col_config,
                 use_container_width=True,
                 height=600
             )
 
-            # Recalcular valores de impostos automaticamente quando base/alíquota mudam
-            taxes = ['II', 'IPI', 'PIS', 'COFINS']
-            for tax in taxes:
-                base_col = f"{tax} Base (R$)"
-                aliq_col = f"{tax} Alíq. (%)"
-                val_col  = f"{tax} (R$)"
-                if base_col in edited_df.columns and aliq_col in edited_df.columns:
-                    edited_df[base_col] = pd.to_numeric(edited_df[base_col], errors='coerce').fillna(0.0)
-                    edited_df[aliq_col] = pd.to_numeric(edited_df[aliq_col], errors='coerce').fillna(0.0)
-                    edited_df[val_col]  = edited_df[base_col] * (edited_df[aliq_col] / 100.0)
-
-            st.session_state["merged_df"] = edited_df
+            # Recalcula o valor do tributo (base × alíquota) só nas linhas editadas
+            # desde a última execução; os totais são corrigidos pela diferença
+            if leituras["grade_conferencia"] is None:
+                leituras["grade_conferencia"] = GradeConferencia()
+            grade = leituras["grade_conferencia"]
+            edited_df = grade.atualizar(edited_df, leituras["merged_df"])
+            leituras["merged_df"] = edited_df
+            salvar_snapshot(leituras, grade=True)   # só as linhas alteradas vão para o disco
 
             # Totais rápidos
             st.subheader("📊 Totais da Grade")
             t1, t2, t3, t4, t5, t6 = st.columns(6)
-            t1.metric("II Total",     f"R$ {pd.to_numeric(edited_df['II (R$)'], errors='coerce').sum():,.2f}")
-            t2.metric("IPI Total",    f"R$ {pd.to_numeric(edited_df['IPI (R$)'], errors='coerce').sum():,.2f}")
-            t3.metric("PIS Total",    f"R$ {pd.to_numeric(edited_df['PIS (R$)'], errors='coerce').sum():,.2f}")
-            t4.metric("COFINS Total", f"R$ {pd.to_numeric(edited_df['COFINS (R$)'], errors='coerce').sum():,.2f}")
-            t5.metric("Frete Total",  f"R$ {pd.to_numeric(edited_df['Frete (R$)'], errors='coerce').sum():,.2f}")
-            t6.metric("Seguro Total", f"R$ {pd.to_numeric(edited_df['Seguro (R$)'], errors='coerce').sum():,.2f}")
+            t1.metric("II Total",     f"R$ {grade.total('II (R$)'):,.2f}")
+            t2.metric("IPI Total",    f"R$ {grade.total('IPI (R$)'):,.2f}")
+            t3.metric("PIS Total",    f"R$ {grade.total('PIS (R$)'):,.2f}")
+            t4.metric("COFINS Total", f"R$ {grade.total('COFINS (R$)'):,.2f}")
+            t5.metric("Frete Total",  f"R$ {grade.total('Frete (R$)'):,.2f}")
+            t6.metric("Seguro Total", f"R$ {grade.total('Seguro (R$)'):,.2f}")
 
         else:
             st.info("Nenhum dado para exibir. Realize o upload e a vinculação na aba 'Upload e Vinculação'.")
@@ -2190,8 +1179,9 @@ def sistema_integrado_duimp():
 
         # Preenche automaticamente com dados do Sigraweb quando disponível
         cab_sgw = {}
-        if st.session_state.get("parsed_sigraweb"):
-            cab_sgw = st.session_state["parsed_sigraweb"].get("cabecalho", {})
+        if leituras["parsed_sigraweb"]:
+            cab_sgw = leituras["parsed_sigraweb"].get("cabecalho", {})
+        padrao = xml_config_padrao(cab_sgw)
 
         st.markdown("### Preenchimento das Tags do XML")
 
@@ -2201,70 +1191,63 @@ def sistema_integrado_duimp():
             st.markdown("**QUANTIDADE**")
             inp_qtd_volume = st.text_input(
                 "Quantidade Volume",
-                value=cab_sgw.get('volumes', '00001').zfill(5) if cab_sgw.get('volumes') else '00001',
+                value=padrao["quantidadeVolume"],
                 help="Preenche <quantidadeVolume>"
             )
 
             st.markdown("**DATAS**")
             inp_dt_chegada = st.text_input(
                 "Data Chegada (YYYYMMDD)",
-                value=cab_sgw.get('dataChegadaISO', '20251120') or '20251120',
+                value=padrao["cargaDataChegada"],
                 help="Preenche <cargaDataChegada>"
             )
             inp_dt_desemb = st.text_input(
                 "Data Desembaraço (YYYYMMDD)",
-                value=cab_sgw.get('dataRegistro', '20251124') or '20251124',
+                value=padrao["dataDesembaraco"],
                 help="Preenche <dataDesembaraco>"
             )
             inp_dt_reg = st.text_input(
                 "Data Registro (YYYYMMDD)",
-                value=cab_sgw.get('dataRegistro', '20251124') or '20251124',
+                value=padrao["dataRegistro"],
                 help="Preenche <dataRegistro>"
             )
             inp_dt_emb = st.text_input(
                 "Data Embarque (YYYYMMDD)",
-                value=cab_sgw.get('dataEmbarqueISO', '20251025') or '20251025',
+                value=padrao["conhecimentoCargaEmbarqueData"],
                 help="Preenche <conhecimentoCargaEmbarqueData>"
             )
 
         with c2:
             st.markdown("**PESO (KG) — formato XML**")
-            peso_bruto_default = DataFormatter.format_quantity(
-                cab_sgw.get('pesoBruto', '0'), 15
-            ) if cab_sgw.get('pesoBruto') else '000000000000000'
-            peso_liq_default = DataFormatter.format_quantity(
-                cab_sgw.get('pesoLiquido', '0'), 15
-            ) if cab_sgw.get('pesoLiquido') else '000000000000000'
-
             inp_peso_bruto = st.text_input(
-                "Peso Bruto (formato XML)", value=peso_bruto_default,
+                "Peso Bruto (formato XML)", value=padrao["cargaPesoBruto"],
                 help="Preenche <cargaPesoBruto>"
             )
             inp_peso_liq = st.text_input(
-                "Peso Líquido (formato XML)", value=peso_liq_default,
+                "Peso Líquido (formato XML)", value=padrao["cargaPesoLiquido"],
                 help="Preenche <cargaPesoLiquido>"
             )
 
             st.markdown("**LOCAIS (Reais/Dólares)**")
-            inp_loc_desc_dol = st.text_input("Local Descarga Total Dólares", value="000000000000000")
-            inp_loc_desc_rea = st.text_input("Local Descarga Total Reais",   value="000000000000000")
-            inp_loc_emb_dol  = st.text_input("Local Embarque Total Dólares", value="000000000000000")
-            inp_loc_emb_rea  = st.text_input("Local Embarque Total Reais",   value="000000000000000")
+            inp_loc_desc_dol = st.text_input("Local Descarga Total Dólares", value=padrao["localDescargaTotalDolares"])
+            inp_loc_desc_rea = st.text_input("Local Descarga Total Reais",   value=padrao["localDescargaTotalReais"])
+            inp_loc_emb_dol  = st.text_input("Local Embarque Total Dólares", value=padrao["localEmbarqueTotalDolares"])
+            inp_loc_emb_rea  = st.text_input("Local Embarque Total Reais",   value=padrao["localEmbarqueTotalReais"])
 
         with c3:
             st.markdown("**PAGAMENTO / SISCOMEX**")
             inp_agencia = st.text_input(
                 "Agência Pagamento",
-                value=cab_sgw.get('agencia', '3715') or '3715',
+                value=padrao["agenciaPagamento"],
                 help="Preenche <agenciaPagamento>"
             )
-            inp_banco = st.text_input("Banco Pagamento", value="341", help="Preenche <bancoPagamento>")
+            inp_banco = st.text_input("Banco Pagamento", value=padrao["bancoPagamento"], help="Preenche <bancoPagamento>")
 
             st.markdown("---")
             st.markdown("**SISCOMEX 7811**")
             st.text("Preenche <codigoReceita>7811</codigoReceita>")
             inp_valor_7811 = st.text_input(
-                "Valor Receita 7811", value="000000000000000",
+                "Valor Receita 7811", value=padrao["valorReceita7811"],
                 help="Preenche <valorReceita> para o código 7811"
             )
 
@@ -2272,12 +1255,12 @@ def sistema_integrado_duimp():
             st.markdown("**CONHECIMENTO DE CARGA**")
             inp_idt_conhec = st.text_input(
                 "IDT Conhecimento",
-                value=cab_sgw.get('idtConhecimento', 'CE123456') or 'CE123456',
+                value=padrao["conhecimentoCargaId"],
                 help="Preenche <conhecimentoCargaId>"
             )
             inp_idt_master = st.text_input(
                 "IDT Master",
-                value=cab_sgw.get('idtMaster', 'CE123456') or 'CE123456',
+                value=padrao["conhecimentoCargaIdMaster"],
                 help="Preenche <conhecimentoCargaIdMaster>"
             )
 
@@ -2302,33 +1285,49 @@ def sistema_integrado_duimp():
 
         st.divider()
 
-        if st.session_state["merged_df"] is not None:
+        if leituras["merged_df"] is not None:
             if st.button("⚙️ Gerar XML (Layout 8686)", type="primary", use_container_width=True):
                 try:
-                    p       = st.session_state["parsed_duimp"]
-                    records = st.session_state["merged_df"].to_dict("records")
-
-                    for i, item in enumerate(p.items):
-                        if i < len(records):
-                            item.update(records[i])
-
-                    builder   = XMLBuilder(p)
-                    xml_bytes = builder.build(user_inputs=user_xml_config)
-
-                    duimp_num = p.header.get("numeroDUIMP", "0000").replace("/", "-")
-                    file_name = f"DUIMP_{duimp_num}_INTEGRADO.xml"
-
-                    st.download_button(
-                        label="⬇️ Baixar XML",
-                        data=xml_bytes,
-                        file_name=file_name,
-                        mime="text/xml"
-                    )
-                    st.success("✅ XML Gerado com sucesso!")
+                    p = leituras["parsed_duimp"]
+
+                    # Gerado em streaming: a árvore completa e o XML serializado não ficam em
+                    # memória ao mesmo tempo, e o download sai do arquivo temporário
+                    if leituras["xml_cache"] is None:
+                        leituras["xml_cache"] = AdicaoFragmentCache()
+                    validator = XmlLayoutValidator()
+                    with record_run("Geração do XML") as execucao:
+                        with StreamlitProgress("Montando adições", "adições") as andamento:
+                            xml_file = gerar_xml_integrado(p, leituras["merged_df"], user_xml_config,
+                                                           validator=validator, cache=leituras["xml_cache"],
+                                                           progress=andamento)
+                        violacoes = campos_nao_lidos(p.slow_items) + validator.finish()
+                    guardar_diagnostico(execucao)
+
+                    file_name = nome_arquivo_xml(p)
+
+                    with xml_file:
+                        inicio_xml = xml_file.read(3000)
+                        # O st.download_button não aceita o SpooledTemporaryFile: recebe um
+                        # leitor sobre o mesmo descritor (sem copiar o XML para cá)
+                        with os.fdopen(xml_file.fileno(), "rb", closefd=False) as leitor:
+                            st.download_button(
+                                label="⬇️ Baixar XML",
+                                data=leitor,
+                                file_name=file_name,
+                                mime="text/xml"
+                            )
+                    if violacoes:
+                        st.warning(f"⚠️ XML gerado com {len(violacoes)} campo(s) fora do layout 8686 ou não lidos do PDF. "
+                                   "Confira antes de transmitir:")
+                        st.dataframe(pd.DataFrame(violacoes), hide_index=True, use_container_width=True)
+                    else:
+                        st.success("✅ XML Gerado com sucesso!")
+                    st.caption(f"{leituras['xml_cache'].rendered} de {len(p.items)} "
+                               "adições montadas nesta geração; as demais vieram do cache.")
 
                     # Preview
                     with st.expander("👁️ Preview do XML (primeiros 3000 caracteres)"):
-                        st.code(xml_bytes.decode('utf-8', errors='ignore')[:3000], language='xml')
+                        st.code(inicio_xml.decode('utf-8', errors='ignore'), language='xml')
 
                 except Exception as e:
                     st.error(f"Erro na geração do XML: {e}")
@@ -2336,10 +1335,26 @@ def sistema_integrado_duimp():
         else:
             st.warning("Realize o upload dos arquivos e a vinculação antes de gerar o XML.")
 
+    # ==========================================================================
+    # TAB 4 — LOTE
+    # ==========================================================================
+    with tab4:
+        _lote_duimp_tab()
+
+    _diagnostico_panel()
+
 
 # ==============================================================================
 # APLICAÇÃO PRINCIPAL
 # ==============================================================================
+# Módulos da barra lateral (rótulo → função que desenha o módulo)
+MODULOS = {
+    "📄 Processador TXT":          processador_txt,
+    "🚚 Processador CT-e":         processador_cte,
+    "📊 Sistema Integrado DUIMP": sistema_integrado_duimp,
+}
+
+
 def main():
     load_css()
 
@@ -2352,18 +1367,11 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
-    tab1, tab2, tab3 = st.tabs([
-        "📄 Processador TXT",
-        "🚚 Processador CT-e",
-        "📊 Sistema Integrado DUIMP"
-    ])
+    get_memory_budget().enforce(atual=leituras_da_sessao())
 
-    with tab1:
-        processador_txt()
-    with tab2:
-        processador_cte()
-    with tab3:
-        sistema_integrado_duimp()
+    # Só o módulo escolhido é executado: interagir com um módulo não refaz os outros
+    modulo = st.sidebar.radio("Módulo", list(MODULOS), key="modulo")
+    MODULOS[modulo]()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,8 @@
+"""Os testes importam o engine e os geradores de dados de benchmarks/ a partir da raiz do repositório."""
+import os
+import sys
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+sys.path.insert(0, os.path.abspath(RAIZ))
+sys.path.insert(0, os.path.abspath(os.path.join(RAIZ, "benchmarks")))
@@ -0,0 +1,66 @@
+"""
+BatchFormatter (formatação em lote, por coluna) contra o DataFormatter
+(escalar, a referência do layout 8686): para qualquer entrada, o lote
+devolve exatamente o que a função escalar devolve valor a valor.
+"""
+import pandas as pd
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+import engine
+
+DF = engine.DataFormatter
+BF = engine.BatchFormatter
+
+# (escalar, lote, larguras usadas no XML)
+CAMPOS = {
+    "input_fiscal":   (DF.format_input_fiscal,   BF.input_fiscal,   [5, 15]),
+    "high_precision": (DF.format_high_precision, BF.high_precision, [11, 15, 20]),
+    "quantity":       (DF.format_quantity,       BF.quantity,       [14, 15]),
+}
+
+
+def texto_br(valor, casas):
+    """1234.5 → "1.234,50" (formato em que os PDFs trazem os números)."""
+    return f"{valor:,.{casas}f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+numeros_br = st.builds(texto_br, st.floats(0, 1e7), st.integers(0, 7))
+metades    = st.builds(lambda n, k: n / 2 ** k, st.integers(-10 ** 6, 10 ** 6), st.integers(1, 8))
+valores    = st.one_of(
+    st.floats(),                                   # inclui NaN, ±inf e extremos
+    st.floats(-1e9, 1e9).map(lambda v: round(v, 7)),
+    metades,                                       # metades exatas (arredondamento)
+    st.integers(-10 ** 20, 10 ** 20),              # acima do int64
+    numeros_br,
+    st.sampled_from([None, "", "abc", "1,2,3", "  12,5 ", True, False, 0, 0.0]),
+    st.text(max_size=12),
+)
+ncms = st.one_of(
+    st.sampled_from([None, "", "8302.42.00", "8302", "ab12.34-5678.90", "  8481.80.99 x"]),
+    st.text(max_size=16),
+)
+
+
+@settings(max_examples=300, deadline=None)
+@given(st.lists(valores, max_size=60))
+def test_lote_igual_ao_escalar(lista):
+    floats = pd.Series([v for v in lista if isinstance(v, float)], dtype="float64")
+    for nome, (escalar, lote, larguras) in CAMPOS.items():
+        for largura in larguras:
+            assert lote(lista, largura) == [escalar(v, largura) for v in lista], f"{nome}({largura})"
+            assert lote(floats, largura) == [escalar(v, largura) for v in floats], f"{nome}({largura}) Series"
+
+
+@settings(max_examples=200, deadline=None)
+@given(st.lists(ncms, max_size=40))
+def test_ncm_lote_igual_ao_escalar(lista):
+    assert BF.ncm(lista) == [DF.format_ncm(v) for v in lista]
+
+
+@settings(max_examples=200, deadline=None)
+@given(st.lists(valores, max_size=40))
+def test_cbs_ibs_lote_igual_ao_escalar(lista):
+    bases = BF.input_fiscal(lista, 15)
+    cbs, ibs = BF.cbs_ibs(bases)
+    assert list(zip(cbs, ibs)) == [DF.calculate_cbs_ibs(b) for b in bases]
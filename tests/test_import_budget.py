@@ -0,0 +1,20 @@
+"""
+Início a frio do app: projeto.py importa dentro de ORCAMENTO_MS (sem o
+Streamlit) e nem ele nem `import engine` carregam as dependências pesadas,
+que ficam para o primeiro uso (benchmarks/bench_import.py mostra os tempos).
+"""
+import bench_import
+
+# Cada importação é um processo novo; a mais rápida de algumas desconta a
+# variação da máquina, e o tempo só reprova se estourar em todas as rodadas
+# (dependência pesada importada aparece em todas e reprova sempre)
+REPETICOES = 5
+RODADAS    = 3
+
+
+def test_importacao_dentro_do_orcamento():
+    for _ in range(RODADAS):
+        _, projeto_ms, _, falhas = bench_import.verificar(REPETICOES)
+        if not falhas:
+            return
+    assert not falhas, f"{falhas} (projeto em {projeto_ms:.1f} ms)"
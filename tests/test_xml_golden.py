@@ -0,0 +1,29 @@
+"""
+XML da declaração sintética de benchmarks/bench_xml_template.py comparado
+byte a byte com benchmarks/golden/duimp_integrado.xml. Mudança intencional
+no layout: regravar o arquivo-ouro com
+`python benchmarks/bench_xml_template.py --atualizar-ouro` e revisar o diff.
+"""
+import engine
+from bench_xml_template import OURO, USER_INPUTS, gerar_parser
+from engine.validation import validar_xml_duimp
+
+ADICOES = 13   # as mesmas de bench_xml_template.atualizar_ouro
+
+
+def ouro():
+    with open(OURO, "rb") as f:
+        return f.read()
+
+
+def test_build_igual_ao_arquivo_ouro():
+    assert engine.XMLBuilder(gerar_parser(ADICOES)).build(user_inputs=USER_INPUTS) == ouro()
+
+
+def test_build_stream_igual_ao_arquivo_ouro():
+    with engine.XMLBuilder(gerar_parser(ADICOES)).build_stream(user_inputs=USER_INPUTS) as xml_file:
+        assert xml_file.read() == ouro()
+
+
+def test_arquivo_ouro_dentro_do_layout():
+    assert validar_xml_duimp(OURO) == []